@@ -17,18 +17,18 @@ if str(SRC_DIR) not in sys.path:
 
 try:
     from src.app_factory import create_app  # type: ignore
-    from src.config import load_settings  # type: ignore
+    from src.config import get_settings  # type: ignore
 except ImportError:
     # Fallback if relative import resolution differs
     from app_factory import create_app  # type: ignore
-    from config import load_settings  # type: ignore
+    from config import get_settings  # type: ignore
 
 
 app: Flask = create_app()
 
 
 if __name__ == "__main__":
-    settings = load_settings()
+    settings = get_settings()
     port = int(os.environ.get("PORT", settings.port))
     app.run(host="0.0.0.0", port=port)
 
@@ -0,0 +1,28 @@
+"""
+ASGI entry point: public verification endpoints on the async engine.
+
+Run with: uvicorn asgi:app --port 10000
+Every other route is served by the Flask app through asgiref's WSGI adapter
+when asgiref is installed; otherwise keep admin traffic on `gunicorn wsgi:app`.
+"""
+import os
+
+from src.app_factory import create_app
+from src.asgi_app import create_asgi_app
+from src.config import get_settings
+from src.logging_setup import configure_logging
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+
+settings = get_settings()
+configure_logging(settings.log_level, settings.log_format, settings.log_info_sample_rate)
+
+app = create_asgi_app(fallback=WsgiToAsgi(create_app()) if WsgiToAsgi is not None else None)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 10000)))
@@ -0,0 +1,111 @@
+"""Shared setup for the benchmark scripts.
+
+``prepare_env`` must run before anything under ``src`` is imported, because
+settings are read from the environment at import time.
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+LINK_PAYLOAD = {
+    "fullName": "Jane Benchmark",
+    "email": "jane@example.com",
+    "address": "123 Main Street",
+    "city": "Anytown",
+    "state": "CA",
+    "zipCode": "94000",
+    "organizationName": "Bench Org",
+}
+SUBMIT_LOCATION = {"latitude": 37.7749, "longitude": -122.4194, "accuracy": 10}
+
+
+def prepare_env(database_url: str | None = None) -> str:
+    """Point the app at a throwaway SQLite database unless one is given."""
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    elif "DATABASE_URL" not in os.environ:
+        db_path = Path(tempfile.mkdtemp(prefix="verifai-bench-")) / "bench.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("AUTO_MIGRATE", "true")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-0123456789abcdef")
+    os.environ.setdefault("JWT_SECRET", "benchmark-jwt-secret-0123456789abcdef")
+    return os.environ["DATABASE_URL"]
+
+
+def admin_headers(client, email: str = "bench-admin@example.com", password: str = "bench-password") -> dict:
+    """Sign up (the first user becomes a platform admin) or log in, and return auth headers."""
+    client.post("/api/auth/signup", json={"email": email, "password": password})
+    resp = client.post("/api/auth/login", json={"email": email, "password": password})
+    return {"Authorization": f"Bearer {resp.get_json()['access_token']}"}
+
+
+def git_commit() -> str:
+    """Short hash of HEAD (suffixed -dirty for uncommitted changes), or "unknown"."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def append_history(name: str, record: dict) -> Path:
+    """Append one result to results/<name>.jsonl so runs can be compared over time."""
+    import json
+    from datetime import datetime
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{name}.jsonl"
+    entry = {"commit": git_commit(), "recorded_at": datetime.utcnow().isoformat(timespec="seconds"), **record}
+    with path.open("a") as fh:
+        fh.write(json.dumps(entry, sort_keys=True) + "\n")
+    return path
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name: str, port: int, workers: int) -> subprocess.Popen:
+    """Run gunicorn (wsgi:app) or uvicorn (asgi:app) on ``port`` with the current environment."""
+    if name == "gunicorn":
+        cmd = ["gunicorn", "wsgi:app", "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+               "--worker-class", "sync", "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--no-access-log"]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=os.environ.copy(),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{name} exited during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{name} did not start listening on port {port}")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Public verification endpoints under concurrent load: gunicorn sync workers
+(wsgi:app) versus a single uvicorn process (asgi:app).
+
+Both servers run as subprocesses against the same throwaway database. Each
+concurrency level fires POST /api/validate-token (or submit-verification
+with --endpoint submit) from that many simultaneous clients and reports
+throughput, p50/p95 latency and the resident memory of the server process
+tree, read from /proc.
+
+Usage:
+    python benchmarks/asgi_concurrency.py [--levels 10,50,200] [--requests 2000]
+        [--workers 4] [--endpoint validate|submit] [--no-record]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import (
+    LINK_PAYLOAD, SUBMIT_LOCATION, admin_headers, append_history, free_port, prepare_env, start_server, stop_server,
+)
+
+
+def process_tree_rss_kb(pid: int) -> int:
+    """VmRSS of ``pid`` and all of its descendants (Linux only)."""
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            for line in Path(f"/proc/{current}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+            for task in Path(f"/proc/{current}/task").iterdir():
+                children = (task / "children").read_text().split()
+                pending.extend(int(child) for child in children)
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+async def post(port: int, path: str, body: dict) -> tuple[int, float]:
+    # One connection per request: gunicorn's sync workers do not keep-alive.
+    payload = json.dumps(body).encode()
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    elapsed = time.perf_counter() - start
+    return int(response.split(b" ", 2)[1]), elapsed
+
+
+async def run_level(port: int, path: str, bodies: list, concurrency: int) -> dict:
+    queue = list(reversed(bodies))
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        while queue:
+            body = queue.pop()
+            try:
+                status, elapsed = await post(port, path, body)
+            except OSError:
+                errors += 1
+                continue
+            if status != 200:
+                errors += 1
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(bodies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+    }
+
+
+def issue_tokens(count: int) -> list:
+    from src.app_factory import create_app
+
+    client = create_app().test_client()
+    headers = admin_headers(client)
+    return [
+        client.post("/api/generate-verification-link", json=LINK_PAYLOAD, headers=headers).get_json()["token"]
+        for _ in range(count)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="10,50,200", help="comma-separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per level")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn sync workers")
+    parser.add_argument("--endpoint", choices=["validate", "submit"], default="validate")
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/asgi_concurrency.jsonl")
+    args = parser.parse_args()
+
+    prepare_env()
+    levels = [int(level) for level in args.levels.split(",")]
+    servers = ["gunicorn", "uvicorn"]
+
+    if args.endpoint == "validate":
+        path = "/api/validate-token"
+        token = issue_tokens(1)[0]
+        bodies_for = lambda: [{"token": token}] * args.requests
+    else:
+        # Every submit consumes its token, so each server and level gets fresh ones.
+        path = "/api/submit-verification"
+        tokens = iter(issue_tokens(args.requests * len(levels) * len(servers)))
+        bodies_for = lambda: [{"token": next(tokens), "location": SUBMIT_LOCATION} for _ in range(args.requests)]
+
+    results = []
+    for name in servers:
+        port = free_port()
+        proc = start_server(name, port, args.workers)
+        try:
+            for level in levels:
+                row = asyncio.run(run_level(port, path, bodies_for(), level))
+                row.update(server=name, rss_mb=round(process_tree_rss_kb(proc.pid) / 1024, 1))
+                results.append(row)
+        finally:
+            stop_server(proc)
+
+    print(f"\n{path}, {args.requests} requests per level (gunicorn: {args.workers} sync workers)")
+    print(f"  {'server':<10}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}{'RSS MB':>9}")
+    for r in results:
+        print(f"  {r['server']:<10}{r['concurrency']:>8}{r['throughput_rps']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['errors']:>8}{r['rss_mb']:>9.1f}")
+
+    if not args.no_record:
+        append_history("asgi_concurrency", {
+            "endpoint": path, "requests": args.requests, "workers": args.workers, "results": results,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the service-layer hot functions, recorded per commit.
+
+Each case is timed with timeit (autoranged, best of --repeat) and reported
+as time per call. Results are appended to results/bench_services.jsonl with
+the current commit, and compared with the latest entry from a different
+commit so a change to the services shows up as a measured delta.
+
+This is what pytest-benchmark's --benchmark-autosave and --benchmark-compare
+would give, without the extra dependency: like the other scripts here it
+runs with only requirements.txt installed, and its history sits next to
+theirs in results/.
+
+Usage:
+    python benchmarks/bench_services.py [--repeat 5] [--filter haversine] [--no-record]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import LINK_PAYLOAD, RESULTS_DIR, SUBMIT_LOCATION, append_history, git_commit, prepare_env
+
+
+def build_cases() -> dict:
+    from werkzeug.security import check_password_hash, generate_password_hash
+
+    from src.services_api_keys import hash_api_key
+    from src.services_tokens import _decode_token, link_serializer
+    from src.services_verifications import (
+        _build_verification, _geocode_address, _haversine_distance, _risk_score, verification_to_dict,
+    )
+
+    serializer = link_serializer()
+    link_payload = {**LINK_PAYLOAD, "tokenId": str(uuid.uuid4()), "createdAt": datetime.utcnow().isoformat()}
+    token = serializer.dumps(link_payload, salt="verification-link")
+    submission = {**LINK_PAYLOAD, "location": SUBMIT_LOCATION, "userAgent": "Mozilla/5.0", "timezone": "UTC"}
+    record, _ = _build_verification(submission, "token-id", "203.0.113.7")
+    record.timestamp = datetime.utcnow()
+    password_hash = generate_password_hash("bench-password")
+    api_key = "verifai_live_" + "x" * 43
+
+    return {
+        "haversine_distance": lambda: _haversine_distance(37.7749, -122.4194, 37.7849, -122.4094),
+        "geocode_address_known": lambda: _geocode_address("123 Main Street, Anytown, CA 94000"),
+        "geocode_address_fallback": lambda: _geocode_address("1 Unknown Road, Nowhere, ZZ 00000"),
+        "risk_score": lambda: _risk_score(750.0),
+        "build_verification": lambda: _build_verification(submission, "token-id", "203.0.113.7"),
+        "serializer_dumps": lambda: serializer.dumps(link_payload, salt="verification-link"),
+        "serializer_loads": lambda: _decode_token(serializer, token),
+        "hash_api_key": lambda: hash_api_key(api_key),
+        "password_hash": lambda: generate_password_hash("bench-password"),
+        "password_check": lambda: check_password_hash(password_hash, "bench-password"),
+        "verification_to_dict": lambda: verification_to_dict(record),
+    }
+
+
+def time_case(fn, repeat: int) -> float:
+    """Best time per call in microseconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def previous_entry(commit: str):
+    path = RESULTS_DIR / "bench_services.jsonl"
+    if not path.exists():
+        return None
+    previous = None
+    for line in path.read_text().splitlines():
+        entry = json.loads(line)
+        if entry.get("commit") != commit:
+            previous = entry
+    return previous
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/bench_services.jsonl")
+    args = parser.parse_args()
+
+    prepare_env()
+    cases = {name: fn for name, fn in build_cases().items() if args.filter in name}
+    results = {name: round(time_case(fn, args.repeat), 3) for name, fn in cases.items()}
+
+    commit = git_commit()
+    previous = previous_entry(commit)
+    baseline = previous["results"] if previous else {}
+    header = f"vs {previous['commit']}" if previous else ""
+    print(f"\nbest of {args.repeat}, microseconds per call ({commit})")
+    print(f"  {'case':<26}{'us/call':>12}  {header}")
+    for name, value in results.items():
+        delta = ""
+        if baseline.get(name):
+            delta = f"{(value / baseline[name] - 1) * 100:+.1f}%"
+        print(f"  {name:<26}{value:>12.3f}  {delta}")
+
+    if not args.no_record:
+        append_history("bench_services", {"repeat": args.repeat, "results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
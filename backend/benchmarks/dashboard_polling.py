@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Many dashboards polling /api/dashboard-stats while verifications arrive.
+
+Seeds --rows verifications, then for --seconds runs --pollers threads that
+each fetch the stats back to back (without If-None-Match, like a dashboard
+reload) while a writer submits a verification every --write-ms. Runs in
+child processes with STATS_CACHE_SECONDS=0 (every poll aggregates) and with
+--cache-seconds, and reports polls served, poll latency, how many times the
+aggregation actually ran, and how many writes landed.
+
+Usage:
+    python benchmarks/dashboard_polling.py [--rows 100000] [--pollers 16] [--seconds 10]
+        [--write-ms 50] [--cache-seconds 5] [--no-record]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import LINK_PAYLOAD, SUBMIT_LOCATION, admin_headers, append_history, prepare_env
+
+
+def seed(rows: int) -> None:
+    from sqlalchemy import insert
+
+    from src.database import engine
+    from src.jsonlib import dumps
+    from src.models import Verification
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, rows, 5000):
+            batch = []
+            for i in range(start, min(start + 5000, rows)):
+                status = rng.choice(["verified", "verified", "requires_review", "requires_manual_verification"])
+                batch.append({
+                    "id": uuid.uuid4().hex, "timestamp": now - timedelta(minutes=i), "status": status,
+                    "personal_info": dumps({"full_name": f"Customer {i}"}),
+                    "verification_results": dumps({"status": status}),
+                })
+            conn.execute(insert(Verification), batch)
+
+
+def child(args) -> dict:
+    prepare_env()
+    os.environ["LOG_LEVEL"] = "WARNING"
+    from src import routes_verification
+    from src.app_factory import create_app
+
+    app = create_app()
+    seed(args.rows)
+    headers = admin_headers(app.test_client())
+
+    aggregations = 0
+    compute_stats = routes_verification.verification_stats
+
+    def counting_stats(*a, **kw):
+        nonlocal aggregations
+        aggregations += 1
+        return compute_stats(*a, **kw)
+
+    routes_verification.verification_stats = counting_stats
+
+    deadline = time.perf_counter() + args.seconds
+    latencies, writes = [], 0
+    lock = threading.Lock()
+
+    def poll():
+        client = app.test_client()
+        mine = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            assert client.get("/api/dashboard-stats", headers=headers).status_code == 200
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    def write():
+        nonlocal writes
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            link = client.post("/api/generate-verification-link", json=LINK_PAYLOAD, headers=headers).get_json()
+            client.post("/api/submit-verification", json={"token": link["token"], "location": SUBMIT_LOCATION})
+            writes += 1
+            time.sleep(args.write_ms / 1000)
+
+    threads = [threading.Thread(target=poll) for _ in range(args.pollers)] + [threading.Thread(target=write)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    return {
+        "polls": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "aggregations": aggregations,
+        "writes": writes,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--pollers", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ms", type=float, default=50, help="pause between submitted verifications")
+    parser.add_argument("--cache-seconds", type=float, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/dashboard_polling.jsonl")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args)))
+        return 0
+
+    results = {}
+    for seconds in (0, args.cache_seconds):
+        env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+        env["STATS_CACHE_SECONDS"] = str(seconds)
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", *sys.argv[1:]],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results[f"cache_{seconds:g}s"] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"\n{args.pollers} pollers for {args.seconds:g}s over {args.rows} verifications, "
+          f"a write every {args.write_ms:g} ms")
+    print(f"  {'':<12}{'polls':>8}{'p50 ms':>9}{'p95 ms':>9}{'aggregations':>14}{'writes':>8}")
+    for label, r in results.items():
+        print(f"  {label:<12}{r['polls']:>8}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['aggregations']:>14}{r['writes']:>8}")
+
+    if not args.no_record:
+        prepare_env()
+        append_history("dashboard_polling", {
+            "rows": args.rows, "pollers": args.pollers, "seconds": args.seconds, "write_ms": args.write_ms,
+            "results": results,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
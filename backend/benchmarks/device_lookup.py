@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Repeat-device detection on submit: the device_identities lookup against a scan.
+
+Seeds verifications from --devices devices (each used by a few identities)
+in steps up to --rows, fingerprinting them as rebuild-devices does.
+After each step it times what a submission pays to record its device and
+count the identities it verified in the window (an upsert and a primary key
+range scan), next to finding the same count by scanning every verification's
+security_data in Python. The first should stay flat as the table grows.
+
+Usage:
+    python benchmarks/device_lookup.py [--rows 200000] [--devices 5000] [--steps 3] [--rounds 200]
+        [--database-url URL] [--no-record]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import append_history, prepare_env
+
+
+def seed(start: int, rows: int, devices: int, rng: random.Random) -> None:
+    from sqlalchemy import insert
+
+    from src.database import engine
+    from src.jsonlib import dumps
+    from src.models import Verification
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for batch in range(start, start + rows, 5000):
+            verifications = []
+            for i in range(batch, min(batch + 5000, start + rows)):
+                device = rng.randrange(devices)
+                verifications.append({
+                    "id": uuid.uuid4().hex, "timestamp": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+                    "status": "verified",
+                    "personal_info": dumps({"full_name": f"Customer {i}", "email": f"c{device}-{i % 4}@example.com"}),
+                    "security_data": dumps({"user_agent": f"Mozilla/5.0 device {device}", "screen_resolution": "1920x1080",
+                                            "timezone": "UTC", "ip_address": f"10.0.{device // 256}.{device % 256}"}),
+                    "verification_results": dumps({"status": "verified"}),
+                })
+            conn.execute(insert(Verification), verifications)
+
+
+def scan_count(security: dict, since: datetime) -> int:
+    """The same count without the index: every verification's security_data read and compared."""
+    from sqlalchemy import select
+
+    from src.database import session_scope
+    from src.jsonlib import loads_or_none
+    from src.models import Verification
+
+    identities = set()
+    with session_scope(readonly=True) as db:
+        rows = db.execute(select(Verification.timestamp, Verification.personal_info, Verification.security_data))
+        for timestamp, personal_info, security_data in rows:
+            if timestamp >= since and loads_or_none(security_data) == security:
+                identities.add((loads_or_none(personal_info) or {}).get("email"))
+    return len(identities)
+
+
+def timed(fn, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="verifications, at the end")
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--steps", type=int, default=3, help="sizes the lookup is measured at")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--database-url", default=None, help="empty, migrated database (default: temp SQLite)")
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/device_lookup.jsonl")
+    args = parser.parse_args()
+
+    url = prepare_env(args.database_url)
+    from src.database import engine, session_scope
+    from src.devices import device_fingerprint, rebuild, record_device, window_start
+    from src.migrations import upgrade
+
+    upgrade(engine)
+    rng = random.Random(42)
+    security = {"user_agent": "Mozilla/5.0 device 7", "screen_resolution": "1920x1080", "timezone": "UTC",
+                "ip_address": "10.0.0.7"}
+    fingerprint = device_fingerprint(security)
+
+    def on_submit():
+        with session_scope() as db:
+            record_device(db, fingerprint, f"new-{rng.randrange(10)}@example.com", datetime.utcnow())
+
+    results = []
+    seeded = 0
+    for step in range(1, args.steps + 1):
+        target = args.rows * step // args.steps
+        seed(seeded, target - seeded, args.devices, rng)
+        seeded = target
+        with engine.begin() as conn:
+            rebuild(conn)
+        results.append({
+            "rows": seeded,
+            "submit_ms": timed(on_submit, args.rounds),
+            "scan_ms": timed(lambda: scan_count(security, window_start()), 1),
+        })
+
+    print(f"\n{engine.dialect.name}, {args.devices} devices")
+    print(f"  {'verifications':>14}{'on submit':>11}{'scan':>10}   (ms, p50)")
+    for r in results:
+        print(f"  {r['rows']:>14}{r['submit_ms']:>11.2f}{r['scan_ms']:>10.0f}")
+
+    if not args.no_record:
+        append_history("device_lookup", {
+            "database": url.split(":", 1)[0], "devices": args.devices, "rounds": args.rounds, "results": results,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Measure import time and worker cold start, and track them per commit.
+
+Each phase runs in a fresh interpreter:
+  import      the app modules under `python -X importtime` (includes its overhead)
+  cold start  `import wsgi` including create_app() and the schema check
+
+Usage:
+    python benchmarks/import_time.py [--runs 5] [--top 15] [--no-record]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import BACKEND_DIR, append_history, prepare_env
+
+IMPORT_ONLY = "import flask, sqlalchemy; import src.app_factory"
+COLD_START = (
+    "import time; t = time.perf_counter(); import wsgi; "
+    "print(round((time.perf_counter() - t) * 1000, 2))"
+)
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=BACKEND_DIR, env=os.environ.copy(), check=True, capture_output=True, text=True,
+    )
+
+
+def parse_importtime(stderr: str) -> list:
+    """Return (cumulative_us, self_us, module) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|")
+            # Nesting is encoded as extra indentation after the first space.
+            rows.append((int(cumulative_us), int(self_us), module[1:].rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to show")
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/import_time.jsonl")
+    args = parser.parse_args()
+
+    prepare_env()
+    # Migrate the throwaway database first so cold start measures only the check.
+    _run("import wsgi")
+
+    import_totals, cold_starts, rows = [], [], []
+    for _ in range(args.runs):
+        result = _run(IMPORT_ONLY, "-X", "importtime")
+        rows = parse_importtime(result.stderr)
+        import_totals.append(sum(cum for cum, _, mod in rows if mod.startswith("src.")) / 1000)
+        cold_starts.append(float(_run(COLD_START).stdout.strip().splitlines()[-1]))
+
+    print(f"import (median of {args.runs}):     {statistics.median(import_totals):8.1f} ms")
+    print(f"cold start (median of {args.runs}): {statistics.median(cold_starts):8.1f} ms")
+    print("\nslowest third-party imports:")
+    top_level = sorted((r for r in rows if not r[2].startswith((" ", "src."))), reverse=True)[: args.top]
+    for cumulative, _, module in top_level:
+        print(f"  {cumulative / 1000:8.1f} ms  {module.strip()}")
+
+    if not args.no_record:
+        path = append_history("import_time", {
+            "import_ms": round(statistics.median(import_totals), 1),
+            "cold_start_ms": round(statistics.median(cold_starts), 1),
+            "runs": args.runs,
+            "python": sys.version.split()[0],
+        })
+        print(f"\nrecorded in {path.relative_to(BACKEND_DIR)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+JSON cost per 10k verifications: the stdlib path the services used before
+versus src.jsonlib (orjson when installed).
+
+  write     4 dumps per verification (personal, location, security, results)
+  read      4 loads per row, as in list_verifications
+  response  serializing the whole listing, as jsonify does
+
+Usage:
+    python benchmarks/json_serialization.py [--rows 10000] [--repeat 5] [--no-record]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import append_history, prepare_env
+
+
+def sample_columns(i: int) -> dict:
+    return {
+        "personal_info": {
+            "full_name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "phone": "555-0100",
+            "address": "123 Main Street, Anytown, CA 94000",
+            "organization": "Bench Org",
+        },
+        "location_data": {
+            "user_coordinates": {"latitude": 37.7749 + i * 1e-6, "longitude": -122.4194, "accuracy": 12},
+            "address_coordinates": {"latitude": 37.7749, "longitude": -122.4194},
+            "distance_meters": 12.5,
+            "location_verified": True,
+        },
+        "security_data": {
+            "user_agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X)",
+            "screen_resolution": "390x844",
+            "timezone": "America/Los_Angeles",
+            "ip_address": "203.0.113.7",
+        },
+        "verification_results": {
+            "status": "verified",
+            "risk_score": 0.1,
+            "location_match": True,
+            "requires_manual_review": False,
+        },
+    }
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_engine(name: str, dumps, loads, response_dumps, columns: list, repeat: int) -> dict:
+    stored = [{key: dumps(value) for key, value in row.items()} for row in columns]
+
+    def write():
+        for row in columns:
+            for value in row.values():
+                dumps(value)
+
+    def read():
+        return [{key: loads(value) for key, value in row.items()} for row in stored]
+
+    listing = {"verifications": read(), "total_count": len(stored)}
+
+    return {
+        "engine": name,
+        "write_ms": round(best_of(repeat, write), 2),
+        "read_ms": round(best_of(repeat, read), 2),
+        "response_ms": round(best_of(repeat, lambda: response_dumps(listing)), 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/json_serialization.jsonl")
+    args = parser.parse_args()
+
+    prepare_env()
+    from src import jsonlib
+
+    columns = [sample_columns(i) for i in range(args.rows)]
+    results = [
+        run_engine(
+            "stdlib", json.dumps, json.loads,
+            lambda obj: json.dumps(obj, sort_keys=True, separators=(",", ":")),
+            columns, args.repeat,
+        )
+    ]
+    if jsonlib.ENGINE != "json":
+        results.append(
+            run_engine(jsonlib.ENGINE, jsonlib.dumps, jsonlib.loads, jsonlib.dumps, columns, args.repeat)
+        )
+    else:
+        print("orjson is not installed; only the stdlib engine was measured")
+
+    print(f"\nbest of {args.repeat}, per {args.rows} verifications (ms)")
+    print(f"  {'engine':<10}{'write':>10}{'read':>10}{'response':>10}{'total':>10}")
+    for r in results:
+        total = r["write_ms"] + r["read_ms"] + r["response_ms"]
+        print(f"  {r['engine']:<10}{r['write_ms']:>10.1f}{r['read_ms']:>10.1f}{r['response_ms']:>10.1f}{total:>10.1f}")
+
+    if not args.no_record:
+        append_history("json_serialization", {"rows": args.rows, "results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
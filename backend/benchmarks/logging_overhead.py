@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+What logging costs the request thread.
+
+  per call     one INFO line with an email argument: the old setup
+               (StreamHandler formatting and writing inline) versus the
+               queue pipeline from src.logging_setup. Output goes to
+               /dev/null, then to a sink that takes --sink-latency-us per
+               write (a stdout pipe whose reader has fallen behind)
+  disabled     a suppressed DEBUG line written as an f-string versus with
+               lazy % arguments
+  per request  GET /api/auth/users (four INFO lines) with logging off,
+               through the queue pipeline, and through the inline handler
+
+Usage:
+    python benchmarks/logging_overhead.py [--calls 50000] [--requests 500]
+        [--sink-latency-us 200] [--no-record]
+"""
+
+import argparse
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueListener
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import admin_headers, append_history, prepare_env
+
+EMAIL = "jane.customer@example.com"
+
+
+class SlowSink:
+    def __init__(self, latency_us: int):
+        self.latency = latency_us / 1e6
+
+    def write(self, data: str) -> None:
+        time.sleep(self.latency)
+
+    def flush(self) -> None:
+        pass
+
+
+def reset_root(handler: logging.Handler, level: int) -> logging.Logger:
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return logging.getLogger("src.routes_bench")
+
+
+def per_call_us(logger: logging.Logger, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        logger.info("[BENCH] Signup request for email: %s (%d)", EMAIL, i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def queue_pipeline(stream, logging_setup) -> tuple:
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logging_setup.JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    return logging_setup.DeferredQueueHandler(log_queue), listener
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--sink-latency-us", type=int, default=200)
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/logging_overhead.jsonl")
+    args = parser.parse_args()
+
+    prepare_env()
+    os.environ["LOG_LEVEL"] = "WARNING"
+    from src import logging_setup
+    from src.app_factory import create_app
+
+    devnull = open(os.devnull, "w")
+    results = {}
+
+    inline = logging.StreamHandler(devnull)
+    inline.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    results["inline_call_us"] = round(per_call_us(reset_root(inline, logging.INFO), args.calls), 2)
+
+    handler, listener = queue_pipeline(devnull, logging_setup)
+    results["queued_call_us"] = round(per_call_us(reset_root(handler, logging.INFO), args.calls), 2)
+    listener.stop()
+
+    slow_calls = max(1, args.calls // 10)
+    sink = SlowSink(args.sink_latency_us)
+    slow_inline = logging.StreamHandler(sink)
+    slow_inline.setFormatter(inline.formatter)
+    results["slow_sink_inline_call_us"] = round(per_call_us(reset_root(slow_inline, logging.INFO), slow_calls), 2)
+    handler, listener = queue_pipeline(sink, logging_setup)
+    results["slow_sink_queued_call_us"] = round(per_call_us(reset_root(handler, logging.INFO), slow_calls), 2)
+    listener.stop()
+
+    logger = reset_root(logging.NullHandler(), logging.INFO)
+    payload = {"email": EMAIL, "fields": list(range(20))}
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        logger.debug(f"[BENCH] payload {payload}")
+    results["disabled_fstring_us"] = round((time.perf_counter() - start) / args.calls * 1e6, 3)
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        logger.debug("[BENCH] payload %s", payload)
+    results["disabled_lazy_us"] = round((time.perf_counter() - start) / args.calls * 1e6, 3)
+
+    app = create_app()
+    client = app.test_client()
+    headers = admin_headers(client)
+
+    def per_request_ms() -> float:
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.get("/api/auth/users", headers=headers)
+        return (time.perf_counter() - start) / args.requests * 1000
+
+    reset_root(logging.NullHandler(), logging.CRITICAL)
+    results["request_logging_off_ms"] = round(per_request_ms(), 3)
+    handler, listener = queue_pipeline(devnull, logging_setup)
+    reset_root(handler, logging.INFO)
+    results["request_queued_ms"] = round(per_request_ms(), 3)
+    listener.stop()
+    reset_root(inline, logging.INFO)
+    results["request_inline_ms"] = round(per_request_ms(), 3)
+
+    print(f"\nper INFO call, {args.calls} calls (caller thread, microseconds)")
+    print(f"  inline StreamHandler   {results['inline_call_us']:>8.2f}")
+    print(f"  queue pipeline         {results['queued_call_us']:>8.2f}")
+    print(f"  inline, slow sink      {results['slow_sink_inline_call_us']:>8.2f}")
+    print(f"  queue, slow sink       {results['slow_sink_queued_call_us']:>8.2f}")
+    print("\nsuppressed DEBUG call (microseconds)")
+    print(f"  f-string               {results['disabled_fstring_us']:>8.3f}")
+    print(f"  lazy % args            {results['disabled_lazy_us']:>8.3f}")
+    print(f"\nGET /api/auth/users, {args.requests} requests (ms per request)")
+    print(f"  logging off            {results['request_logging_off_ms']:>8.3f}")
+    print(f"  queue pipeline         {results['request_queued_ms']:>8.3f}"
+          f"  (+{results['request_queued_ms'] - results['request_logging_off_ms']:.3f})")
+    print(f"  inline StreamHandler   {results['request_inline_ms']:>8.3f}"
+          f"  (+{results['request_inline_ms'] - results['request_logging_off_ms']:.3f})")
+
+    if not args.no_record:
+        append_history("logging_overhead", {
+            "calls": args.calls, "requests": args.requests, "sink_latency_us": args.sink_latency_us, "results": results,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
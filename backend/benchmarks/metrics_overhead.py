@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Cost of src.metrics on the request path.
+
+Runs the same request mix (validate a token, then submit) in child
+processes, alternating METRICS_ENABLED=true and false --repeat times. The best
+mean per-request time of each mode is compared, since SQLite commit latency
+is noisier than the metrics themselves. Also times one /api/metrics scrape.
+
+Usage:
+    python benchmarks/metrics_overhead.py [--requests 500] [--repeat 3] [--no-record]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import LINK_PAYLOAD, SUBMIT_LOCATION, admin_headers, append_history, prepare_env
+
+
+def child(requests: int) -> dict:
+    prepare_env()
+    os.environ["LOG_LEVEL"] = "WARNING"
+    from src.app_factory import create_app
+
+    client = create_app().test_client()
+    headers = admin_headers(client)
+    tokens = [
+        client.post("/api/generate-verification-link", json=LINK_PAYLOAD, headers=headers).get_json()["token"]
+        for _ in range(requests)
+    ]
+    start = time.perf_counter()
+    for token in tokens:
+        client.post("/api/validate-token", json={"token": token})
+        client.post("/api/submit-verification", json={"token": token, "location": SUBMIT_LOCATION})
+    per_request_ms = (time.perf_counter() - start) / (2 * requests) * 1000
+
+    scrape_ms = None
+    if os.environ["METRICS_ENABLED"] == "true":
+        start = time.perf_counter()
+        client.get("/api/metrics")
+        scrape_ms = (time.perf_counter() - start) * 1000
+    return {"per_request_ms": round(per_request_ms, 3), "scrape_ms": scrape_ms and round(scrape_ms, 3)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/metrics_overhead.jsonl")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.requests)))
+        return 0
+
+    results = {}
+    for _ in range(args.repeat):
+        for enabled in ("false", "true"):
+            env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+            env["METRICS_ENABLED"] = enabled
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", "--requests", str(args.requests)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            run = json.loads(out.strip().splitlines()[-1])
+            best = results.get(enabled)
+            if best is None or run["per_request_ms"] < best["per_request_ms"]:
+                results[enabled] = run
+
+    off, on = results["false"]["per_request_ms"], results["true"]["per_request_ms"]
+    print(f"\nbest of {args.repeat}, mean per request over {2 * args.requests} requests (ms)")
+    print(f"  metrics off   {off:>8.3f}")
+    print(f"  metrics on    {on:>8.3f}  ({on - off:+.3f}, {(on - off) / off * 100:+.1f}%)")
+    print(f"  /api/metrics scrape: {results['true']['scrape_ms']:.2f} ms")
+
+    if not args.no_record:
+        prepare_env()
+        append_history("metrics_overhead", {"requests": args.requests, "off": results["false"], "on": results["true"]})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
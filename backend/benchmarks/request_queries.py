@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Count SQL statements, commits and pool checkouts per request for the public
+link -> validate -> submit flow.
+
+Usage:
+    python benchmarks/request_queries.py             # current settings
+    python benchmarks/request_queries.py --compare   # per-call vs request-scoped sessions
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import LINK_PAYLOAD, SUBMIT_LOCATION, admin_headers, prepare_env
+
+
+def measure(rounds: int) -> dict:
+    prepare_env()
+    from sqlalchemy import event
+
+    from src.app_factory import create_app
+    from src.database import engine
+
+    app = create_app()
+    client = app.test_client()
+    headers = admin_headers(client)
+
+    counters = {"queries": 0, "commits": 0, "checkouts": 0}
+
+    def on_execute(*args):
+        counters["queries"] += 1
+
+    def on_commit(*args):
+        counters["commits"] += 1
+
+    def on_checkout(*args):
+        counters["checkouts"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    event.listen(engine, "commit", on_commit)
+    event.listen(engine.pool, "checkout", on_checkout)
+
+    totals: dict = {}
+
+    def record(step: str, call):
+        before = dict(counters)
+        resp = call()
+        if resp.status_code >= 400:
+            raise RuntimeError(f"{step} failed: {resp.status_code} {resp.get_data(as_text=True)}")
+        step_totals = totals.setdefault(step, {k: 0 for k in counters})
+        for key in counters:
+            step_totals[key] += counters[key] - before[key]
+        return resp
+
+    for _ in range(rounds):
+        link = record("generate-link", lambda: client.post("/api/generate-verification-link", json=LINK_PAYLOAD, headers=headers))
+        token = link.get_json()["token"]
+        record("validate-token", lambda: client.post("/api/validate-token", json={"token": token}))
+        record("submit-verification", lambda: client.post("/api/submit-verification", json={"token": token, "location": SUBMIT_LOCATION}))
+
+    return {step: {k: v / rounds for k, v in values.items()} for step, values in totals.items()}
+
+
+def print_table(label: str, results: dict) -> None:
+    print(f"\n{label}")
+    print(f"  {'endpoint':<22}{'queries':>10}{'commits':>10}{'checkouts':>11}")
+    for step, values in results.items():
+        print(f"  {step:<22}{values['queries']:>10.1f}{values['commits']:>10.1f}{values['checkouts']:>11.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--compare", action="store_true", help="run with request-scoped sessions off and on")
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not args.compare:
+        results = measure(args.rounds)
+        if args.json:
+            print(json.dumps(results))
+        else:
+            print_table("per-request averages", results)
+        return 0
+
+    for mode in ("false", "true"):
+        env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+        env["REQUEST_SCOPED_SESSIONS"] = mode
+        out = subprocess.run(
+            [sys.executable, __file__, "--json", "--rounds", str(args.rounds)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        label = "request-scoped session" if mode == "true" else "session per service call"
+        print_table(label, json.loads(out.strip().splitlines()[-1]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
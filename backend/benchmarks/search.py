@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Search latency over a large synthetic customer base.
+
+Inserts --rows tokens and as many verifications (names, emails and
+addresses drawn from small vocabularies, so common prefixes match many
+records and full names few), builds the search index with
+``reindex`` and reports how long that took. Then runs each query below
+--rounds times through ``search()`` and reports p50/p95 latency and the
+number of matches on the first page, next to one pass of the previous
+approach: loading every verification and filtering personal_info in Python.
+
+Usage:
+    python benchmarks/search.py [--rows 200000] [--rounds 20]
+        [--database-url URL] [--no-record]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import append_history, prepare_env
+
+FIRST = ["james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda", "william", "elizabeth",
+         "david", "barbara", "richard", "susan", "joseph", "jessica", "thomas", "sarah", "charles", "karen"]
+LAST = ["smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis", "rodriguez", "martinez",
+        "hernandez", "lopez", "gonzalez", "wilson", "anderson", "thomas", "taylor", "moore", "jackson", "martin"]
+STREETS = ["main", "oak", "pine", "maple", "cedar", "elm", "washington", "lake", "hill", "park"]
+CITIES = ["springfield", "riverside", "franklin", "greenville", "bristol", "clinton", "fairview", "salem"]
+DOMAINS = ["example.com", "mail.test", "acme.io", "corp.dev"]
+
+QUERIES = {
+    "common prefix": "jo",
+    "first name": "jennifer",
+    "full name": "mary garcia",
+    "email fragment": "jsmith4",
+    "address": "oak springfield",
+    "rare full name": "elizabeth rodriguez 7",
+}
+
+
+def seed(rows: int) -> None:
+    from sqlalchemy import insert
+
+    from src.database import engine
+    from src.jsonlib import dumps
+    from src.models import Verification, VerificationToken
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, rows, 5000):
+            tokens, verifications = [], []
+            for i in range(start, min(start + 5000, rows)):
+                first, last = rng.choice(FIRST), rng.choice(LAST)
+                email = f"{first[0]}{last}{i}@{rng.choice(DOMAINS)}"
+                created = now - timedelta(minutes=i)
+                token_id = uuid.uuid4().hex
+                tokens.append({
+                    "id": token_id, "token": "x", "email": email, "full_name": f"{first.title()} {last.title()}",
+                    "organization_name": "Bench Org", "created_at": created,
+                    "expires_at": created + timedelta(days=1), "used": True, "status": "completed",
+                })
+                address = (f"{rng.randint(1, 9999)} {rng.choice(STREETS).title()} Street, "
+                           f"{rng.choice(CITIES).title()}, CA {rng.randint(90000, 96000)}")
+                verifications.append({
+                    "id": uuid.uuid4().hex, "token_id": token_id, "timestamp": created,
+                    "personal_info": dumps({"full_name": f"{first.title()} {last.title()} {i % 10}",
+                                            "email": email, "address": address}),
+                    "verification_results": "{}",
+                })
+            conn.execute(insert(VerificationToken), tokens)
+            conn.execute(insert(Verification), verifications)
+
+
+def scan(query: str) -> int:
+    """The old way: every verification, matched in Python."""
+    from src.services_verifications import list_verifications
+
+    words = query.lower().split()
+    matches = 0
+    for v in list_verifications():
+        info = v["personal_info"]
+        haystack = " ".join(str(info.get(k, "")) for k in ("full_name", "email", "address")).lower()
+        matches += all(w in haystack for w in words)
+    return matches
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="tokens, and as many verifications")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--database-url", default=None, help="empty, migrated database (default: temp SQLite)")
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/search.jsonl")
+    args = parser.parse_args()
+
+    url = prepare_env(args.database_url)
+    from src.database import engine
+    from src.migrations import upgrade
+    from src.search import reindex, search, uses_trigrams
+
+    upgrade(engine)
+    started = time.perf_counter()
+    seed(args.rows)
+    seed_s = time.perf_counter() - started
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        documents = reindex(conn)
+        backend = "pg_trgm" if uses_trigrams(conn) else "inverted index"
+    index_s = time.perf_counter() - started
+
+    results = []
+    for label, query in QUERIES.items():
+        timings = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            page = search(query, limit=20)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results.append({
+            "query": label, "q": query, "hits": len(page["results"]), "more": page["hasMore"],
+            "p50_ms": statistics.median(timings), "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        })
+    started = time.perf_counter()
+    scan_matches = scan(QUERIES["full name"])
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    print(f"\n{engine.dialect.name} ({backend}), {args.rows} tokens + {args.rows} verifications")
+    print(f"  seeded in {seed_s:.1f}s, indexed {documents} documents in {index_s:.1f}s "
+          f"({documents / index_s:.0f}/s)")
+    print(f"  {'query':<18}{'q':<24}{'hits':>6}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in results:
+        hits = f"{r['hits']}{'+' if r['more'] else ''}"
+        print(f"  {r['query']:<18}{r['q']:<24}{hits:>6}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}")
+    print(f"  full scan in Python for {QUERIES['full name']!r}: {scan_ms:.0f} ms ({scan_matches} matches)")
+
+    if not args.no_record:
+        append_history("search", {
+            "database": url.split(":", 1)[0], "backend": backend, "rows": args.rows, "rounds": args.rounds,
+            "index_s": index_s, "results": results, "scan_ms": scan_ms,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
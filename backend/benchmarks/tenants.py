@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Whether one large organization slows down everyone else.
+
+Seeds a small organization with --small tokens and verifications, then grows
+a large one in steps up to --large. After each step it times the small
+organization's dashboard stats, listing and CSV export (scoped by the
+organization-led indexes), next to the unscoped stats over every
+organization and the previous dashboard approach of loading every
+verification into Python. The small organization's numbers should stay flat
+while the large one grows.
+
+Usage:
+    python benchmarks/tenants.py [--small 2000] [--large 200000] [--steps 3] [--rounds 10]
+        [--database-url URL] [--no-record]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import append_history, prepare_env
+
+STATUSES = ["verified", "verified", "verified", "requires_review", "requires_manual_verification"]
+
+
+def seed(org_id: str, start: int, rows: int, rng: random.Random) -> None:
+    from sqlalchemy import insert
+
+    from src.database import engine
+    from src.jsonlib import dumps
+    from src.models import Verification, VerificationToken
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for batch in range(start, start + rows, 5000):
+            tokens, verifications = [], []
+            for i in range(batch, min(batch + 5000, start + rows)):
+                created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+                token_id = uuid.uuid4().hex
+                status = rng.choice(STATUSES)
+                tokens.append({
+                    "id": token_id, "token": "x", "email": f"c{i}@example.com", "full_name": f"Customer {i}",
+                    "organization_name": org_id, "organization_id": org_id, "created_at": created,
+                    "expires_at": created + timedelta(days=1), "used": True, "status": "completed",
+                })
+                verifications.append({
+                    "id": uuid.uuid4().hex, "token_id": token_id, "timestamp": created, "organization_id": org_id,
+                    "status": status, "personal_info": dumps({"full_name": f"Customer {i}", "email": f"c{i}@example.com"}),
+                    "verification_results": dumps({"status": status, "risk_score": 0.1}),
+                })
+            conn.execute(insert(VerificationToken), tokens)
+            conn.execute(insert(Verification), verifications)
+
+
+def old_stats() -> int:
+    """The old dashboard: every verification loaded and counted in Python."""
+    from src.services_verifications import list_verifications
+
+    return sum(1 for v in list_verifications() if v["verification_results"].get("status") == "verified")
+
+
+def timed(fn, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--small", type=int, default=2000, help="verifications of the small organization")
+    parser.add_argument("--large", type=int, default=200_000, help="verifications of the large one, at the end")
+    parser.add_argument("--steps", type=int, default=3, help="sizes the large organization is measured at")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--database-url", default=None, help="empty, migrated database (default: temp SQLite)")
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/tenants.jsonl")
+    args = parser.parse_args()
+
+    url = prepare_env(args.database_url)
+    from src.database import engine, session_scope
+    from src.migrations import upgrade
+    from src.services_organizations import organization_id_for
+    from src.services_verifications import export_verifications_csv, list_verifications, verification_stats
+
+    upgrade(engine)
+    with session_scope() as db:
+        small, large = organization_id_for(db, "Small Org"), organization_id_for(db, "Large Org")
+    rng = random.Random(42)
+    seed(small, 0, args.small, rng)
+
+    results = []
+    seeded = 0
+    for step in range(1, args.steps + 1):
+        target = args.large * step // args.steps
+        seed(large, args.small + seeded, target - seeded, rng)
+        seeded = target
+        results.append({
+            "large_rows": seeded,
+            "small_stats_ms": timed(lambda: verification_stats(organization_id=small), args.rounds),
+            "small_list_ms": timed(lambda: list_verifications(organization_id=small), args.rounds),
+            "small_export_ms": timed(lambda: sum(1 for _ in export_verifications_csv(organization_id=small)),
+                                     args.rounds),
+            "all_stats_ms": timed(verification_stats, args.rounds),
+            "old_stats_ms": timed(old_stats, 1),
+        })
+
+    print(f"\n{engine.dialect.name}, small organization: {args.small} verifications")
+    print(f"  {'large org rows':>14}{'small stats':>13}{'small list':>12}{'small csv':>11}"
+          f"{'all stats':>11}{'old stats':>11}   (ms, p50)")
+    for r in results:
+        print(f"  {r['large_rows']:>14}{r['small_stats_ms']:>13.1f}{r['small_list_ms']:>12.1f}"
+              f"{r['small_export_ms']:>11.1f}{r['all_stats_ms']:>11.1f}{r['old_stats_ms']:>11.0f}")
+
+    if not args.no_record:
+        append_history("tenants", {
+            "database": url.split(":", 1)[0], "small": args.small, "rounds": args.rounds, "results": results,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Peak memory of concurrent uploads: streamed to disk versus buffered.
+
+Each client thread pushes an upload of --size-mb through the upload service
+from a synthetic stream that produces bytes on demand, so the only large
+allocations are the ones the upload path itself makes. "streamed" is
+POST /api/uploads (save_upload_stream, one chunk at a time); "buffered" reads
+the whole body first, as request.get_data() or a parsed multipart form would.
+Peak traced Python memory is reported per concurrency level.
+
+Usage:
+    python benchmarks/upload_memory.py [--levels 1,8,32] [--size-mb 8] [--no-record]
+"""
+
+import argparse
+import io
+import shutil
+import sys
+import tempfile
+import threading
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import append_history, prepare_env
+
+
+class SyntheticStream(io.RawIOBase):
+    """``size`` copies of ``fill``, generated as they are read."""
+
+    def __init__(self, size: int, fill: int):
+        self.remaining = size
+        self.fill = bytes([fill])
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self.remaining)
+        buffer[:n] = self.fill * n
+        self.remaining -= n
+        return n
+
+
+def run_level(mode: str, concurrency: int, size: int, upload_dir: str) -> float:
+    from src.app_factory import create_app
+    from src.services_uploads import save_upload_stream
+
+    app = create_app()
+    barrier = threading.Barrier(concurrency)
+
+    def one(i: int):
+        # Distinct content per client, so no upload is deduplicated against another.
+        stream = io.BufferedReader(SyntheticStream(size, i % 256))
+        with app.app_context():
+            barrier.wait()
+            if mode == "buffered":
+                stream = io.BytesIO(stream.read())
+            save_upload_stream(stream, "bench.pdf", upload_dir, ["pdf"], size, content_length=size)
+
+    tracemalloc.start()
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    shutil.rmtree(upload_dir)
+    return round(peak / (1024 * 1024), 2)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,8,32", help="comma-separated concurrent uploads")
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/upload_memory.jsonl")
+    args = parser.parse_args()
+
+    prepare_env()
+    size = int(args.size_mb * 1024 * 1024)
+    upload_dir = tempfile.mkdtemp(prefix="verifai-uploads-")
+    levels = [int(level) for level in args.levels.split(",")]
+
+    results = []
+    for level in levels:
+        row = {"concurrency": level}
+        for mode in ("streamed", "buffered"):
+            row[f"{mode}_peak_mb"] = run_level(mode, level, size, upload_dir)
+        results.append(row)
+
+    print(f"\n{args.size_mb:g} MB uploads, peak traced memory (MB)")
+    print(f"  {'uploads':>8}{'streamed':>12}{'buffered':>12}")
+    for r in results:
+        print(f"  {r['concurrency']:>8}{r['streamed_peak_mb']:>12.2f}{r['buffered_peak_mb']:>12.2f}")
+
+    if not args.no_record:
+        append_history("upload_memory", {"size_mb": args.size_mb, "results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
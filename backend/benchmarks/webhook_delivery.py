@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Webhook delivery against a local stand-in receiver.
+
+Generates --events verification links (each writes a token.created outbox
+event), registers a webhook endpoint pointing at a threaded HTTP/1.1 server
+in this process, and runs the dispatcher until every delivery is delivered
+or dead-lettered. The receiver checks every signature, can add --latency-ms
+per request and fail a --fail-rate fraction of them with 503 to exercise
+retries and backoff.
+
+Runs twice: with the dispatcher's pooled keep-alive connections, and with
+"Connection: close" on every request. Reports deliveries/s, TCP connections
+opened, retries, dead letters and bad signatures.
+
+Usage:
+    python benchmarks/webhook_delivery.py [--events 500] [--concurrency 8]
+        [--latency-ms 5] [--fail-rate 0.1] [--max-attempts 4] [--no-record]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import LINK_PAYLOAD, admin_headers, append_history, prepare_env
+
+
+class Receiver:
+    """Threaded HTTP/1.1 server that records and verifies webhook requests."""
+
+    def __init__(self, latency_ms: float, fail_rate: float):
+        self.secret = None
+        self.lock = threading.Lock()
+        self.connections = self.requests = self.bad_signatures = 0
+        self.event_ids = set()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with receiver.lock:
+                    receiver.connections += 1
+
+            def do_POST(self):
+                from src.jsonlib import loads
+                from src.webhooks import SIGNATURE_HEADER, verify_signature
+
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                valid = verify_signature(receiver.secret, self.headers.get(SIGNATURE_HEADER, ""), body)
+                failed = random.random() < fail_rate
+                with receiver.lock:
+                    receiver.requests += 1
+                    receiver.bad_signatures += 0 if valid else 1
+                    if valid and not failed:
+                        receiver.event_ids.add(loads(body)["id"])
+                status = 503 if failed or not valid else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+
+    def reset(self):
+        with self.lock:
+            self.connections = self.requests = self.bad_signatures = 0
+            self.event_ids = set()
+
+
+def run_mode(keep_alive: bool, receiver: Receiver, concurrency: int, expected: int) -> dict:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from sqlalchemy import func, select, update
+
+    from src.database import session_scope
+    from src.models import OutboxEvent, WebhookDelivery
+    from src.webhooks import WebhookDispatcher
+
+    # Replay the same events: drop earlier deliveries and mark events undispatched.
+    with session_scope(own_transaction=True) as db:
+        db.execute(WebhookDelivery.__table__.delete())
+        db.execute(update(OutboxEvent).values(dispatched_at=None))
+    receiver.reset()
+
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=concurrency, max_retries=0)
+    http.mount("http://", adapter)
+    if not keep_alive:
+        http.headers["Connection"] = "close"
+    dispatcher = WebhookDispatcher(http_session=http, concurrency=concurrency)
+
+    start = time.perf_counter()
+    retries = 0
+    try:
+        while True:
+            stats = dispatcher.run_once()
+            retries += stats["retrying"]
+            with session_scope(own_transaction=True) as db:
+                open_count = db.scalar(select(func.count()).select_from(WebhookDelivery).where(
+                    WebhookDelivery.status.in_(["pending", "sending"])
+                ))
+                total = db.scalar(select(func.count()).select_from(WebhookDelivery))
+            if total >= expected and open_count == 0:
+                break
+            if not any(stats.values()):
+                time.sleep(0.01)
+    finally:
+        dispatcher.close()
+    wall = time.perf_counter() - start
+
+    with session_scope(own_transaction=True) as db:
+        dead = db.scalar(select(func.count()).select_from(WebhookDelivery).where(WebhookDelivery.status == "dead"))
+    return {
+        "mode": "keep-alive" if keep_alive else "close",
+        "delivered": len(receiver.event_ids),
+        "deliveries_per_s": round(len(receiver.event_ids) / wall, 1),
+        "requests": receiver.requests,
+        "connections": receiver.connections,
+        "retries": retries,
+        "dead": dead,
+        "bad_signatures": receiver.bad_signatures,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8, help="dispatcher threads (and endpoint limit)")
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--max-attempts", type=int, default=4)
+    parser.add_argument("--no-record", action="store_true", help="do not append to results/webhook_delivery.jsonl")
+    args = parser.parse_args()
+
+    prepare_env()
+    # Retry almost immediately so a run measures delivery, not backoff waits.
+    os.environ["WEBHOOK_BACKOFF_SECONDS"] = "0.01"
+    os.environ["WEBHOOK_MAX_ATTEMPTS"] = str(args.max_attempts)
+    os.environ["WEBHOOK_BATCH_SIZE"] = "200"
+    # The receiver listens on loopback.
+    os.environ["WEBHOOK_ALLOW_PRIVATE_URLS"] = "true"
+
+    from src.app_factory import create_app
+
+    receiver = Receiver(args.latency_ms, args.fail_rate)
+    client = create_app().test_client()
+    headers = admin_headers(client)
+    endpoint = client.post("/api/webhooks", json={
+        "url": receiver.url, "eventTypes": ["token.created"], "maxConcurrency": args.concurrency,
+    }, headers=headers).get_json()["endpoint"]
+    receiver.secret = endpoint["secret"]
+    for _ in range(args.events):
+        client.post("/api/generate-verification-link", json=LINK_PAYLOAD, headers=headers)
+
+    results = [run_mode(keep_alive, receiver, args.concurrency, args.events) for keep_alive in (True, False)]
+
+    print(f"\n{args.events} events, {args.concurrency} concurrent, receiver latency {args.latency_ms:g} ms, "
+          f"fail rate {args.fail_rate:.0%}, max attempts {args.max_attempts}")
+    print(f"  {'mode':<12}{'deliv/s':>9}{'delivered':>11}{'requests':>10}{'conns':>7}"
+          f"{'retries':>9}{'dead':>6}{'bad sig':>9}")
+    for r in results:
+        print(f"  {r['mode']:<12}{r['deliveries_per_s']:>9.1f}{r['delivered']:>11}{r['requests']:>10}"
+              f"{r['connections']:>7}{r['retries']:>9}{r['dead']:>6}{r['bad_signatures']:>9}")
+
+    if not args.no_record:
+        append_history("webhook_delivery", {
+            "events": args.events, "concurrency": args.concurrency, "latency_ms": args.latency_ms,
+            "fail_rate": args.fail_rate, "results": results,
+        })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,6 +36,8 @@ def create_admin_user():
             update = input("Update to admin? (y/n): ").strip().lower()
             if update == 'y':
                 existing.role = 'admin'
+                # Outside an organization, an admin made here runs the platform.
+                existing.is_platform = existing.organization_id is None
                 db.flush()
                 print(f"✓ User {email} updated to admin")
             return
@@ -44,7 +46,8 @@ def create_admin_user():
         user = User(
             email=email,
             password_hash=generate_password_hash(password),
-            role='admin'
+            role='admin',
+            is_platform=True,
         )
         db.add(user)
         db.flush()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Periodic maintenance tasks; run from cron or a scheduled job.
+
+Usage:
+    python maintenance.py purge-idempotency              Delete expired Idempotency-Key records
+    python maintenance.py gc-blobs [--grace-hours H]     Delete unreferenced upload blobs
+                                   [--dry-run]
+    python maintenance.py process-uploads [--limit N]    Process uploads the pipeline skipped
+    python maintenance.py purge-webhooks [--days 30]     Delete old delivered webhook history
+    python maintenance.py archive-verifications          Move old verifications to the cold archive
+                          [--days N] [--batch-size N] [--dry-run]
+    python maintenance.py maintain-partitions            Create future monthly partitions and drop
+                          [--dry-run]                    expired ones (Postgres, after migrate.py partition)
+    python maintenance.py reindex-search                 Rebuild the search index from the database
+    python maintenance.py rebuild-devices                Recompute device fingerprints and identities
+"""
+
+import argparse
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+# Add src to path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from src.archive import archive_verifications, archive_verifications_before
+from src.config import get_settings
+from src.database import bump_table_versions, engine
+from src.devices import rebuild as rebuild_devices
+from src.document_pipeline import process_pending
+from src.idempotency import purge_expired
+from src.partitioning import PARTITION_KEYS, add_months, drop_partition, ensure_partitions, expired_partitions
+from src.search import ensure_trigram_index, forget_tokens_before, reindex
+from src.services_uploads import collect_garbage
+from src.webhooks import purge_history
+
+
+def cmd_purge_idempotency(args) -> int:
+    deleted = purge_expired()
+    print(f"✓ Deleted {deleted} expired idempotency key(s)")
+    return 0
+
+
+def cmd_gc_blobs(args) -> int:
+    settings = get_settings()
+    grace_hours = settings.blob_gc_grace_hours if args.grace_hours is None else args.grace_hours
+    stats = collect_garbage(settings.upload_folder, timedelta(hours=grace_hours), dry_run=args.dry_run)
+    prefix = "Would delete" if args.dry_run else "Deleted"
+    print(f"✓ {prefix} {stats['blobs_deleted']} blob(s) ({stats['bytes_freed']} bytes) "
+          f"and {stats['stray_files_deleted']} stray file(s)")
+    return 0
+
+
+def cmd_process_uploads(args) -> int:
+    stats = process_pending(limit=args.limit)
+    print(f"✓ Processed {stats['processed']} upload(s), {stats['failed']} failed, "
+          f"{stats['reused']} reused an earlier result")
+    return 1 if stats["failed"] else 0
+
+
+def cmd_purge_webhooks(args) -> int:
+    deleted = purge_history(timedelta(days=args.days))
+    print(f"✓ Deleted {deleted} delivered webhook record(s) older than {args.days} days")
+    return 0
+
+
+def cmd_archive_verifications(args) -> int:
+    days = get_settings().verification_retention_days if args.days is None else args.days
+    if days <= 0:
+        print("Retention is disabled (VERIFICATION_RETENTION_DAYS=0)")
+        return 0
+    stats = archive_verifications(timedelta(days=days), batch_size=args.batch_size, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"✓ Would archive {stats['archived']} verification(s) older than {days} days")
+    else:
+        print(f"✓ Archived {stats['archived']} verification(s) older than {days} days "
+              f"into {stats['segments']} segment(s), {stats['bytes']} bytes")
+    return 0
+
+
+def cmd_maintain_partitions(args) -> int:
+    settings = get_settings()
+    if engine.dialect.name != "postgresql":
+        print("Nothing to do: partitioning requires PostgreSQL")
+        return 0
+    if not args.dry_run:
+        with engine.begin() as conn:
+            created = ensure_partitions(conn, settings.partition_months_ahead)
+        print(f"✓ Created {len(created)} partition(s)")
+    if settings.partition_retention_months <= 0:
+        print("Retention is disabled (PARTITION_RETENTION_MONTHS=0)")
+        return 0
+    with engine.connect() as conn:
+        expired = {table: expired_partitions(conn, table, settings.partition_retention_months)
+                   for table in PARTITION_KEYS}
+    for table, partitions in expired.items():
+        for name, month in partitions:
+            if args.dry_run:
+                print(f"  Would drop {name}")
+                continue
+            if table == "verifications":
+                # Keep the records: move the month to the cold archive first.
+                stats = archive_verifications_before(add_months(month, 1))
+                print(f"✓ Archived {stats['archived']} verification(s) from {name}")
+            with engine.begin() as conn:
+                if table == "verification_tokens":
+                    forget_tokens_before(conn, add_months(month, 1))
+                drop_partition(conn, table, name)
+                # Listings, ETags and cached dashboard stats follow these counters.
+                bump_table_versions(conn, table)
+            print(f"✓ Dropped {name}")
+    return 0
+
+
+def cmd_reindex_search(args) -> int:
+    with engine.begin() as conn:
+        # Picks up pg_trgm if it was installed after the search index migration.
+        ensure_trigram_index(conn)
+        written = reindex(conn)
+    print(f"✓ Indexed {written} token(s) and verification(s)")
+    return 0
+
+
+def cmd_rebuild_devices(args) -> int:
+    with engine.begin() as conn:
+        read = rebuild_devices(conn)
+    print(f"✓ Fingerprinted {read} verification(s)")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="VerifAi maintenance tasks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser(
+        "purge-idempotency", help="delete expired Idempotency-Key records",
+    ).set_defaults(func=cmd_purge_idempotency)
+
+    p_gc = sub.add_parser("gc-blobs", help="delete upload blobs no upload refers to")
+    p_gc.add_argument("--grace-hours", type=float, default=None,
+                      help="only delete blobs unreferenced this long (default BLOB_GC_GRACE_HOURS)")
+    p_gc.add_argument("--dry-run", action="store_true", help="report what would be deleted")
+    p_gc.set_defaults(func=cmd_gc_blobs)
+
+    p_process = sub.add_parser("process-uploads", help="process pending or interrupted uploads")
+    p_process.add_argument("--limit", type=int, default=100)
+    p_process.set_defaults(func=cmd_process_uploads)
+
+    p_webhooks = sub.add_parser("purge-webhooks", help="delete delivered webhook history")
+    p_webhooks.add_argument("--days", type=int, default=30)
+    p_webhooks.set_defaults(func=cmd_purge_webhooks)
+
+    p_archive = sub.add_parser("archive-verifications", help="move old verifications to compressed segments")
+    p_archive.add_argument("--days", type=int, default=None,
+                           help="archive verifications older than this (default VERIFICATION_RETENTION_DAYS)")
+    p_archive.add_argument("--batch-size", type=int, default=2000, help="verifications per segment")
+    p_archive.add_argument("--dry-run", action="store_true", help="report how many would be archived")
+    p_archive.set_defaults(func=cmd_archive_verifications)
+
+    p_partitions = sub.add_parser("maintain-partitions", help="create future partitions and drop expired ones")
+    p_partitions.add_argument("--dry-run", action="store_true", help="report which partitions would be dropped")
+    p_partitions.set_defaults(func=cmd_maintain_partitions)
+
+    sub.add_parser(
+        "reindex-search", help="rebuild the search index from tokens and verifications",
+    ).set_defaults(func=cmd_reindex_search)
+
+    sub.add_parser(
+        "rebuild-devices", help="recompute device fingerprints and device_identities from verifications",
+    ).set_defaults(func=cmd_rebuild_devices)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Schema migration CLI.
+
+Usage:
+    python migrate.py upgrade [--to VERSION]   Apply pending migrations
+    python migrate.py current                  Show the applied schema version
+    python migrate.py history                  List applied migrations
+    python migrate.py check                    Verify key queries use their indexes
+    python migrate.py partition                Partition verifications and tokens by month
+                      [--months-ahead N]       (Postgres only)
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add src to path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from src.config import get_settings
+from src.database import engine
+from src.migrations import applied_migrations, current_version, latest_version, upgrade
+from src.partitioning import PARTITION_KEYS, convert_table, ensure_partitions, explain_pruning, is_partitioned
+from src.query_plans import explain_key_queries
+
+
+def cmd_upgrade(args) -> int:
+    applied = upgrade(engine, target=args.to)
+    if applied:
+        print(f"✓ Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        print("✓ Database already up to date")
+    print(f"  Schema version: {current_version(engine)}")
+    with engine.begin() as conn:
+        created = ensure_partitions(conn, get_settings().partition_months_ahead)
+    if created:
+        print(f"✓ Created partitions: {', '.join(created)}")
+    return 0
+
+
+def cmd_current(args) -> int:
+    version = current_version(engine)
+    print(f"Schema version: {version} (latest: {latest_version()})")
+    return 0 if version == latest_version() else 1
+
+
+def cmd_history(args) -> int:
+    for row in applied_migrations(engine):
+        print(f"{row['version']:>4}  {row['applied_at']}  {row['name']}")
+    return 0
+
+
+def cmd_check(args) -> int:
+    failures = 0
+    for result in explain_key_queries(engine):
+        mark = "✓" if result["uses_index"] else "✗"
+        print(f"{mark} {result['query']} -> {result['index']}")
+        if not result["uses_index"]:
+            failures += 1
+            for line in result["plan"].splitlines():
+                print(f"    {line}")
+    with engine.connect() as conn:
+        pruning = explain_pruning(conn)
+    for result in pruning:
+        pruned = result["scanned"] <= 1
+        mark = "✓" if pruned else "✗"
+        print(f"{mark} one month of {result['table']} -> {result['scanned']} of {result['partitions']} partitions")
+        if not pruned:
+            failures += 1
+            for line in result["plan"].splitlines():
+                print(f"    {line}")
+    return 1 if failures else 0
+
+
+def cmd_partition(args) -> int:
+    if engine.dialect.name != "postgresql":
+        print("✗ Partitioning requires PostgreSQL")
+        return 1
+    if current_version(engine) != latest_version():
+        print("✗ Run `python migrate.py upgrade` first")
+        return 1
+    months_ahead = get_settings().partition_months_ahead if args.months_ahead is None else args.months_ahead
+    with engine.begin() as conn:
+        for table in PARTITION_KEYS:
+            if is_partitioned(conn, table):
+                print(f"✓ {table} is already partitioned")
+                continue
+            copied = convert_table(conn, table, months_ahead)
+            print(f"✓ Partitioned {table} by {PARTITION_KEYS[table]} ({copied} rows)")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="VerifAi schema migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_upgrade = sub.add_parser("upgrade", help="apply pending migrations")
+    p_upgrade.add_argument("--to", type=int, default=None, help="stop at this version")
+    p_upgrade.set_defaults(func=cmd_upgrade)
+
+    sub.add_parser("current", help="show the applied schema version").set_defaults(func=cmd_current)
+    sub.add_parser("history", help="list applied migrations").set_defaults(func=cmd_history)
+    sub.add_parser("check", help="verify key queries use their indexes").set_defaults(func=cmd_check)
+
+    p_partition = sub.add_parser("partition", help="partition verifications and tokens by month (Postgres)")
+    p_partition.add_argument("--months-ahead", type=int, default=None,
+                             help="future months to create (default PARTITION_MONTHS_AHEAD)")
+    p_partition.set_defaults(func=cmd_partition)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,26 +5,35 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 
-from .config import load_settings
-from .database import Base, engine
+from .compression import init_compression
+from .config import get_settings
+from .database import get_engine, init_request_sessions
 from .errors import AppError
+from .jsonlib import ENGINE as JSON_ENGINE, FastJSONProvider
+from .logging_setup import configure_logging
+from .metrics import init_metrics
+from .migrations import ensure_schema
+from .routes_admin import bp_admin
 from .routes_api_keys import bp_api_keys
 from .routes_auth import bp_auth
+from .routes_changes import bp_changes
+from .routes_search import bp_search
+from .routes_uploads import bp_uploads
 from .routes_verification import bp_verification
+from .routes_webhooks import bp_webhooks
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
 def create_app() -> Flask:
-    settings = load_settings()
+    """Build the Flask app. Entry points call this once; nothing runs at import."""
+    settings = get_settings()
+    configure_logging(settings.log_level, settings.log_format, settings.log_info_sample_rate)
     app = Flask(__name__)
     
     logger.info("[APP] Initializing Flask application")
+    app.json = FastJSONProvider(app)
+    logger.info("[APP] JSON engine: %s", JSON_ENGINE)
     
     # Configure JWT
     logger.info("[APP] Configuring JWT")
@@ -33,48 +42,50 @@ def create_app() -> Flask:
     
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
-        logger.warning(f"[JWT] Expired token detected")
+        logger.warning("[JWT] Expired token detected")
         return jsonify({"error": "Token has expired"}), 401
     
     @jwt.invalid_token_loader
     def invalid_token_callback(error):
-        logger.warning(f"[JWT] Invalid token: {error}")
+        logger.warning("[JWT] Invalid token: %s", error)
         return jsonify({"error": "Invalid token"}), 401
     
     @jwt.unauthorized_loader
     def unauthorized_callback(error):
-        logger.warning(f"[JWT] Unauthorized access: {error}")
+        logger.warning("[JWT] Unauthorized access: %s", error)
         return jsonify({"error": "Missing or invalid authorization"}), 401
 
-    logger.info(f"[APP] Configuring CORS with origins: {settings.cors_origins}")
+    logger.info("[APP] Configuring CORS with origins: %s", settings.cors_origins)
     CORS(
         app,
         origins=settings.cors_origins,
         supports_credentials=True,
-        allow_headers=["Content-Type", "Authorization"],
-        expose_headers=["Content-Type"],
+        allow_headers=["Content-Type", "Authorization", "Idempotency-Key", "X-Filename", "X-API-Key"],
+        expose_headers=["Content-Type", "Idempotent-Replayed"],
         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
     )
 
-    logger.info("[APP] Creating database tables")
+    logger.info("[APP] Checking database schema version")
     try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("[APP] Database tables created successfully")
+        version = ensure_schema(get_engine(), auto_migrate=settings.auto_migrate)
+        logger.info("[APP] Database schema is at version %s", version)
     except Exception as e:
-        logger.error(f"[APP] Database initialization failed: {str(e)}")
+        logger.error("[APP] Database initialization failed: %s", e)
         raise
 
+    if settings.metrics_enabled:
+        init_metrics(app, token=settings.metrics_token)
+    init_request_sessions(app)
+    init_compression(app, min_size=settings.compress_min_bytes)
+
     @app.errorhandler(AppError)
     def handle_app_error(error: AppError):
-        logger.error(f"[APP] AppError: {error.message} (status: {error.status_code})")
+        logger.error("[APP] AppError: %s (status: %s)", error.message, error.status_code)
         return jsonify({"error": error.message}), error.status_code
     
     @app.errorhandler(Exception)
     def handle_exception(error: Exception):
-        logger.error(f"[APP] Unhandled exception: {str(error)}")
-        logger.error(f"[APP] Exception type: {type(error).__name__}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception("[APP] Unhandled exception (%s): %s", type(error).__name__, error)
         return jsonify({"error": "Internal server error", "details": str(error)}), 500
 
     @app.route("/")
@@ -89,10 +100,12 @@ def create_app() -> Flask:
     app.register_blueprint(bp_auth)
     app.register_blueprint(bp_verification)
     app.register_blueprint(bp_api_keys)
+    app.register_blueprint(bp_admin)
+    app.register_blueprint(bp_uploads)
+    app.register_blueprint(bp_webhooks)
+    app.register_blueprint(bp_changes)
+    app.register_blueprint(bp_search)
     logger.info("[APP] All blueprints registered successfully")
 
     logger.info("[APP] Flask application initialized successfully")
     return app
-
-
-app = create_app()
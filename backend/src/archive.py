@@ -0,0 +1,254 @@
+"""Cold archive for old verifications.
+
+``archive_verifications`` (``python maintenance.py archive-verifications``)
+moves verifications older than VERIFICATION_RETENTION_DAYS out of the hot
+table into segment files under ARCHIVE_DIR:
+
+    verifications/2026/10/<segment>.ndjson.zst   one stored row per line
+    verifications/2026/10/<segment>.idx.json     sidecar index
+
+A segment is a run of independently compressed blocks of BLOCK_SIZE rows
+(zstd frames or gzip members, so ``zstdcat``/``zcat`` still read the whole
+file). The sidecar lists each block's offset, length, timestamp range and
+ids, and ``archived_verifications`` maps every id to its segment and block,
+so fetching one record or a date range decompresses only the blocks
+involved. Segment files are fsynced before the transaction that records
+them and deletes the hot rows commits; if that fails they are removed.
+"""
+
+import gzip
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from .config import get_settings
+from .database import mark_tables_changed, session_scope
+from .errors import NotFoundError
+from .jsonlib import dumps, loads
+from .models import ArchivedVerification, ArchiveSegment, Verification
+from .services_verifications import verification_to_dict
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 256
+
+
+@dataclass(frozen=True)
+class _Codec:
+    name: str
+    suffix: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def _codec(name: str) -> _Codec:
+    if name == "gzip":
+        return _Codec("gzip", ".ndjson.gz", lambda b: gzip.compress(b, 6), gzip.decompress)
+    if name == "zstd":
+        import zstandard
+
+        # Frames record their content size, so decompress() needs no hint.
+        return _Codec("zstd", ".ndjson.zst", zstandard.ZstdCompressor(level=10).compress,
+                      zstandard.ZstdDecompressor().decompress)
+    raise ValueError(f"Unknown archive codec: {name}")
+
+
+def _writer_codec() -> _Codec:
+    name = get_settings().archive_compression
+    try:
+        return _codec(name)
+    except ImportError:
+        logger.warning("[ARCHIVE] zstandard is not installed, writing gzip segments")
+        return _codec("gzip")
+
+
+def _stored_row(record: Verification) -> Dict:
+    row = {column.key: getattr(record, column.key) for column in Verification.__table__.columns}
+    row["timestamp"] = record.timestamp.isoformat()
+    return row
+
+
+def _record_from_row(row: Dict) -> Verification:
+    # Transient, never added to a session; only used to share the API format.
+    return Verification(**{**row, "timestamp": datetime.fromisoformat(row["timestamp"])})
+
+
+def _archived_to_dict(row: Dict) -> Dict:
+    return {**verification_to_dict(_record_from_row(row)), "archived": True}
+
+
+def _write_file(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _sidecar_path(segment_path: str) -> str:
+    return segment_path.split(".ndjson", 1)[0] + ".idx.json"
+
+
+def _remove_quietly(*paths: str) -> None:
+    for path in paths:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _write_segment(archive_dir: str, segment_id: str, rows: List[Dict], codec: _Codec):
+    """Write ``rows`` (in timestamp order) and its sidecar; returns (relative path, blocks, size)."""
+    first = datetime.fromisoformat(rows[0]["timestamp"])
+    rel_path = os.path.join("verifications", f"{first:%Y}", f"{first:%m}", segment_id + codec.suffix)
+    path = os.path.join(archive_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    data = bytearray()
+    blocks = []
+    for start in range(0, len(rows), BLOCK_SIZE):
+        chunk = rows[start:start + BLOCK_SIZE]
+        compressed = codec.compress("".join(dumps(r) + "\n" for r in chunk).encode())
+        blocks.append({
+            "offset": len(data),
+            "length": len(compressed),
+            "count": len(chunk),
+            "min_timestamp": chunk[0]["timestamp"],
+            "max_timestamp": chunk[-1]["timestamp"],
+            "ids": [r["id"] for r in chunk],
+        })
+        data += compressed
+    _write_file(path, bytes(data))
+    try:
+        _write_file(_sidecar_path(path), dumps({
+            "segment": segment_id, "codec": codec.name, "count": len(rows), "blocks": blocks,
+        }).encode())
+    except Exception:
+        _remove_quietly(path)
+        raise
+    return rel_path, blocks, len(data)
+
+
+def archive_verifications(older_than: timedelta, batch_size: int = 2000, dry_run: bool = False) -> Dict:
+    """Move verifications older than ``older_than`` into segments of up to ``batch_size`` rows."""
+    return archive_verifications_before(datetime.utcnow() - older_than, batch_size, dry_run)
+
+
+def archive_verifications_before(cutoff: datetime, batch_size: int = 2000, dry_run: bool = False) -> Dict:
+    settings = get_settings()
+    stats = {"archived": 0, "segments": 0, "bytes": 0}
+    if dry_run:
+        with session_scope(readonly=True) as db:
+            stats["archived"] = db.scalar(
+                select(func.count()).select_from(Verification).where(Verification.timestamp < cutoff)
+            )
+        return stats
+
+    codec = _writer_codec()
+    while True:
+        paths: List[str] = []
+        try:
+            with session_scope(own_transaction=True) as db:
+                records = db.scalars(
+                    select(Verification).where(Verification.timestamp < cutoff)
+                    .order_by(Verification.timestamp, Verification.id).limit(batch_size)
+                ).all()
+                if not records:
+                    return stats
+                rows = [_stored_row(r) for r in records]
+                segment_id = f"vseg_{records[0].timestamp:%Y%m%dT%H%M%S}_{uuid.uuid4().hex[:8]}"
+                rel_path, blocks, size = _write_segment(settings.archive_dir, segment_id, rows, codec)
+                full_path = os.path.join(settings.archive_dir, rel_path)
+                paths = [full_path, _sidecar_path(full_path)]
+
+                db.add(ArchiveSegment(
+                    id=segment_id, path=rel_path, codec=codec.name, record_count=len(rows), size_bytes=size,
+                    min_timestamp=records[0].timestamp, max_timestamp=records[-1].timestamp,
+                    created_at=datetime.utcnow(),
+                ))
+                db.execute(insert(ArchivedVerification), [
+                    {"id": r.id, "token_id": r.token_id, "timestamp": r.timestamp,
+                     "segment_id": segment_id, "block": i // BLOCK_SIZE, "organization_id": r.organization_id}
+                    for i, r in enumerate(records)
+                ])
+                db.execute(delete(Verification).where(Verification.id.in_([r.id for r in records])))
+                mark_tables_changed(db, "verifications")
+        except Exception:
+            _remove_quietly(*paths)
+            raise
+        logger.info("[ARCHIVE] Archived %d verification(s) to %s (%d bytes)", len(rows), rel_path, size)
+        stats["archived"] += len(rows)
+        stats["segments"] += 1
+        stats["bytes"] += size
+        if len(rows) < batch_size:
+            return stats
+
+
+@lru_cache(maxsize=64)
+def _load_sidecar(path: str) -> Dict:
+    # Segments and sidecars never change once written.
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def _read_block(segment: ArchiveSegment, block: int) -> List[Dict]:
+    path = os.path.join(get_settings().archive_dir, segment.path)
+    entry = _load_sidecar(_sidecar_path(path))["blocks"][block]
+    with open(path, "rb") as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["length"])
+    return [loads(line) for line in _codec(segment.codec).decompress(data).splitlines() if line]
+
+
+def _fetch(pointers: List[ArchivedVerification], segments: Dict[str, ArchiveSegment]) -> List[Dict]:
+    wanted = {p.id for p in pointers}
+    found: Dict[str, Dict] = {}
+    for segment_id, block in dict.fromkeys((p.segment_id, p.block) for p in pointers):
+        for row in _read_block(segments[segment_id], block):
+            if row["id"] in wanted:
+                found[row["id"]] = row
+    return [_archived_to_dict(found[p.id]) for p in pointers if p.id in found]
+
+
+def _lookup(where, limit: Optional[int] = None) -> List[Dict]:
+    with session_scope(readonly=True) as db:
+        stmt = select(ArchivedVerification).where(where).order_by(ArchivedVerification.timestamp)
+        pointers = db.scalars(stmt.limit(limit) if limit else stmt).all()
+        segment_ids = {p.segment_id for p in pointers}
+        segments = {s.id: s for s in db.scalars(select(ArchiveSegment).where(ArchiveSegment.id.in_(segment_ids)))}
+        db.expunge_all()
+    return _fetch(pointers, segments)
+
+
+def _in_organization(where, organization_id: Optional[str]):
+    return where if organization_id is None else where & (ArchivedVerification.organization_id == organization_id)
+
+
+def get_archived_verification(verification_id: str, organization_id: Optional[str] = None) -> Dict:
+    records = _lookup(_in_organization(ArchivedVerification.id == verification_id, organization_id))
+    if not records:
+        raise NotFoundError("Archived verification not found")
+    return records[0]
+
+
+def list_archived_verifications(start: datetime, end: datetime, limit: int = 100,
+                                organization_id: Optional[str] = None) -> List[Dict]:
+    """Archived verifications with ``start <= timestamp < end``, oldest first."""
+    where = (ArchivedVerification.timestamp >= start) & (ArchivedVerification.timestamp < end)
+    return _lookup(_in_organization(where, organization_id), limit)
+
+
+def archived_count(organization_id: Optional[str] = None) -> int:
+    with session_scope(readonly=True) as db:
+        if organization_id is not None:
+            return db.scalar(select(func.count()).select_from(ArchivedVerification).where(
+                ArchivedVerification.organization_id == organization_id
+            ))
+        return db.scalar(select(func.coalesce(func.sum(ArchiveSegment.record_count), 0)))
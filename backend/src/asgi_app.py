@@ -0,0 +1,350 @@
+"""ASGI application for the public verification endpoints.
+
+validate-token, submit-verification and verification-declined are called by
+customers and spend most of their time waiting on the database, so they are
+served here on the async engine: one worker keeps many requests in flight
+instead of one per sync worker. Token checks, scoring and response bodies
+are shared with the Flask routes. Any other path goes to ``fallback`` (the
+Flask app wrapped for ASGI) or gets a 404.
+
+``/api/events/stream`` is a Server-Sent Events stream of token and
+verification events from ``pubsub``. It is served here because a waiting
+stream only holds its connection, where in a sync worker it would hold the
+worker.
+"""
+
+import asyncio
+import logging
+from urllib.parse import parse_qs
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import get_settings
+from .database import async_session_scope, dispose_async_engine, get_engine
+from .errors import AppError, UnauthorizedError, ValidationError
+from .idempotency import (
+    IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, StoredResponse, begin, complete_async, record_id, release, request_hash,
+)
+from .jsonlib import dumps, loads
+from .metrics import finish_request, install_engine_hooks, start_request
+from .migrations import ensure_schema
+from .pubsub import get_broker, shutdown as shutdown_pubsub
+from .routes_verification import declined_payload, token_validated_body
+from .services_api_keys import authenticate_api_key
+from .services_tokens import link_serializer, mark_token_status_async, validate_token_async
+from .services_verifications import create_verification_from_payload_async
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1024 * 1024
+
+Handler = Callable[[dict, str], Awaitable[Tuple[int, dict]]]
+
+# Reservation id of the current request's Idempotency-Key, if it sent one.
+_idempotency_rid: ContextVar[Optional[str]] = ContextVar("idempotency_rid", default=None)
+
+
+async def _validate_token(data: dict, client_ip: str) -> Tuple[int, dict]:
+    async with async_session_scope() as db:
+        verification_data = await validate_token_async(db, link_serializer(), data.get("token"), announce=True)
+    return 200, token_validated_body(verification_data)
+
+
+async def _decline_verification(data: dict, client_ip: str) -> Tuple[int, dict]:
+    async with async_session_scope() as db:
+        verification_data = await validate_token_async(db, link_serializer(), data.get("token"))
+        token_id = verification_data["tokenId"]
+        await mark_token_status_async(db, token_id, status="declined", used=True)
+        await create_verification_from_payload_async(db, declined_payload(verification_data), token_id, client_ip)
+    return 200, {"message": "Verification decline recorded", "status": "success"}
+
+
+async def _submit_verification(data: dict, client_ip: str) -> Tuple[int, dict]:
+    async with async_session_scope() as db:
+        token = data.get("token")
+        token_id = None
+        verification_payload = data
+        if token:
+            verification_data = await validate_token_async(db, link_serializer(), token)
+            token_id = verification_data["tokenId"]
+            await mark_token_status_async(db, token_id, status="completed", used=True)
+            verification_payload = {**verification_payload, **verification_data}
+        result = await create_verification_from_payload_async(db, verification_payload, token_id, client_ip)
+        rid = _idempotency_rid.get()
+        if rid is not None:
+            await complete_async(db, rid, 200, dumps(result) + "\n", "application/json")
+    return 200, result
+
+
+ROUTES: Dict[str, Handler] = {
+    "/api/validate-token": _validate_token,
+    "/api/submit-verification": _submit_verification,
+    "/api/verification-declined": _decline_verification,
+}
+
+# Routes honouring Idempotency-Key; scopes match the Flask routes' so a retry
+# replays whichever server handled the first attempt.
+IDEMPOTENT_SCOPES: Dict[str, str] = {
+    "/api/submit-verification": "submit-verification",
+}
+
+# Server-Sent Events stream of token and verification events.
+EVENT_STREAM_PATH = "/api/events/stream"
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+async def _read_body(receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("client disconnected")
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise _BodyTooLarge()
+        if not message.get("more_body", False):
+            return bytes(body)
+
+
+def _cors_headers(scope: dict, preflight: bool, methods: bytes = b"POST, OPTIONS") -> List[Tuple[bytes, bytes]]:
+    # Mirrors the flask-cors setup in create_app (credentials, echoed origin).
+    origin = dict(scope.get("headers", [])).get(b"origin")
+    allowed = get_settings().cors_origins
+    if not origin or ("*" not in allowed and origin.decode("latin-1") not in allowed):
+        return []
+    headers = [
+        (b"access-control-allow-origin", origin),
+        (b"access-control-allow-credentials", b"true"),
+        (b"vary", b"Origin"),
+    ]
+    if preflight:
+        headers += [
+            (b"access-control-allow-methods", methods),
+            (b"access-control-allow-headers", b"Content-Type, Authorization, Idempotency-Key, X-API-Key"),
+        ]
+    else:
+        headers.append((b"access-control-expose-headers", b"Content-Type, Idempotent-Replayed"))
+    return headers
+
+
+async def _send(send, status: int, payload: bytes, content_type: Optional[str],
+                extra_headers: List[Tuple[bytes, bytes]]) -> None:
+    headers = [(b"content-length", str(len(payload)).encode())] + extra_headers
+    if content_type is not None:
+        headers.append((b"content-type", content_type.encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _send_json(send, status: int, body: Optional[dict], extra_headers: List[Tuple[bytes, bytes]]) -> None:
+    if body is None:
+        await _send(send, status, b"", None, extra_headers)
+    else:
+        await _send(send, status, (dumps(body) + "\n").encode(), "application/json", extra_headers)
+
+
+class PublicVerificationApp:
+    def __init__(self, fallback=None):
+        self.fallback = fallback
+        self.metrics = get_settings().metrics_enabled
+        if self.metrics:
+            install_engine_hooks()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] == "http" and scope.get("path") == EVENT_STREAM_PATH:
+            await self._event_stream(scope, receive, send)
+            return
+        handler = ROUTES.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if handler is None:
+            if self.fallback is not None:
+                await self.fallback(scope, receive, send)
+            elif scope["type"] == "http":
+                await _send_json(send, 404, {"error": "Not found"}, [])
+            return
+
+        method = scope["method"]
+        if method == "OPTIONS":
+            await _send_json(send, 200, None, _cors_headers(scope, preflight=True))
+            return
+        cors = _cors_headers(scope, preflight=False)
+        if method != "POST":
+            await _send_json(send, 405, {"error": "Method not allowed"}, cors + [(b"allow", b"POST, OPTIONS")])
+            return
+
+        started = start_request() if self.metrics else None
+        rid = None
+        try:
+            body = await _read_body(receive)
+            rid, replay = await self._reserve_idempotency_key(scope, body)
+            if replay is not None:
+                status = replay.status_code
+                await _send(send, status, replay.body.encode(), replay.content_type,
+                            cors + [(b"idempotent-replayed", b"true")])
+                if started is not None:
+                    finish_request(started, scope["path"], method, status)
+                return
+            data = loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ValidationError("Request body must be a JSON object")
+            client_ip = (scope.get("client") or ("", 0))[0]
+            _idempotency_rid.set(rid)
+            status, result = await handler(data, client_ip)
+        except ConnectionError:
+            if rid is not None:
+                await asyncio.to_thread(release, rid)
+            return
+        except _BodyTooLarge:
+            status, result = 413, {"error": "Request body too large", "status": "error"}
+        except AppError as exc:
+            status, result = exc.status_code, {"error": exc.message, "status": "error"}
+        except ValueError:
+            status, result = 400, {"error": "Invalid JSON body", "status": "error"}
+        except Exception:
+            logger.exception("[ASGI] Unhandled error on %s", scope["path"])
+            status, result = 500, {"error": "Internal server error"}
+        if rid is not None and status >= 400:
+            await asyncio.to_thread(release, rid)
+        await _send_json(send, status, result, cors)
+        if started is not None:
+            finish_request(started, scope["path"], method, status)
+
+    async def _reserve_idempotency_key(self, scope: dict, body: bytes) -> Tuple[Optional[str], Optional[StoredResponse]]:
+        """Reserve the request's Idempotency-Key, if the route takes one and it was sent.
+
+        Returns ``(rid, None)`` when the handler should run (``rid`` is None
+        without a key) or ``(None, stored)`` to replay an earlier response.
+        """
+        idempotency_scope = IDEMPOTENT_SCOPES.get(scope["path"])
+        key = dict(scope.get("headers", [])).get(IDEMPOTENCY_HEADER.lower().encode())
+        if idempotency_scope is None or not key:
+            return None, None
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError(f"{IDEMPOTENCY_HEADER} is too long")
+        rid = record_id(idempotency_scope, None, key.decode("latin-1"))
+        stored = await asyncio.to_thread(begin, rid, request_hash(body))
+        return (rid, None) if stored is None else (None, stored)
+
+    async def _event_stream(self, scope, receive, send):
+        method = scope["method"]
+        if method == "OPTIONS":
+            await _send_json(send, 200, None, _cors_headers(scope, preflight=True, methods=b"GET, OPTIONS"))
+            return
+        cors = _cors_headers(scope, preflight=False)
+        if method != "GET":
+            await _send_json(send, 405, {"error": "Method not allowed"}, cors + [(b"allow", b"GET, OPTIONS")])
+            return
+        query = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        try:
+            key_id, organization_id = await _authenticate_stream(scope, query)
+        except AppError as exc:
+            await _send_json(send, exc.status_code, {"error": exc.message, "status": "error"}, cors)
+            return
+
+        types = [t.strip() for t in query.get("types", "").split(",") if t.strip()]
+        broker = get_broker()
+        # API key holders only ever see their own key's events, signed-in users their organization's.
+        subscription = broker.subscribe(
+            api_key_id=key_id or query.get("apiKeyId"), organization_id=organization_id, types=types,
+        )
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        getter = None
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": cors + [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ]})
+            await send({"type": "http.response.body", "body": b"retry: 5000\n\n", "more_body": True})
+            heartbeat = get_settings().sse_heartbeat_seconds
+            while True:
+                getter = getter or asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait({getter, disconnected}, timeout=heartbeat,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    return
+                if getter not in done:
+                    chunk = b": keepalive\n\n"
+                else:
+                    message, getter = getter.result(), None
+                    if message is None:
+                        # Too far behind: end the stream and let the client reconnect.
+                        break
+                    chunk = (f"id: {message.event_id}\nevent: {message.event_type}\n"
+                             f"data: {message.payload}\n\n").encode()
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        except OSError:
+            # Client went away mid-send.
+            return
+        finally:
+            broker.unsubscribe(subscription)
+            disconnected.cancel()
+            if getter is not None:
+                getter.cancel()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    settings = get_settings()
+                    await asyncio.to_thread(ensure_schema, get_engine(), settings.auto_migrate)
+                except Exception as e:
+                    logger.error("[ASGI] Startup failed: %s", e)
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                shutdown_pubsub()
+                await dispose_async_engine()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def _wait_for_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _authenticate_stream(scope: dict, query: Dict[str, str]) -> Tuple[Optional[str], Optional[str]]:
+    """(API key id, organization id) the stream is limited to; None for either is no limit.
+
+    EventSource cannot set headers, so browsers pass the access token as
+    ``?access_token=``; integrations send ``X-API-Key`` or a bearer token.
+    The organization comes from the token's ``org`` claim, as in tenancy.py:
+    only platform users may pick one with ``?organizationId=``, or see all.
+    """
+    headers = dict(scope.get("headers", []))
+    api_key = headers.get(b"x-api-key")
+    if api_key:
+        return await asyncio.to_thread(authenticate_api_key, api_key.decode("latin-1")), None
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    token = authorization[7:] if authorization.lower().startswith("bearer ") else query.get("access_token")
+    if not token:
+        raise UnauthorizedError("Missing or invalid authorization")
+    # PyJWT comes with flask_jwt_extended, which signs these tokens with HS256.
+    import jwt
+
+    try:
+        claims = jwt.decode(token, get_settings().jwt_secret, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError as e:
+        raise UnauthorizedError("Token has expired") from e
+    except jwt.InvalidTokenError as e:
+        raise UnauthorizedError("Invalid token") from e
+    if claims.get("type") != "access":
+        raise UnauthorizedError("Invalid token")
+    if claims.get("org"):
+        return None, claims["org"]
+    if not claims.get("platform"):
+        raise AppError("Your account does not belong to an organization yet", status_code=403)
+    return None, query.get("organizationId") or None
+
+
+def create_asgi_app(fallback=None) -> PublicVerificationApp:
+    return PublicVerificationApp(fallback)
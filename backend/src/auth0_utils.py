@@ -2,16 +2,9 @@ import json
 from functools import wraps
 from typing import Any, Dict
 
-import requests
 from flask import request, jsonify, g
-try:
-    from jose import jwt  # type: ignore
-except Exception:
-    import jwt  # type: ignore
 
-from .config import load_settings
-
-settings = load_settings()
+from .config import get_settings
 
 ALGORITHMS = ["RS256"]
 _jwks_cache: Dict[str, Any] | None = None
@@ -21,7 +14,9 @@ def _get_jwks():
     global _jwks_cache
     if _jwks_cache:
         return _jwks_cache
-    jwks_url = f"https://{settings.auth0_domain}/.well-known/jwks.json"
+    import requests
+
+    jwks_url = f"https://{get_settings().auth0_domain}/.well-known/jwks.json"
     resp = requests.get(jwks_url, timeout=5)
     resp.raise_for_status()
     _jwks_cache = resp.json()
@@ -44,10 +39,20 @@ def _get_token_auth_header() -> str:
     return parts[1]
 
 
+def _jwt_module():
+    try:
+        from jose import jwt  # type: ignore
+    except Exception:
+        import jwt  # type: ignore
+    return jwt
+
+
 def requires_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         try:
+            jwt = _jwt_module()
+            settings = get_settings()
             token = _get_token_auth_header()
             unverified_header = jwt.get_unverified_header(token)
             jwks = _get_jwks()
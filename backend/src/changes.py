@@ -0,0 +1,91 @@
+"""Change feed: a sequence-numbered log of token and verification changes.
+
+Partners sync incrementally with ``GET /api/v1/changes?since=<seq>``, which
+reads the rows after ``since`` in seq order by an index range scan on
+``(api_key_id, seq)``, ``(organization_id, seq)`` (a dashboard user's
+organization) or the primary key, however long the log grows.
+
+That is only safe if a reader can never see seq N+1 before seq N has
+committed, so seq must follow commit order. ``record_change`` therefore
+buffers entries on the session, and they are inserted in ``before_commit``
+after bumping the ``changes`` row of ``table_versions``; that row stays
+locked until COMMIT, so transactions that append changes commit one at a
+time, in seq order. (SQLite only ever has one writer.) For the same reason a
+lagging read replica serves a consistent, if older, prefix of the feed.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import event, insert, select, text
+
+from .database import VersionedSession, session_scope
+from .jsonlib import dumps, loads
+from .models import Change
+
+_LOCK_FEED = text("UPDATE table_versions SET version = version + 1 WHERE name = 'changes'")
+
+
+def record_change(db, change_type: str, entity_type: str, entity_id: Optional[str], data: dict,
+                  api_key_id: Optional[str] = None, occurred_at: Optional[datetime] = None,
+                  organization_id: Optional[str] = None) -> None:
+    """Append a change once ``db``'s transaction commits (sync or async session)."""
+    db.info.setdefault("pending_changes", []).append({
+        "change_type": change_type,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "api_key_id": api_key_id,
+        "organization_id": organization_id,
+        "data": dumps(data),
+        "occurred_at": occurred_at or datetime.utcnow(),
+    })
+
+
+@event.listens_for(VersionedSession, "before_commit")
+def _append_changes(session):
+    pending = session.info.pop("pending_changes", None)
+    if not pending:
+        return
+    # Lock first, then take sequence numbers: see the module docstring.
+    session.execute(_LOCK_FEED)
+    session.execute(insert(Change), pending)
+
+
+@event.listens_for(VersionedSession, "after_rollback")
+def _forget_changes(session):
+    session.info.pop("pending_changes", None)
+
+
+def _change_to_dict(change: Change) -> Dict:
+    return {
+        "seq": change.seq,
+        "type": change.change_type,
+        "entityType": change.entity_type,
+        "entityId": change.entity_id,
+        "occurredAt": change.occurred_at.isoformat(),
+        "data": loads(change.data),
+    }
+
+
+def changes_query(since: int, limit: int, api_key_id: Optional[str] = None, organization_id: Optional[str] = None):
+    stmt = select(Change).where(Change.seq > since)
+    if api_key_id is not None:
+        stmt = stmt.where(Change.api_key_id == api_key_id)
+    if organization_id is not None:
+        stmt = stmt.where(Change.organization_id == organization_id)
+    return stmt.order_by(Change.seq).limit(limit)
+
+
+def list_changes(since: int, limit: int, api_key_id: Optional[str] = None,
+                 organization_id: Optional[str] = None) -> Dict:
+    """The next ``limit`` changes after ``since``; pass ``nextSince`` back to continue."""
+    with session_scope(readonly=True) as db:
+        stmt = changes_query(since, limit + 1, api_key_id, organization_id)
+        changes = [_change_to_dict(c) for c in db.scalars(stmt)]
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        "changes": changes,
+        "nextSince": changes[-1]["seq"] if changes else since,
+        "hasMore": has_more,
+    }
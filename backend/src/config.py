@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List
 
 from dotenv import load_dotenv
@@ -13,6 +14,41 @@ class Settings:
     port: int
     flask_env: str
     database_url: str
+    database_replica_url: str
+    replica_max_lag_seconds: float
+    replica_lag_query: str
+    request_scoped_sessions: bool
+    compress_min_bytes: int
+    log_level: str
+    metrics_enabled: bool
+    slow_query_ms: float
+    slow_query_explain: bool
+    slow_query_buffer: int
+    metrics_token: str
+    log_format: str
+    log_info_sample_rate: float
+    idempotency_ttl_hours: float
+    idempotency_cache_size: int
+    stats_cache_seconds: float
+    blob_gc_grace_hours: float
+    document_workers: int
+    document_queue_size: int
+    webhook_concurrency: int
+    webhook_batch_size: int
+    webhook_timeout_seconds: float
+    webhook_max_attempts: int
+    webhook_backoff_seconds: float
+    webhook_allow_private_urls: bool
+    pubsub_backend: str
+    pubsub_socket_dir: str
+    sse_heartbeat_seconds: float
+    verification_retention_days: int
+    device_review_identities: int
+    device_window_days: int
+    archive_dir: str
+    archive_compression: str
+    partition_months_ahead: int
+    partition_retention_months: int
     secret_key: str
     jwt_secret: str
     frontend_url: str
@@ -23,16 +59,56 @@ class Settings:
     allowed_extensions: List[str]
     auth0_domain: str
     auth0_audience: str
+    auto_migrate: bool
 
 
 def load_settings() -> Settings:
     cors_raw = os.environ.get("CORS_ORIGINS", "*")
     cors_list = [origin.strip() for origin in cors_raw.split(",") if origin.strip()]
+    database_url = os.environ.get("DATABASE_URL", "sqlite:///./local.db")
+    # Local SQLite databases migrate themselves on startup; shared databases
+    # are migrated explicitly with `python migrate.py upgrade`.
+    auto_migrate_default = "true" if database_url.startswith("sqlite") else "false"
 
     return Settings(
         port=int(os.environ.get("PORT", 10000)),
         flask_env=os.environ.get("FLASK_ENV", "production"),
-        database_url=os.environ.get("DATABASE_URL", "sqlite:///./local.db"),
+        database_url=database_url,
+        database_replica_url=os.environ.get("DATABASE_REPLICA_URL", ""),
+        replica_max_lag_seconds=float(os.environ.get("REPLICA_MAX_LAG_SECONDS", 10)),
+        replica_lag_query=os.environ.get("REPLICA_LAG_QUERY", ""),
+        compress_min_bytes=int(os.environ.get("COMPRESS_MIN_BYTES", 1024)),
+        slow_query_ms=float(os.environ.get("SLOW_QUERY_MS", 0)),
+        slow_query_explain=os.environ.get("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes"),
+        slow_query_buffer=int(os.environ.get("SLOW_QUERY_BUFFER", 200)),
+        metrics_enabled=os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes"),
+        metrics_token=os.environ.get("METRICS_TOKEN", ""),
+        log_level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        log_format=os.environ.get("LOG_FORMAT", "json").lower(),
+        log_info_sample_rate=float(os.environ.get("LOG_INFO_SAMPLE_RATE", 1.0)),
+        idempotency_ttl_hours=float(os.environ.get("IDEMPOTENCY_TTL_HOURS", 24)),
+        idempotency_cache_size=int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 1024)),
+        stats_cache_seconds=float(os.environ.get("STATS_CACHE_SECONDS", 5)),
+        blob_gc_grace_hours=float(os.environ.get("BLOB_GC_GRACE_HOURS", 24)),
+        document_workers=int(os.environ.get("DOCUMENT_WORKERS", 2)),
+        document_queue_size=int(os.environ.get("DOCUMENT_QUEUE_SIZE", 64)),
+        webhook_concurrency=int(os.environ.get("WEBHOOK_CONCURRENCY", 16)),
+        webhook_batch_size=int(os.environ.get("WEBHOOK_BATCH_SIZE", 200)),
+        webhook_timeout_seconds=float(os.environ.get("WEBHOOK_TIMEOUT_SECONDS", 10)),
+        webhook_max_attempts=int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", 8)),
+        webhook_backoff_seconds=float(os.environ.get("WEBHOOK_BACKOFF_SECONDS", 30)),
+        webhook_allow_private_urls=os.environ.get("WEBHOOK_ALLOW_PRIVATE_URLS", "false").lower() in ("1", "true", "yes"),
+        pubsub_backend=os.environ.get("PUBSUB_BACKEND", "local").lower(),
+        pubsub_socket_dir=os.environ.get("PUBSUB_SOCKET_DIR", ""),
+        sse_heartbeat_seconds=float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15)),
+        verification_retention_days=int(os.environ.get("VERIFICATION_RETENTION_DAYS", 365)),
+        device_review_identities=int(os.environ.get("DEVICE_REVIEW_IDENTITIES", 3)),
+        device_window_days=int(os.environ.get("DEVICE_WINDOW_DAYS", 30)),
+        archive_dir=os.environ.get("ARCHIVE_DIR", "/tmp/archive"),
+        archive_compression=os.environ.get("ARCHIVE_COMPRESSION", "zstd").lower(),
+        partition_months_ahead=int(os.environ.get("PARTITION_MONTHS_AHEAD", 3)),
+        partition_retention_months=int(os.environ.get("PARTITION_RETENTION_MONTHS", 0)),
+        request_scoped_sessions=os.environ.get("REQUEST_SCOPED_SESSIONS", "true").lower() in ("1", "true", "yes"),
         secret_key=os.environ.get("SECRET_KEY", "change-me"),
         jwt_secret=os.environ.get("JWT_SECRET", "change-me-jwt"),
         frontend_url=os.environ.get("FRONTEND_URL", "http://localhost:5173"),
@@ -43,4 +119,11 @@ def load_settings() -> Settings:
         allowed_extensions=["pdf", "png", "jpg", "jpeg", "gif", "doc", "docx"],
         auth0_domain=os.environ.get("AUTH0_DOMAIN", ""),
         auth0_audience=os.environ.get("AUTH0_AUDIENCE", ""),
+        auto_migrate=os.environ.get("AUTO_MIGRATE", auto_migrate_default).lower() in ("1", "true", "yes"),
     )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide settings, read from the environment once."""
+    return load_settings()
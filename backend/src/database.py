@@ -1,24 +1,312 @@
-from contextlib import contextmanager
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from flask import Flask, g, has_request_context
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
-from .config import load_settings
+from .config import get_settings
 
-settings = load_settings()
+logger = logging.getLogger(__name__)
 
-# Convert postgresql:// to postgresql+psycopg:// for psycopg 3.x compatibility
-database_url = settings.database_url
-if database_url.startswith("postgresql://"):
-    database_url = database_url.replace("postgresql://", "postgresql+psycopg://", 1)
 
-engine = create_engine(database_url, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _normalize_url(url: str) -> str:
+    # Convert postgresql:// to postgresql+psycopg:// for psycopg 3.x compatibility
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return url
+
+
+class VersionedSession(Session):
+    """Session that bumps ``table_versions`` for every table it writes to."""
+
+
+# Objects stay readable after the unit of work commits, so services can build
+# their responses from the records they just wrote.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, class_=VersionedSession)
 Base = declarative_base()
 
+_BUMP_TABLE_VERSIONS = text(
+    "UPDATE table_versions SET version = version + 1 WHERE name IN :names"
+).bindparams(bindparam("names", expanding=True))
+
+
+@event.listens_for(VersionedSession, "after_flush")
+def _collect_changed_tables(session, flush_context):
+    changed = session.info.setdefault("changed_tables", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        changed.add(obj.__table__.name)
+
+
+@event.listens_for(VersionedSession, "before_commit")
+def _bump_table_versions(session):
+    # Bumped right before COMMIT so the counter rows stay locked only briefly.
+    session.flush()
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        session.execute(_BUMP_TABLE_VERSIONS, {"names": sorted(changed)})
+
+
+@event.listens_for(VersionedSession, "after_rollback")
+def _forget_changed_tables(session):
+    session.info.pop("changed_tables", None)
+    session.info.pop("on_commit", None)
+
+
+@event.listens_for(VersionedSession, "after_commit")
+def _run_commit_callbacks(session):
+    for callback in session.info.pop("on_commit", ()):
+        try:
+            callback()
+        except Exception:
+            logger.exception("[DB] on_commit callback failed")
+
+
+def mark_tables_changed(session, *tables: str) -> None:
+    """Record writes the ORM cannot see, e.g. bulk UPDATE/DELETE statements."""
+    session.info.setdefault("changed_tables", set()).update(tables)
+
+
+def bump_table_versions(conn, *tables: str) -> None:
+    """``mark_tables_changed`` for writes made on a plain Connection (bumped immediately)."""
+    conn.execute(_BUMP_TABLE_VERSIONS, {"names": sorted(tables)})
+
+
+def on_commit(session, callback: Callable[[], None]) -> None:
+    """Run ``callback`` once ``session``'s transaction commits; dropped on rollback.
+
+    Use it to hand work that must see the committed rows (background jobs,
+    notifications) off to other threads or processes.
+    """
+    session.info.setdefault("on_commit", []).append(callback)
+
+
+# Optional read replica for admin listings and analytics. Reads fall back to
+# the primary when no replica is configured, it is unreachable, or it lags
+# behind by more than replica_max_lag_seconds.
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# Engines are created on first use so importing models or services does not
+# load the database driver or open a pool.
+_engines: dict = {}
+_engine_lock = threading.Lock()
+
+
+def _create_engine(url: str, name: str, timed_pool: bool) -> Engine:
+    url = _normalize_url(url)
+    options = {"pool_pre_ping": True}
+    if timed_pool and ":memory:" not in url:
+        from .metrics import timed_pool_class
+
+        options["poolclass"] = timed_pool_class(name)
+    engine = create_engine(url, **options)
+    _install_slow_query_log(engine)
+    return engine
+
+
+def _install_slow_query_log(engine: Engine, explain_engine: Engine | None = None) -> None:
+    settings = get_settings()
+    if settings.slow_query_ms > 0:
+        from .slow_queries import install_slow_query_log
+
+        install_slow_query_log(
+            engine, settings.slow_query_ms, explain=settings.slow_query_explain,
+            explain_engine=explain_engine, buffer_size=settings.slow_query_buffer,
+        )
+
+
+def get_engine() -> Engine:
+    engine = _engines.get("primary")
+    if engine is not None:
+        return engine
+    with _engine_lock:
+        if "primary" not in _engines:
+            settings = get_settings()
+            engine = _create_engine(settings.database_url, "primary", settings.metrics_enabled)
+            SessionLocal.configure(bind=engine)
+            if settings.database_replica_url:
+                replica = _create_engine(settings.database_replica_url, "replica", settings.metrics_enabled)
+                ReplicaSessionLocal.configure(bind=replica)
+                _engines["replica"] = replica
+            _engines["primary"] = engine
+    return _engines["primary"]
+
+
+def _async_url(url: str) -> str:
+    url = _normalize_url(url)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    # postgresql+psycopg drives asyncio natively with psycopg 3.
+    return url
+
+
+def get_async_session_factory():
+    """async_sessionmaker for the ASGI entry point, created on first use."""
+    factory = _engines.get("async_sessions")
+    if factory is not None:
+        return factory
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    primary = get_engine()
+    with _engine_lock:
+        if "async_sessions" not in _engines:
+            engine = create_async_engine(_async_url(get_settings().database_url), pool_pre_ping=True)
+            _install_slow_query_log(engine.sync_engine, explain_engine=primary)
+            _engines["async"] = engine
+            _engines["async_sessions"] = async_sessionmaker(
+                engine, autoflush=False, expire_on_commit=False, sync_session_class=VersionedSession
+            )
+    return _engines["async_sessions"]
+
+
+async def dispose_async_engine() -> None:
+    engine = _engines.pop("async", None)
+    _engines.pop("async_sessions", None)
+    if engine is not None:
+        await engine.dispose()
+
+
+def get_replica_engine() -> Engine | None:
+    get_engine()
+    return _engines.get("replica")
+
+
+def __getattr__(name: str):
+    # Keeps `from .database import engine` working without eager creation.
+    if name == "engine":
+        return get_engine()
+    if name == "replica_engine":
+        return get_replica_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() "
+        "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+# How long a replica health verdict is reused before the lag is measured again.
+_REPLICA_CHECK_INTERVAL = 5.0
+_replica_lock = threading.Lock()
+_replica_state = {"checked_at": 0.0, "usable": False, "lag": None}
+
+
+def _measure_replica_lag() -> float:
+    # REPLICA_LAG_QUERY overrides the per-dialect query, e.g. "SELECT 30" to
+    # exercise the fallback locally with two SQLite files. Dialects without a
+    # lag query report 0.
+    replica_engine = get_replica_engine()
+    query = get_settings().replica_lag_query or _LAG_QUERIES.get(replica_engine.dialect.name)
+    with replica_engine.connect() as conn:
+        if not query:
+            conn.execute(text("SELECT 1"))
+            return 0.0
+        return float(conn.execute(text(query)).scalar() or 0)
+
+
+def replica_status() -> dict:
+    """Return the cached replica verdict, re-measuring it when stale."""
+    if get_replica_engine() is None:
+        return {"configured": False, "usable": False, "lag": None}
+    now = time.monotonic()
+    with _replica_lock:
+        if now - _replica_state["checked_at"] < _REPLICA_CHECK_INTERVAL:
+            return {"configured": True, "usable": _replica_state["usable"], "lag": _replica_state["lag"]}
+        # Claim the check so concurrent readers keep using the previous verdict.
+        _replica_state["checked_at"] = now
+    try:
+        lag = _measure_replica_lag()
+        usable = lag <= get_settings().replica_max_lag_seconds
+        if not usable:
+            logger.warning("[DB] Replica lag %.1fs exceeds limit, reading from primary", lag)
+    except Exception as e:
+        lag, usable = None, False
+        logger.warning("[DB] Replica unavailable, reading from primary: %s", e)
+    with _replica_lock:
+        _replica_state.update(usable=usable, lag=lag)
+    return {"configured": True, "usable": usable, "lag": lag}
+
+
+def _request_session():
+    """Return the request's unit-of-work session, opening it on first use."""
+    if not get_settings().request_scoped_sessions or not has_request_context():
+        return None
+    session = g.get("db_session")
+    if session is None:
+        session = SessionLocal()
+        g.db_session = session
+    return session
+
+
+def rollback_request_session() -> None:
+    """Discard the request's unit of work now rather than after the response.
+
+    Its flushed writes hold locks (on SQLite, the whole database) until the
+    transaction ends, so a failed request rolls back before it writes
+    anything in its own transaction.
+    """
+    session = g.get("db_session") if has_request_context() else None
+    if session is not None:
+        session.rollback()
+
+
+def init_request_sessions(app: Flask) -> None:
+    """Commit the request session once per request, or roll it back on errors."""
+
+    @app.after_request
+    def commit_request_session(response):
+        session = g.get("db_session")
+        if session is not None:
+            if response.status_code < 400:
+                session.commit()
+            else:
+                session.rollback()
+        return response
+
+    @app.teardown_request
+    def close_request_session(error=None):
+        session = g.pop("db_session", None)
+        if session is not None:
+            if error is not None:
+                session.rollback()
+            session.close()
+
 
 @contextmanager
-def session_scope():
+def session_scope(readonly: bool = False, own_transaction: bool = False):
+    """Transactional session; ``readonly=True`` prefers the read replica.
+
+    Inside a Flask request the read-write scope joins the request's unit of
+    work: changes are flushed on exit and committed once after the response
+    is built. CLI scripts and background work keep their own transaction, as
+    does ``own_transaction=True`` for writes that must commit (or fail)
+    independently of the request. On SQLite such a write waits for the
+    request's flushed writes; call ``rollback_request_session`` first when the
+    request has failed.
+    """
+    get_engine()
+    if readonly:
+        factory = ReplicaSessionLocal if replica_status()["usable"] else SessionLocal
+        session = factory()
+        try:
+            yield session
+        finally:
+            session.rollback()
+            session.close()
+        return
+
+    session = None if own_transaction else _request_session()
+    if session is not None:
+        yield session
+        session.flush()
+        return
+
     session = SessionLocal()
     try:
         yield session
@@ -28,3 +316,17 @@ def session_scope():
         raise
     finally:
         session.close()
+
+
+@asynccontextmanager
+async def async_session_scope():
+    """Async counterpart of session_scope: one transaction, committed on exit."""
+    session = get_async_session_factory()()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
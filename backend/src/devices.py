@@ -0,0 +1,147 @@
+"""Repeat-device detection.
+
+A submission's device fingerprint is a SHA-256 of the user agent, screen
+resolution, timezone and IP address it arrived with (its ``security_data``),
+stored on the verification in ``device_fingerprint``. ``device_identities``
+keeps one row per device and identity (a hash of the normalized email) with
+when the device last verified it, so how many people a device has verified in
+the last DEVICE_WINDOW_DAYS is one primary key range scan over that device's
+own rows, however many verifications there are. Submitting records the
+device in the same transaction as the verification, and a device that has
+verified DEVICE_REVIEW_IDENTITIES or more identities in the window flags the
+submission ``requires_manual_review``.
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Optional
+
+from sqlalchemy import bindparam, delete, func, or_, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .config import get_settings
+from .database import session_scope
+from .jsonlib import loads_or_none
+from .models import DeviceIdentity, Verification
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+_FIELDS = ("user_agent", "screen_resolution", "timezone", "ip_address")
+
+
+def device_fingerprint(security: Optional[Dict]) -> Optional[str]:
+    """Fingerprint of a submission's ``security_data``, or None without any browser details."""
+    values = [str((security or {}).get(field) or "").strip().lower() for field in _FIELDS]
+    # The IP alone is shared by everyone behind the same proxy.
+    if not any(values[:3]):
+        return None
+    return hashlib.sha256("\x1f".join(values).encode()).hexdigest()
+
+
+def identity_key(email: Optional[str]) -> Optional[str]:
+    email = (email or "").strip().lower()
+    return hashlib.sha256(email.encode()).hexdigest() if email else None
+
+
+def window_start(now: Optional[datetime] = None, days: Optional[int] = None) -> datetime:
+    days = get_settings().device_window_days if days is None else days
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def _upsert(dialect: str):
+    """Insert of device_identities rows that adds to the ones already there."""
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(DeviceIdentity)
+    return stmt.on_conflict_do_update(
+        index_elements=[DeviceIdentity.fingerprint, DeviceIdentity.identity],
+        set_={
+            "last_seen_at": stmt.excluded.last_seen_at,
+            "verification_count": DeviceIdentity.verification_count + stmt.excluded.verification_count,
+        },
+    )
+
+
+def _seen(fingerprint: str, identity: str, seen_at: datetime) -> Dict:
+    return {"fingerprint": fingerprint, "identity": identity, "first_seen_at": seen_at, "last_seen_at": seen_at,
+            "verification_count": 1}
+
+
+def identity_count_query(fingerprint: str, since: datetime):
+    return select(func.count()).select_from(DeviceIdentity).where(
+        DeviceIdentity.fingerprint == fingerprint, DeviceIdentity.last_seen_at >= since,
+    )
+
+
+def record_device(db, fingerprint: Optional[str], email: Optional[str], seen_at: datetime) -> Optional[int]:
+    """Record the submission's device; returns how many identities it has verified in the window."""
+    identity = identity_key(email)
+    if fingerprint is None or identity is None:
+        return None
+    db.execute(_upsert(db.get_bind().dialect.name), _seen(fingerprint, identity, seen_at))
+    return db.scalar(identity_count_query(fingerprint, window_start(seen_at)))
+
+
+async def record_device_async(db: "AsyncSession", fingerprint: Optional[str], email: Optional[str],
+                              seen_at: datetime) -> Optional[int]:
+    identity = identity_key(email)
+    if fingerprint is None or identity is None:
+        return None
+    await db.execute(_upsert(db.bind.dialect.name), _seen(fingerprint, identity, seen_at))
+    return await db.scalar(identity_count_query(fingerprint, window_start(seen_at)))
+
+
+def device_identity_count(fingerprint: str, since: datetime) -> int:
+    """How many distinct identities ``fingerprint`` has verified since ``since``."""
+    with session_scope(readonly=True) as db:
+        return db.scalar(identity_count_query(fingerprint, since))
+
+
+def shared_device(identities: Optional[int]) -> bool:
+    threshold = get_settings().device_review_identities
+    return identities is not None and threshold > 0 and identities >= threshold
+
+
+def rebuild(conn: Connection, batch_size: int = 2000) -> int:
+    """Recompute every hot verification's fingerprint and all of device_identities; returns verifications read.
+
+    Submissions that arrive while this runs may be counted twice, so run it when writes are quiet.
+    """
+    conn.execute(delete(DeviceIdentity))
+    upsert = _upsert(conn.dialect.name)
+    set_fingerprint = update(Verification).where(Verification.id == bindparam("verification_id")).values(
+        device_fingerprint=bindparam("fingerprint")
+    )
+    columns = (Verification.id, Verification.timestamp, Verification.personal_info, Verification.security_data)
+    after = None
+    read = 0
+    while True:
+        stmt = select(*columns).order_by(Verification.timestamp, Verification.id)
+        if after is not None:
+            stmt = stmt.where(Verification.timestamp >= after[0]).where(
+                or_(Verification.timestamp > after[0], Verification.id > after[1])
+            )
+        rows = conn.execute(stmt.limit(batch_size)).all()
+        if not rows:
+            return read
+        fingerprints, seen = [], {}
+        for row in rows:
+            fingerprint = device_fingerprint(loads_or_none(row.security_data))
+            fingerprints.append({"verification_id": row.id, "fingerprint": fingerprint})
+            identity = identity_key((loads_or_none(row.personal_info) or {}).get("email"))
+            if fingerprint is None or identity is None:
+                continue
+            # Rows come oldest first, so a later sighting only moves last_seen_at forward.
+            entry = seen.get((fingerprint, identity))
+            if entry is None:
+                seen[(fingerprint, identity)] = _seen(fingerprint, identity, row.timestamp)
+            else:
+                entry["last_seen_at"] = row.timestamp
+                entry["verification_count"] += 1
+        conn.execute(set_fingerprint, fingerprints)
+        if seen:
+            conn.execute(upsert, list(seen.values()))
+        read += len(rows)
+        after = (rows[-1].timestamp, rows[-1].id)
@@ -0,0 +1,149 @@
+"""Inspection of uploaded documents: type, page count, metadata and preview.
+
+Runs inside the document pipeline's worker processes, so it only imports the
+standard library and Pillow (for previews) to keep worker start-up cheap.
+Types are detected from magic bytes, never from the name. Pillow is in
+requirements.txt; an install without it still analyzes uploads, just
+without previews.
+"""
+
+import os
+import re
+import struct
+import zipfile
+from typing import Optional
+
+try:
+    from PIL import Image  # type: ignore
+except ImportError:
+    Image = None
+
+PREVIEW_MAX_PX = 512
+# Image dimensions are read from the header; JPEG EXIF blocks can push the
+# frame header this far in.
+_IMAGE_HEADER_BYTES = 256 * 1024
+
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+_PDF_INFO_FIELDS = ("Title", "Author", "Creator", "Producer", "CreationDate")
+_DOCX_PAGES = re.compile(r"<Pages>(\d+)</Pages>")
+_DOCX_CORE_FIELDS = {"title": r"<dc:title>([^<]*)</dc:title>", "creator": r"<dc:creator>([^<]*)</dc:creator>"}
+
+
+def detect_type(head: bytes, path: str) -> str:
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head.startswith(_OLE_MAGIC):
+        return "doc"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                if "word/document.xml" in archive.namelist():
+                    return "docx"
+        except zipfile.BadZipFile:
+            pass
+    return "unknown"
+
+
+def _pdf_string(data: bytes, key: str) -> Optional[str]:
+    match = re.search(rb"/" + key.encode() + rb"\s*\(((?:\\.|[^\\)])*)\)", data)
+    if not match:
+        return None
+    return match.group(1).decode("latin-1").replace("\\(", "(").replace("\\)", ")")
+
+
+def _analyze_pdf(data: bytes) -> dict:
+    metadata = {"version": data[5:8].decode("latin-1"), "encrypted": b"/Encrypt" in data}
+    for field in _PDF_INFO_FIELDS:
+        value = _pdf_string(data, field)
+        if value:
+            metadata[field[0].lower() + field[1:]] = value
+    # Counts page objects; object streams in some PDF 1.5+ files can hide
+    # them, in which case the count is unknown rather than wrong.
+    pages = len(_PDF_PAGE.findall(data))
+    return {"page_count": pages or None, "metadata": metadata}
+
+
+def _image_size(kind: str, data: bytes) -> Optional[tuple]:
+    if kind == "png" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if kind == "gif" and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if kind == "jpeg":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+
+def _analyze_docx(path: str) -> dict:
+    metadata = {}
+    pages = None
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        if "docProps/app.xml" in names:
+            match = _DOCX_PAGES.search(archive.read("docProps/app.xml").decode("utf-8", "replace"))
+            pages = int(match.group(1)) if match else None
+        if "docProps/core.xml" in names:
+            core = archive.read("docProps/core.xml").decode("utf-8", "replace")
+            for field, pattern in _DOCX_CORE_FIELDS.items():
+                match = re.search(pattern, core)
+                if match and match.group(1):
+                    metadata[field] = match.group(1)
+    return {"page_count": pages, "metadata": metadata}
+
+
+def previews_available() -> bool:
+    return Image is not None
+
+
+def _make_preview(path: str, preview_path: str) -> bool:
+    if Image is None:
+        return False
+    tmp_path = preview_path + ".tmp"
+    with Image.open(path) as image:
+        image.thumbnail((PREVIEW_MAX_PX, PREVIEW_MAX_PX))
+        image.convert("RGB").save(tmp_path, "JPEG", quality=80)
+    os.replace(tmp_path, preview_path)
+    return True
+
+
+def analyze_document(path: str, preview_path: Optional[str] = None) -> dict:
+    """Inspect the file at ``path``; write a JPEG preview to ``preview_path`` if possible.
+
+    Returns ``document_type``, ``page_count``, ``metadata`` and ``preview``
+    (whether a preview was written). Uploads are capped in size, so PDFs are
+    read whole.
+    """
+    with open(path, "rb") as fh:
+        head = fh.read(8192)
+    kind = detect_type(head, path)
+    result = {"document_type": kind, "page_count": None, "metadata": {}, "preview": False}
+
+    if kind == "pdf":
+        with open(path, "rb") as fh:
+            result.update(_analyze_pdf(fh.read()))
+    elif kind in ("png", "jpeg", "gif"):
+        with open(path, "rb") as fh:
+            size = _image_size(kind, fh.read(_IMAGE_HEADER_BYTES))
+        result["page_count"] = 1
+        if size:
+            result["metadata"] = {"width": size[0], "height": size[1]}
+        if preview_path:
+            result["preview"] = _make_preview(path, preview_path)
+    elif kind == "docx":
+        result.update(_analyze_docx(path))
+    return result
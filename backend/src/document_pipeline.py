@@ -0,0 +1,245 @@
+"""Background processing of uploads once they have committed.
+
+``submit`` is called from an ``on_commit`` hook and never blocks the request:
+upload ids go onto a bounded queue, and a dispatcher thread feeds them to a
+process pool (document inspection is CPU-bound) with at most one job per
+worker in flight. When the queue is full the upload simply stays
+``pending``; ``process_pending`` (``python maintenance.py process-uploads``)
+picks up whatever was skipped or interrupted.
+
+Each ``Upload`` moves through ``processing_status`` pending -> processing ->
+done | failed, which the frontend polls at ``GET /api/uploads/<id>``. Uploads
+whose content was already processed copy that result instead of being
+inspected again.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, select
+
+from .config import get_settings
+from .database import session_scope
+from .document_analysis import analyze_document, previews_available
+from .jsonlib import dumps
+from .models import Upload
+
+logger = logging.getLogger(__name__)
+
+# A job still "processing" after this long is assumed lost (worker or app
+# process died) and is picked up again by process_pending.
+STALE_PROCESSING = timedelta(minutes=10)
+
+
+def preview_path(upload_dir: str, sha256: str) -> str:
+    # Previews are per content, like blobs, so duplicates share one.
+    return os.path.join(upload_dir, "previews", sha256[:2], f"{sha256}.jpg")
+
+
+@dataclass(frozen=True)
+class _Job:
+    upload_id: str
+    path: str
+    preview_path: Optional[str]
+
+
+def _start(upload_id: str) -> Optional[_Job]:
+    """Mark the upload as processing, or finish it from an identical one; None if nothing to run."""
+    with session_scope(own_transaction=True) as db:
+        record = db.get(Upload, upload_id)
+        if record is None or record.processing_status == "done":
+            return None
+        now = datetime.utcnow()
+        twin = None
+        if record.sha256:
+            twin = db.scalars(
+                select(Upload).where(Upload.sha256 == record.sha256, Upload.processing_status == "done").limit(1)
+            ).first()
+        if twin is not None:
+            record.document_type, record.page_count = twin.document_type, twin.page_count
+            record.document_metadata, record.preview_path = twin.document_metadata, twin.preview_path
+            record.processing_status, record.processing_error, record.processing_updated_at = "done", None, now
+            return None
+        record.processing_status, record.processing_updated_at = "processing", now
+        preview = None
+        if record.sha256:
+            preview = preview_path(get_settings().upload_folder, record.sha256)
+            os.makedirs(os.path.dirname(preview), exist_ok=True)
+        return _Job(record.id, record.filepath, preview)
+
+
+def _release(job: _Job) -> None:
+    """Put an upload that could not be handed to a worker back to pending."""
+    with session_scope(own_transaction=True) as db:
+        record = db.get(Upload, job.upload_id)
+        if record is not None and record.processing_status == "processing":
+            record.processing_status, record.processing_updated_at = "pending", datetime.utcnow()
+
+
+def _finish(job: _Job, result: Optional[dict], error: Optional[BaseException]) -> None:
+    with session_scope(own_transaction=True) as db:
+        record = db.get(Upload, job.upload_id)
+        if record is None:
+            return
+        record.processing_updated_at = datetime.utcnow()
+        if error is not None:
+            logger.warning("[DOCS] Processing upload %s failed: %s", job.upload_id, error)
+            record.processing_status, record.processing_error = "failed", str(error)[:500]
+            return
+        record.document_type = result["document_type"]
+        record.page_count = result["page_count"]
+        record.document_metadata = dumps(result["metadata"])
+        record.preview_path = job.preview_path if result["preview"] else None
+        record.processing_status, record.processing_error = "done", None
+
+
+class DocumentPipeline:
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_started(self) -> None:
+        # Started on first use, and again in a forked child (e.g. a gunicorn
+        # worker), since neither the pool nor the dispatcher survive a fork.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if not previews_available():
+                logger.warning("[DOCS] Pillow is not installed, uploads are processed without previews")
+            self._executor = self._new_executor()
+            threading.Thread(target=self._dispatch, name="document-pipeline", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that runs threads can copy held locks.
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _run(self, job: _Job) -> Future:
+        try:
+            return self._executor.submit(analyze_document, job.path, job.preview_path)
+        except BrokenProcessPool:
+            # A worker died abruptly and took the pool with it; replace it once.
+            logger.warning("[DOCS] Worker pool broken, starting a new one")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            return self._executor.submit(analyze_document, job.path, job.preview_path)
+
+    def submit(self, upload_id: str) -> bool:
+        """Queue ``upload_id`` for processing; False (left pending) when the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(upload_id)
+            return True
+        except queue.Full:
+            logger.warning("[DOCS] Queue full, upload %s left pending", upload_id)
+            return False
+
+    def _dispatch(self) -> None:
+        while True:
+            upload_id = self._queue.get()
+            if upload_id is None:
+                return
+            # Waiting for a free worker here keeps the backlog in the bounded
+            # queue rather than in the pool's unbounded one.
+            self._slots.acquire()
+            job = None
+            try:
+                job = _start(upload_id)
+                if job is None:
+                    self._slots.release()
+                    continue
+                future = self._run(job)
+            except Exception:
+                logger.exception("[DOCS] Could not start processing upload %s", upload_id)
+                self._slots.release()
+                if job is not None:
+                    # Rather than leave it "processing" until STALE_PROCESSING runs out.
+                    try:
+                        _release(job)
+                    except Exception:
+                        logger.exception("[DOCS] Could not reset upload %s to pending", upload_id)
+                continue
+            future.add_done_callback(lambda f, job=job: self._done(job, f))
+
+    def _done(self, job: _Job, future: Future) -> None:
+        try:
+            error = future.exception()
+            _finish(job, None if error else future.result(), error)
+        except Exception:
+            logger.exception("[DOCS] Could not record result for upload %s", job.upload_id)
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        if self._pid != os.getpid():
+            return
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pipeline: Optional[DocumentPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> Optional[DocumentPipeline]:
+    """The process-wide pipeline, or None when DOCUMENT_WORKERS is 0."""
+    global _pipeline
+    settings = get_settings()
+    if settings.document_workers <= 0:
+        return None
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = DocumentPipeline(settings.document_workers, settings.document_queue_size)
+            atexit.register(_pipeline.shutdown)
+        return _pipeline
+
+
+def submit(upload_id: str) -> None:
+    pipeline = get_pipeline()
+    if pipeline is not None:
+        pipeline.submit(upload_id)
+
+
+def process_pending(limit: int = 100) -> dict:
+    """Process pending, and stale processing, uploads synchronously in this process."""
+    stale_before = datetime.utcnow() - STALE_PROCESSING
+    with session_scope(own_transaction=True) as db:
+        upload_ids = db.scalars(
+            select(Upload.id).where(or_(
+                Upload.processing_status == "pending",
+                Upload.processing_status.is_(None),
+                (Upload.processing_status == "processing") & (Upload.processing_updated_at < stale_before),
+            )).order_by(Upload.uploaded_at).limit(limit)
+        ).all()
+
+    stats = {"processed": 0, "failed": 0, "reused": 0}
+    for upload_id in upload_ids:
+        job = _start(upload_id)
+        if job is None:
+            stats["reused"] += 1
+            continue
+        try:
+            _finish(job, analyze_document(job.path, job.preview_path), None)
+            stats["processed"] += 1
+        except Exception as e:
+            _finish(job, None, e)
+            stats["failed"] += 1
+    return stats
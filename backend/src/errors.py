@@ -20,3 +20,13 @@ class UnauthorizedError(AppError):
 class ValidationError(AppError):
     def __init__(self, message: str = "Invalid request"):
         super().__init__(message, status_code=400)
+
+
+class ConflictError(AppError):
+    def __init__(self, message: str = "Conflict"):
+        super().__init__(message, status_code=409)
+
+
+class PayloadTooLargeError(AppError):
+    def __init__(self, message: str = "Payload too large"):
+        super().__init__(message, status_code=413)
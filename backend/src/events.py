@@ -0,0 +1,66 @@
+"""Domain events, recorded in the transaction that causes them.
+
+Services call ``emit(db, ...)`` with the session they are already writing
+through (sync or async), so an event exists if and only if its change
+committed. The rows form a transactional outbox that the webhook worker
+drains; nothing is sent from the request itself. Each event is also
+appended to the change feed (``changes``) and, once the transaction commits,
+published to live streams (``pubsub``).
+``notify`` publishes to live streams only, for events that change nothing.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+from .changes import record_change
+from .database import on_commit
+from .jsonlib import dumps
+from .models import OutboxEvent
+from .pubsub import Message, publish
+
+TOKEN_CREATED = "token.created"
+TOKEN_VALIDATED = "token.validated"
+VERIFICATION_CREATED = "verification.created"
+
+
+def token_status_event(status: str) -> str:
+    """token.completed, token.declined, token.revoked, ..."""
+    return f"token.{status}"
+
+
+def _envelope(event_type: str, data: dict, now: datetime) -> Tuple[str, str]:
+    event_id = f"evt_{uuid.uuid4().hex}"
+    return event_id, dumps({
+        "id": event_id,
+        "type": event_type,
+        "created_at": now.isoformat() + "Z",
+        "data": data,
+    })
+
+
+def _publish_on_commit(db, message: Message) -> None:
+    # AsyncSession proxies .info to its sync session, whose commit runs the hook.
+    on_commit(db, lambda: publish(message))
+
+
+def emit(db, event_type: str, data: dict, api_key_id: Optional[str] = None,
+         organization_id: Optional[str] = None) -> OutboxEvent:
+    """Add an outbox event to ``db``'s transaction and return it."""
+    now = datetime.utcnow()
+    event_id, payload = _envelope(event_type, data, now)
+    event = OutboxEvent(event_type=event_type, api_key_id=api_key_id, organization_id=organization_id,
+                        payload=payload, created_at=now)
+    db.add(event)
+    # token.completed -> a change to the token in data["tokenId"], and so on.
+    entity_type = event_type.split(".", 1)[0]
+    record_change(db, event_type, entity_type, data.get(f"{entity_type}Id"), data, api_key_id, now, organization_id)
+    _publish_on_commit(db, Message(event_id, event_type, payload, api_key_id, organization_id))
+    return event
+
+
+def notify(db, event_type: str, data: dict, api_key_id: Optional[str] = None,
+           organization_id: Optional[str] = None) -> None:
+    """Publish to live streams once ``db`` commits; no outbox row, so no webhook."""
+    event_id, payload = _envelope(event_type, data, datetime.utcnow())
+    _publish_on_commit(db, Message(event_id, event_type, payload, api_key_id, organization_id))
@@ -0,0 +1,209 @@
+"""Idempotency-Key support for endpoints that clients retry.
+
+The first request carrying a key reserves it in ``idempotency_keys`` (in its
+own short transaction), runs normally, and stores its response in the same
+transaction as its writes. A retry with the same key and body replays the
+stored response without running the handler again, so nothing is signed,
+geocoded or written twice. A retry that arrives while the first attempt is
+still running gets 409; reusing a key with a different body gets 422.
+
+Error responses are not stored: the reservation is released so the client
+can fix the request and retry with the same key. Responses read back from
+the database are cached per process until they expire.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import Response, jsonify, make_response, request
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from .config import get_settings
+from .database import rollback_request_session, session_scope
+from .errors import AppError, ConflictError
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# An in-progress reservation older than this is treated as abandoned (the
+# worker died mid-request) and may be taken over by a retry.
+_RESERVATION_TIMEOUT = timedelta(seconds=60)
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: str
+    content_type: str
+    expires_at: datetime
+
+
+class _ResponseCache:
+    def __init__(self, size: int):
+        self.size = size
+        self._items: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item.expires_at <= datetime.utcnow():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item
+
+    def put(self, key: str, item: StoredResponse) -> None:
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+_cache: Optional[_ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def _response_cache() -> _ResponseCache:
+    """The process-wide cache, sized from the settings on first use rather than at import."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = _ResponseCache(get_settings().idempotency_cache_size)
+        return _cache
+
+
+def record_id(scope: str, principal: Optional[str], key: str) -> str:
+    return hashlib.sha256(f"{scope}\x00{principal or ''}\x00{key}".encode()).hexdigest()
+
+
+def request_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def _check_same_request(stored: StoredResponse, body_hash: str) -> StoredResponse:
+    if stored.request_hash != body_hash:
+        raise AppError("Idempotency-Key was already used with a different request body", status_code=422)
+    return stored
+
+
+def begin(rid: str, body_hash: str) -> Optional[StoredResponse]:
+    """Reserve ``rid`` and return None, or return the response already stored for it."""
+    cached = _response_cache().get(rid)
+    if cached is not None:
+        return _check_same_request(cached, body_hash)
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(hours=get_settings().idempotency_ttl_hours)
+    try:
+        with session_scope(own_transaction=True) as db:
+            row = db.get(IdempotencyKey, rid)
+            abandoned = row is not None and row.status_code is None and row.created_at < now - _RESERVATION_TIMEOUT
+            if row is None:
+                db.add(IdempotencyKey(id=rid, request_hash=body_hash, created_at=now, expires_at=expires_at))
+                return None
+            if row.expires_at <= now or abandoned:
+                row.request_hash, row.status_code, row.response_body, row.content_type = body_hash, None, None, None
+                row.created_at, row.expires_at = now, expires_at
+                return None
+            if row.status_code is None:
+                if row.request_hash != body_hash:
+                    raise AppError("Idempotency-Key was already used with a different request body", status_code=422)
+                raise ConflictError("A request with this Idempotency-Key is still in progress")
+            stored = StoredResponse(row.request_hash, row.status_code, row.response_body or "",
+                                    row.content_type or "application/json", row.expires_at)
+    except IntegrityError as e:
+        # Another request inserted the same key between our read and commit.
+        raise ConflictError("A request with this Idempotency-Key is still in progress") from e
+
+    _response_cache().put(rid, stored)
+    return _check_same_request(stored, body_hash)
+
+
+def _completed_values(status_code: int, body: str, content_type: str) -> dict:
+    return {"status_code": status_code, "response_body": body, "content_type": content_type}
+
+
+def complete(db, rid: str, status_code: int, body: str, content_type: str) -> None:
+    """Store the response in ``db``'s transaction, next to the writes it describes."""
+    db.execute(update(IdempotencyKey).where(IdempotencyKey.id == rid)
+               .values(**_completed_values(status_code, body, content_type)))
+
+
+async def complete_async(db, rid: str, status_code: int, body: str, content_type: str) -> None:
+    await db.execute(update(IdempotencyKey).where(IdempotencyKey.id == rid)
+                     .values(**_completed_values(status_code, body, content_type)))
+
+
+def release(rid: str) -> None:
+    """Drop an unfinished reservation so the key can be retried."""
+    with session_scope(own_transaction=True) as db:
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == rid, IdempotencyKey.status_code.is_(None)))
+
+
+def purge_expired(now: Optional[datetime] = None) -> int:
+    with session_scope(own_transaction=True) as db:
+        result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or datetime.utcnow())))
+        return result.rowcount or 0
+
+
+def _replay(stored: StoredResponse) -> Response:
+    response = Response(stored.body, status=stored.status_code, content_type=stored.content_type)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(scope: str, principal: Callable[[], Optional[str]] = lambda: None):
+    """Honour the Idempotency-Key header on a Flask view.
+
+    ``principal`` identifies the caller (e.g. the JWT identity) so two callers
+    cannot replay each other's responses; apply below ``@jwt_required()``.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} is too long", "status": "error"}), 400
+
+            rid = record_id(scope, principal(), key)
+            try:
+                stored = begin(rid, request_hash(request.get_data(cache=True)))
+            except AppError as exc:
+                return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+            if stored is not None:
+                return _replay(stored)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                rollback_request_session()
+                release(rid)
+                raise
+            if response.status_code >= 400:
+                # The response is an error either way: drop its writes before
+                # the release takes its own transaction.
+                rollback_request_session()
+                release(rid)
+            else:
+                with session_scope() as db:
+                    complete(db, rid, response.status_code, response.get_data(as_text=True), response.content_type)
+            return response
+
+        return wrapper
+
+    return decorator
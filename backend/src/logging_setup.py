@@ -0,0 +1,131 @@
+"""Process-wide logging: a queue on the request thread, output on a listener.
+
+Request threads only put the ``LogRecord`` on a queue. Merging ``%`` args,
+redacting email addresses, JSON encoding and the stdout write all happen on
+the listener thread. Because formatting is deferred, pass plain values as log
+arguments rather than objects that may change (or lazy-load) afterwards.
+
+INFO records from request handlers and services can be sampled with
+``LOG_INFO_SAMPLE_RATE``; warnings and errors are always kept.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Tuple
+
+from .jsonlib import dumps
+
+SAMPLED_LOGGERS: Tuple[str, ...] = ("src.routes_", "src.services_")
+
+_EMAIL_RE = re.compile(r"([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+)")
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+def redact(text: str) -> str:
+    """Mask the local part of email addresses: jane@example.com -> j***@example.com."""
+    return _EMAIL_RE.sub(r"\1***@\2", text)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+        }
+        if record.exc_text:
+            entry["exc"] = redact(record.exc_text)
+        return dumps(entry)
+
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a ``rate`` fraction of INFO records from the given logger prefixes."""
+
+    def __init__(self, rate: float, prefixes: Tuple[str, ...] = SAMPLED_LOGGERS):
+        super().__init__()
+        self.rate = rate
+        self.prefixes = prefixes
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno != logging.INFO or not record.name.startswith(self.prefixes):
+            return True
+        return random.random() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() merges args on the caller's thread. Only the
+        # traceback is rendered here, so the record does not pin stack frames.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _build_formatter(fmt: str) -> logging.Formatter:
+    if fmt == "text":
+        return RedactingFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    return JsonFormatter()
+
+
+def _start_listener(output: logging.Handler) -> None:
+    global _listener
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork() -> None:
+    # Threads do not survive fork (e.g. gunicorn --preload), so each worker
+    # gets its own queue and listener.
+    if _listener is not None:
+        _start_listener(_listener.handlers[0])
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(level: str = "INFO", fmt: str = "json", info_sample_rate: float = 1.0) -> None:
+    """Route the root logger through the queue. Safe to call more than once."""
+    global _queue_handler
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _queue_handler is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(_build_formatter(fmt))
+
+    _queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(SamplingFilter(info_sample_rate))
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+
+    _start_listener(output)
+    atexit.register(stop_logging)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,273 @@
+"""In-process metrics exposed at ``/api/metrics`` in Prometheus text format.
+
+Recorded per process: request latency by endpoint, method and status;
+queries and database time per request (engine events); connection pool
+checkout wait; cache hits and misses. With several gunicorn workers each
+worker reports its own series, so scrape them individually or aggregate
+on the Prometheus side.
+
+Recording is a dict lookup, a bisect and an add under a lock per metric, so
+it is cheap enough to leave on; set ``METRICS_ENABLED=false`` to skip it.
+"""
+
+import bisect
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (non-cumulative, +Inf last), sum]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(counts), total) for k, (counts, total) in self._series.items()]
+        names = self.label_names + ("le",)
+        lines = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Gauge computed at scrape time from ``collect() -> {label values: value}``."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Dict[LabelValues, float]],
+                 labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}"
+            for k, v in self.collect().items()
+        ]
+
+
+_pools: "weakref.WeakSet[TimedQueuePool]" = weakref.WeakSet()
+
+
+def _pool_usage() -> Dict[LabelValues, float]:
+    values: Dict[LabelValues, float] = {}
+    for pool in list(_pools):
+        name = pool.metrics_name
+        values[(name, "checked_out")] = values.get((name, "checked_out"), 0) + pool.checkedout()
+        values[(name, "idle")] = values.get((name, "idle"), 0) + pool.checkedin()
+    return values
+
+
+REQUEST_LATENCY = Histogram(
+    "verifai_http_request_duration_seconds", "Request latency by endpoint, method and status.",
+    LATENCY_BUCKETS, ("endpoint", "method", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "verifai_db_queries_per_request", "SQL statements executed per request.",
+    QUERY_COUNT_BUCKETS, ("endpoint",),
+)
+REQUEST_DB_TIME = Histogram(
+    "verifai_db_time_per_request_seconds", "Time spent executing SQL per request.",
+    DB_TIME_BUCKETS, ("endpoint",),
+)
+DB_QUERIES = Counter("verifai_db_queries_total", "SQL statements executed.")
+DB_SECONDS = Counter("verifai_db_query_seconds_total", "Time spent executing SQL.")
+POOL_WAIT = Histogram(
+    "verifai_db_pool_checkout_seconds", "Time to check a connection out of the pool, including connecting.",
+    POOL_WAIT_BUCKETS, ("pool",),
+)
+POOL_CONNECTIONS = Gauge(
+    "verifai_db_pool_connections", "Pooled connections by state.", _pool_usage, ("pool", "state"),
+)
+CACHE_REQUESTS = Counter("verifai_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+
+REGISTRY = [
+    REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, DB_QUERIES, DB_SECONDS,
+    POOL_WAIT, POOL_CONNECTIONS, CACHE_REQUESTS,
+]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(1, cache, "hit" if hit else "miss")
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    metrics_name = "primary"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.add(self)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start, self.metrics_name)
+
+
+def timed_pool_class(name: str) -> type:
+    """TimedQueuePool subclass whose samples are labelled ``pool=name``."""
+    return type(f"TimedQueuePool_{name}", (TimedQueuePool,), {"metrics_name": name})
+
+
+# ---------------------------------------------------------------------------
+# Per-request database accounting
+# ---------------------------------------------------------------------------
+
+# [statements, seconds] for the request running in this thread or task.
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+_engine_hooks_installed = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    DB_QUERIES.inc()
+    DB_SECONDS.inc(elapsed)
+    totals = _request_db.get()
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += elapsed
+
+
+def install_engine_hooks() -> None:
+    """Count statements on every engine, including the async engine's sync core."""
+    global _engine_hooks_installed
+    if not _engine_hooks_installed:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _engine_hooks_installed = True
+
+
+def start_request() -> float:
+    _request_db.set([0, 0.0])
+    return time.perf_counter()
+
+
+def finish_request(started: float, endpoint: str, method: str, status: int) -> None:
+    REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint, method, str(status))
+    totals = _request_db.get()
+    if totals is not None:
+        REQUEST_QUERIES.observe(totals[0], endpoint)
+        REQUEST_DB_TIME.observe(totals[1], endpoint)
+        _request_db.set(None)
+
+
+def init_metrics(app: Flask, token: str = "") -> None:
+    """Record request metrics and serve them at ``/api/metrics``.
+
+    When ``token`` is set, scrapes must send ``Authorization: Bearer <token>``.
+    """
+    install_engine_hooks()
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = start_request()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            finish_request(started, rule, request.method, response.status_code)
+        return response
+
+    def metrics_view():
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return jsonify({"error": "Missing or invalid authorization"}), 401
+        return Response(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_url_rule("/api/metrics", "metrics", metrics_view)
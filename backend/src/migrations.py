@@ -0,0 +1,844 @@
+"""Versioned schema migrations.
+
+Each migration is registered with ``@migration(version, name)`` and receives a
+SQLAlchemy ``Connection``. Applied versions are recorded in ``schema_version``
+so application startup only has to read a single row instead of reflecting
+every table.
+
+Migrations marked ``transactional=False`` run on an AUTOCOMMIT connection,
+which lets Postgres build indexes with ``CREATE INDEX CONCURRENTLY`` without
+blocking writes.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    inspect,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+from .partitioning import (
+    default_partition_name,
+    has_default_partition,
+    is_partitioned,
+    partition_indexes,
+    partitions_of,
+)
+
+logger = logging.getLogger(__name__)
+
+_version_metadata = MetaData()
+
+schema_version_table = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Arbitrary constant used for pg_advisory_lock so concurrent deploys do not
+# apply the same migration twice.
+_ADVISORY_LOCK_ID = 720_251_026
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+    transactional: bool = True
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str, transactional: bool = True):
+    def register(fn: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise RuntimeError(f"Migration {version} registered out of order")
+        MIGRATIONS.append(Migration(version, name, fn, transactional))
+        return fn
+
+    return register
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+# ---------------------------------------------------------------------------
+# Helpers available to migrations
+# ---------------------------------------------------------------------------
+
+def _is_online(conn: Connection) -> bool:
+    return conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+
+def _drop_invalid_index(conn: Connection, name: str) -> None:
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind that
+    # IF NOT EXISTS would silently keep; drop it so the build is retried.
+    invalid = conn.execute(
+        text(
+            "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        logger.warning("[MIGRATE] Dropping invalid index %s before rebuilding", name)
+        conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def create_index(conn: Connection, name: str, table: str, columns: List[str], unique: bool = False) -> None:
+    """Create an index if missing, without blocking writes where supported."""
+    unique_sql = "UNIQUE " if unique else ""
+    column_sql = ", ".join(columns)
+    if is_partitioned(conn, table):
+        _create_partitioned_index(conn, name, table, column_sql, unique_sql)
+    elif conn.dialect.name == "postgresql" and _is_online(conn):
+        _drop_invalid_index(conn, name)
+        conn.exec_driver_sql(
+            f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_sql})"
+        )
+    else:
+        conn.exec_driver_sql(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({column_sql})")
+
+
+def _create_partitioned_index(conn: Connection, name: str, table: str, column_sql: str, unique_sql: str) -> None:
+    # CONCURRENTLY is not allowed on a partitioned table. Create the parent
+    # index ON ONLY the parent (invalid until complete), build each
+    # partition's index (concurrently when online) and attach it.
+    conn.exec_driver_sql(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON ONLY {table} ({column_sql})")
+    attached = set(partition_indexes(conn, name))
+    concurrently = "CONCURRENTLY " if _is_online(conn) else ""
+    partitions = [(partition, f"{month:%Y_%m}") for partition, month in partitions_of(conn, table)]
+    if has_default_partition(conn, table):
+        partitions.append((default_partition_name(table), "default"))
+    for partition, suffix in partitions:
+        child = f"{name}_{suffix}"
+        if child in attached:
+            continue
+        if concurrently:
+            _drop_invalid_index(conn, child)
+        conn.exec_driver_sql(
+            f"CREATE {unique_sql}INDEX {concurrently}IF NOT EXISTS {child} ON {partition} ({column_sql})"
+        )
+        conn.exec_driver_sql(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def add_column(conn: Connection, table: str, column: str, ddl_type: str) -> None:
+    """Add a nullable column if missing (adding a NULL column never rewrites the table)."""
+    if column in {col["name"] for col in inspect(conn).get_columns(table)}:
+        return
+    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}")
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+@migration(1, "baseline")
+def _baseline(conn: Connection) -> None:
+    # Snapshot of the schema previously produced by Base.metadata.create_all.
+    # Existing databases already have these tables, so checkfirst makes this
+    # a no-op that only stamps the version.
+    metadata = MetaData()
+    Table(
+        "users",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("email", String, unique=True, index=True, nullable=False),
+        Column("password_hash", String, nullable=False),
+        Column("role", String),
+        Column("created_at", DateTime),
+    )
+    Table(
+        "verification_tokens",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("token", Text, nullable=False),
+        Column("email", String, nullable=False),
+        Column("full_name", String, nullable=False),
+        Column("organization_name", String, nullable=False),
+        Column("created_at", DateTime),
+        Column("expires_at", DateTime, nullable=False),
+        Column("used", Boolean),
+        Column("used_at", DateTime, nullable=True),
+        Column("status", String),
+        Column("api_key_id", String, nullable=True),
+    )
+    Table(
+        "verifications",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("token_id", String, nullable=True),
+        Column("timestamp", DateTime),
+        Column("personal_info", Text, nullable=False),
+        Column("location_data", Text, nullable=True),
+        Column("security_data", Text, nullable=True),
+        Column("verification_results", Text, nullable=False),
+        Column("consent_provided", Boolean),
+    )
+    Table(
+        "api_keys",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("name", String, nullable=False),
+        Column("company", String, nullable=False),
+        Column("key_prefix", String, nullable=False),
+        Column("key_hash", String, unique=True, nullable=False),
+        Column("active", Boolean),
+        Column("created_at", DateTime),
+        Column("expires_at", DateTime, nullable=True),
+        Column("last_used_at", DateTime, nullable=True),
+        Column("usage_count", Integer),
+        Column("permissions", Text, nullable=True),
+        Column("rate_limit", Integer),
+        Column("environment", String),
+    )
+    Table(
+        "uploads",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("filename", String, nullable=False),
+        Column("original_filename", String, nullable=False),
+        Column("filepath", String, nullable=False),
+        Column("file_size", Integer, nullable=False),
+        Column("document_type", String),
+        Column("verification_id", String, nullable=True),
+        Column("uploaded_at", DateTime),
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+
+
+@migration(2, "hot lookup indexes", transactional=False)
+def _hot_lookup_indexes(conn: Connection) -> None:
+    create_index(conn, "ix_verifications_token_id", "verifications", ["token_id"])
+    create_index(conn, "ix_verifications_timestamp", "verifications", ["timestamp"])
+    create_index(conn, "ix_verification_tokens_status", "verification_tokens", ["status"])
+    create_index(conn, "ix_verification_tokens_expires_at", "verification_tokens", ["expires_at"])
+    create_index(conn, "ix_verification_tokens_api_key_id", "verification_tokens", ["api_key_id"])
+
+
+@migration(3, "table versions")
+def _table_versions(conn: Connection) -> None:
+    # One counter per table, bumped in the same transaction as any write to it.
+    # Conditional GETs compare these instead of re-running listing queries.
+    metadata = MetaData()
+    table = Table(
+        "table_versions",
+        metadata,
+        Column("name", String, primary_key=True),
+        Column("version", Integer, nullable=False, default=0),
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+    for name in ("users", "verification_tokens", "verifications", "api_keys", "uploads"):
+        conn.execute(table.insert().values(name=name, version=0))
+
+
+@migration(4, "idempotency keys")
+def _idempotency_keys(conn: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        "idempotency_keys",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("request_hash", String, nullable=False),
+        Column("status_code", Integer, nullable=True),
+        Column("response_body", Text, nullable=True),
+        Column("content_type", String, nullable=True),
+        Column("created_at", DateTime),
+        Column("expires_at", DateTime, nullable=False, index=True),
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+
+
+@migration(5, "upload content hash")
+def _upload_sha256(conn: Connection) -> None:
+    add_column(conn, "uploads", "sha256", "VARCHAR(64)")
+
+
+@migration(6, "content-addressed upload blobs")
+def _upload_blobs(conn: Connection) -> None:
+    # Uploads stored before this keep their flat files; only new ones get blobs.
+    metadata = MetaData()
+    Table(
+        "upload_blobs",
+        metadata,
+        Column("sha256", String(64), primary_key=True),
+        Column("size", Integer, nullable=False),
+        Column("ref_count", Integer, nullable=False, default=0),
+        Column("created_at", DateTime),
+        Column("unreferenced_at", DateTime, nullable=True),
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+    create_index(conn, "ix_upload_blobs_unreferenced_at", "upload_blobs", ["unreferenced_at"])
+    create_index(conn, "ix_uploads_sha256", "uploads", ["sha256"])
+
+
+@migration(7, "upload processing state")
+def _upload_processing(conn: Connection) -> None:
+    add_column(conn, "uploads", "processing_status", "VARCHAR(16)")
+    add_column(conn, "uploads", "processing_updated_at", "TIMESTAMP")
+    add_column(conn, "uploads", "processing_error", "TEXT")
+    add_column(conn, "uploads", "page_count", "INTEGER")
+    add_column(conn, "uploads", "document_metadata", "TEXT")
+    add_column(conn, "uploads", "preview_path", "VARCHAR")
+    create_index(conn, "ix_uploads_processing_status", "uploads", ["processing_status"])
+
+
+@migration(8, "webhook outbox")
+def _webhook_outbox(conn: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        "outbox_events",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("event_type", String, nullable=False),
+        Column("api_key_id", String, nullable=True),
+        Column("payload", Text, nullable=False),
+        Column("created_at", DateTime),
+        Column("dispatched_at", DateTime, nullable=True),
+    )
+    Table(
+        "webhook_endpoints",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("url", String, nullable=False),
+        Column("secret", String, nullable=False),
+        Column("event_types", Text, nullable=False),
+        Column("api_key_id", String, nullable=True, index=True),
+        Column("max_concurrency", Integer, nullable=False),
+        Column("active", Boolean),
+        Column("created_at", DateTime),
+    )
+    Table(
+        "webhook_deliveries",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("event_id", Integer, nullable=False, index=True),
+        Column("endpoint_id", String, nullable=False, index=True),
+        Column("status", String(16), nullable=False),
+        Column("attempts", Integer, nullable=False),
+        Column("next_attempt_at", DateTime, nullable=False),
+        Column("last_status_code", Integer, nullable=True),
+        Column("last_error", Text, nullable=True),
+        Column("created_at", DateTime),
+        Column("delivered_at", DateTime, nullable=True),
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+    # The dispatcher's two hot queries: undispatched events in id order, and
+    # due deliveries.
+    create_index(conn, "ix_outbox_events_dispatched_at_id", "outbox_events", ["dispatched_at", "id"])
+    create_index(conn, "ix_webhook_deliveries_status_next", "webhook_deliveries", ["status", "next_attempt_at"])
+
+
+@migration(9, "change feed")
+def _change_feed(conn: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        "changes",
+        metadata,
+        Column("seq", Integer, primary_key=True, autoincrement=True),
+        Column("change_type", String, nullable=False),
+        Column("entity_type", String(32), nullable=False),
+        Column("entity_id", String, nullable=True),
+        Column("api_key_id", String, nullable=True),
+        Column("data", Text, nullable=False),
+        Column("occurred_at", DateTime, nullable=False),
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+    # Partner syncs page through their own key's changes by seq.
+    create_index(conn, "ix_changes_api_key_id_seq", "changes", ["api_key_id", "seq"])
+    # Appends lock this counter row to keep seq in commit order.
+    conn.execute(text("INSERT INTO table_versions (name, version) VALUES ('changes', 0)"))
+
+
+@migration(10, "verification archive")
+def _verification_archive(conn: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        "archive_segments",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("path", String, nullable=False),
+        Column("codec", String(8), nullable=False),
+        Column("record_count", Integer, nullable=False),
+        Column("size_bytes", Integer, nullable=False),
+        Column("min_timestamp", DateTime, nullable=False),
+        Column("max_timestamp", DateTime, nullable=False),
+        Column("created_at", DateTime),
+    )
+    Table(
+        "archived_verifications",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("token_id", String, nullable=True, index=True),
+        Column("timestamp", DateTime, nullable=False, index=True),
+        Column("segment_id", String, nullable=False),
+        Column("block", Integer, nullable=False),
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+
+
+# Migrations below backfill with their own copies of the application logic
+# they need, so what a migration writes never changes with later app code.
+
+# The search index as search.py defined it when migration 11 was written.
+_SEARCH_MIN_TERM = 2
+_SEARCH_MAX_TERM = 32
+_SEARCH_FIELD_WEIGHTS = {"full_name": 3, "email": 3, "address": 1}
+_SEARCH_WORD = re.compile(r"[^\W_]+")
+_SEARCH_TRIGRAM_INDEX = "ix_search_documents_document_trgm"
+
+_search_metadata = MetaData()
+_search_documents = Table(
+    "search_documents",
+    _search_metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("entity_type", String(16), nullable=False),
+    Column("entity_id", String, nullable=False),
+    Column("full_name", String, nullable=True),
+    Column("email", String, nullable=True),
+    Column("address", String, nullable=True),
+    Column("document", Text, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+_search_terms = Table(
+    "search_terms",
+    _search_metadata,
+    Column("term", String, primary_key=True),
+    Column("document_id", Integer, primary_key=True),
+    Column("weight", Integer, nullable=False),
+    sqlite_with_rowid=False,
+)
+
+
+def _json_object(value: Optional[str]) -> Dict:
+    try:
+        loaded = json.loads(value) if value else None
+    except ValueError:
+        return {}
+    return loaded if isinstance(loaded, dict) else {}
+
+
+def _search_words(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return _SEARCH_WORD.findall("".join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+def _search_document(entity_type: str, row) -> Dict:
+    info = _json_object(row.personal_info)
+    full_name, email = row.full_name or info.get("full_name"), row.email or info.get("email")
+    address = info.get("address")
+    return {
+        "entity_type": entity_type,
+        "entity_id": row.id,
+        "full_name": full_name,
+        "email": email,
+        "address": address,
+        "document": " ".join(_search_words(" ".join(filter(None, (full_name, email, address))))),
+        "created_at": row.created_at or datetime.utcnow(),
+    }
+
+
+def _search_term_weights(document: Dict) -> Dict[str, int]:
+    terms: Dict[str, int] = {}
+    for field, weight in _SEARCH_FIELD_WEIGHTS.items():
+        for word in _search_words(document[field]):
+            word = word[:_SEARCH_MAX_TERM]
+            for end in range(_SEARCH_MIN_TERM, len(word) + 1):
+                prefix = word[:end]
+                terms[prefix] = max(terms.get(prefix, 0), weight + (end == len(word)))
+    return terms
+
+
+def _unindexed_batches(conn: Connection, entity_type: str, sql: str, batch_size: int) -> Iterable[list]:
+    stmt = text(
+        f"SELECT * FROM ({sql}) r WHERE r.id > :after AND NOT EXISTS ("
+        "SELECT 1 FROM search_documents d WHERE d.entity_type = :entity_type AND d.entity_id = r.id"
+        ") ORDER BY r.id LIMIT :limit"
+    ).columns(created_at=DateTime)
+    after = ""
+    while True:
+        rows = conn.execute(stmt, {"after": after, "entity_type": entity_type, "limit": batch_size}).all()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1].id
+
+
+def _index_unindexed_records(conn: Connection, batch_size: int = 2000) -> None:
+    """Write search documents (and, without pg_trgm, terms) for tokens and verifications that have none."""
+    with_terms = conn.dialect.name != "postgresql" or conn.execute(
+        text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {"name": _SEARCH_TRIGRAM_INDEX}
+    ).first() is None
+    sources = (
+        ("token", "SELECT id, created_at, full_name, email, NULL AS personal_info FROM verification_tokens"),
+        ("verification", "SELECT id, timestamp AS created_at, NULL AS full_name, NULL AS email, personal_info "
+                         "FROM verifications"),
+    )
+    insert = _search_documents.insert().returning(_search_documents.c.id, _search_documents.c.entity_id)
+    for entity_type, sql in sources:
+        for rows in _unindexed_batches(conn, entity_type, sql, batch_size):
+            documents = [_search_document(entity_type, row) for row in rows]
+            ids = {entity_id: doc_id for doc_id, entity_id in conn.execute(insert, documents).all()}
+            if not with_terms:
+                continue
+            terms = [
+                {"term": term, "document_id": ids[d["entity_id"]], "weight": weight}
+                for d in documents
+                for term, weight in _search_term_weights(d).items()
+            ]
+            if terms:
+                conn.execute(_search_terms.insert(), terms)
+
+
+@migration(11, "search index")
+def _search_index(conn: Connection) -> None:
+    _search_metadata.create_all(bind=conn, checkfirst=True)
+    create_index(conn, "ux_search_documents_entity", "search_documents", ["entity_type", "entity_id"], unique=True)
+    create_index(conn, "ix_search_terms_document_id", "search_terms", ["document_id"])
+
+    # Before the backfill, which then skips search_terms if pg_trgm is available.
+    if conn.dialect.name == "postgresql":
+        try:
+            with conn.begin_nested():
+                conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DBAPIError:
+            logger.warning("[MIGRATE] pg_trgm is not available, search uses the inverted index")
+        else:
+            conn.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS {_SEARCH_TRIGRAM_INDEX} ON search_documents "
+                "USING gin (document gin_trgm_ops)"
+            )
+    _index_unindexed_records(conn)
+
+
+@migration(12, "organizations")
+def _organizations(conn: Connection) -> None:
+    metadata = MetaData()
+    organizations = Table(
+        "organizations",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("name", String, unique=True, nullable=False),
+        Column("created_at", DateTime),
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+    conn.execute(text("INSERT INTO table_versions (name, version) VALUES ('organizations', 0)"))
+    for table in ("users", "verification_tokens", "verifications", "api_keys"):
+        add_column(conn, table, "organization_id", "VARCHAR REFERENCES organizations(id)")
+    # Copies kept for filtering; they outlive the rows they were copied from.
+    add_column(conn, "archived_verifications", "organization_id", "VARCHAR")
+    add_column(conn, "search_documents", "organization_id", "VARCHAR")
+    add_column(conn, "changes", "organization_id", "VARCHAR")
+    add_column(conn, "outbox_events", "organization_id", "VARCHAR")
+    add_column(conn, "webhook_endpoints", "organization_id", "VARCHAR REFERENCES organizations(id)")
+    add_column(conn, "users", "is_platform", "BOOLEAN DEFAULT FALSE")
+
+    # One organization per name already in use on tokens and API keys;
+    # verifications submitted without a token have no organization.
+    names = set(conn.execute(text("SELECT DISTINCT organization_name FROM verification_tokens")).scalars())
+    names |= set(conn.execute(text("SELECT DISTINCT company FROM api_keys")).scalars())
+    now = datetime.utcnow()
+    rows = [{"id": str(uuid.uuid4()), "name": name, "created_at": now} for name in sorted(filter(None, names))]
+    if rows:
+        conn.execute(organizations.insert(), rows)
+    conn.execute(text(
+        "UPDATE verification_tokens SET organization_id = "
+        "(SELECT o.id FROM organizations o WHERE o.name = verification_tokens.organization_name)"
+    ))
+    conn.execute(text(
+        "UPDATE api_keys SET organization_id = (SELECT o.id FROM organizations o WHERE o.name = api_keys.company)"
+    ))
+    for table in ("verifications", "archived_verifications"):
+        conn.execute(text(
+            f"UPDATE {table} SET organization_id = "
+            f"(SELECT t.organization_id FROM verification_tokens t WHERE t.id = {table}.token_id) "
+            "WHERE token_id IS NOT NULL"
+        ))
+    # A database that applied migration 11 while it left the backfill to this
+    # one has no documents yet.
+    _index_unindexed_records(conn)
+    for table, entity_type in (
+        ("archived_verifications", "verification"), ("verifications", "verification"), ("verification_tokens", "token"),
+    ):
+        conn.execute(text(
+            f"UPDATE search_documents SET organization_id = "
+            f"(SELECT r.organization_id FROM {table} r WHERE r.id = search_documents.entity_id) "
+            f"WHERE entity_type = '{entity_type}' "
+            f"AND EXISTS (SELECT 1 FROM {table} r WHERE r.id = search_documents.entity_id)"
+        ))
+    # Each change's organization is its token's or verification's, or failing that its API key's.
+    conn.execute(text(
+        "UPDATE changes SET organization_id = COALESCE("
+        "(SELECT t.organization_id FROM verification_tokens t "
+        " WHERE changes.entity_type = 'token' AND t.id = changes.entity_id), "
+        "(SELECT v.organization_id FROM verifications v "
+        " WHERE changes.entity_type = 'verification' AND v.id = changes.entity_id), "
+        "(SELECT a.organization_id FROM archived_verifications a "
+        " WHERE changes.entity_type = 'verification' AND a.id = changes.entity_id), "
+        "(SELECT k.organization_id FROM api_keys k WHERE k.id = changes.api_key_id))"
+    ))
+    # Events not fanned out yet only carry their API key.
+    conn.execute(text(
+        "UPDATE outbox_events SET organization_id = "
+        "(SELECT k.organization_id FROM api_keys k WHERE k.id = outbox_events.api_key_id) "
+        "WHERE dispatched_at IS NULL AND api_key_id IS NOT NULL"
+    ))
+    # An endpoint for one API key belongs to the key's organization. The others were made
+    # before endpoints had an owner and stay platform-wide.
+    conn.execute(text(
+        "UPDATE webhook_endpoints SET organization_id = "
+        "(SELECT k.organization_id FROM api_keys k WHERE k.id = webhook_endpoints.api_key_id) "
+        "WHERE api_key_id IS NOT NULL"
+    ))
+    # Existing users have no organization yet. Admins keep seeing all of them;
+    # everyone else, including anyone who signed themselves up, sees none
+    # until they are assigned one.
+    conn.execute(
+        text("UPDATE users SET is_platform = :platform WHERE role = 'admin'"),
+        {"platform": True},
+    )
+
+
+@migration(13, "organization indexes", transactional=False)
+def _organization_indexes(conn: Connection) -> None:
+    # Led by the organization, so one tenant's listings, counts and exports
+    # range-scan its own entries however large the other tenants grow.
+    create_index(conn, "ix_verification_tokens_org_created_at", "verification_tokens",
+                 ["organization_id", "created_at"])
+    create_index(conn, "ix_verification_tokens_org_status", "verification_tokens", ["organization_id", "status"])
+    create_index(conn, "ix_verifications_org_timestamp", "verifications", ["organization_id", "timestamp"])
+    create_index(conn, "ix_archived_verifications_org_timestamp", "archived_verifications",
+                 ["organization_id", "timestamp"])
+    create_index(conn, "ix_api_keys_organization_id", "api_keys", ["organization_id"])
+    create_index(conn, "ix_users_organization_id", "users", ["organization_id"])
+    create_index(conn, "ix_changes_organization_id_seq", "changes", ["organization_id", "seq"])
+
+
+@migration(14, "verification status", transactional=False)
+def _verification_status(conn: Connection) -> None:
+    # A copy of verification_results' status, so dashboard stats are counted
+    # from an index instead of by parsing every row's JSON.
+    add_column(conn, "verifications", "status", "VARCHAR(32)")
+    status = (
+        "verification_results::json->>'status'" if conn.dialect.name == "postgresql"
+        else "json_extract(verification_results, '$.status')"
+    )
+    conn.execute(text(f"UPDATE verifications SET status = {status} WHERE status IS NULL"))
+    create_index(conn, "ix_verifications_org_status", "verifications", ["organization_id", "status"])
+
+
+# Device fingerprints as devices.py defined them when migration 15 was written.
+_DEVICE_FIELDS = ("user_agent", "screen_resolution", "timezone", "ip_address")
+
+
+def _device_fingerprint(security: Dict) -> Optional[str]:
+    values = [str(security.get(field) or "").strip().lower() for field in _DEVICE_FIELDS]
+    if not any(values[:3]):
+        return None
+    return hashlib.sha256("\x1f".join(values).encode()).hexdigest()
+
+
+def _identity_key(email: Optional[str]) -> Optional[str]:
+    email = (email or "").strip().lower()
+    return hashlib.sha256(email.encode()).hexdigest() if email else None
+
+
+@migration(15, "device fingerprints")
+def _device_fingerprints(conn: Connection) -> None:
+    metadata = MetaData()
+    device_identities = Table(
+        "device_identities",
+        metadata,
+        Column("fingerprint", String(64), primary_key=True),
+        Column("identity", String(64), primary_key=True),
+        Column("first_seen_at", DateTime, nullable=False),
+        Column("last_seen_at", DateTime, nullable=False),
+        Column("verification_count", Integer, nullable=False),
+        sqlite_with_rowid=False,
+    )
+    metadata.create_all(bind=conn, checkfirst=True)
+    add_column(conn, "verifications", "device_fingerprint", "VARCHAR(64)")
+
+    # Every hot verification, oldest first, so a later sighting of a device
+    # and identity only moves last_seen_at forward. Archived verifications
+    # are left out: they are past any review window.
+    insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+    upsert = insert(device_identities)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=["fingerprint", "identity"],
+        set_={
+            "last_seen_at": upsert.excluded.last_seen_at,
+            "verification_count": device_identities.c.verification_count + upsert.excluded.verification_count,
+        },
+    )
+    set_fingerprint = text("UPDATE verifications SET device_fingerprint = :fingerprint WHERE id = :id")
+    columns = "SELECT id, timestamp, personal_info, security_data FROM verifications"
+    first = text(f"{columns} ORDER BY timestamp, id LIMIT :limit").columns(timestamp=DateTime)
+    following = text(
+        f"{columns} WHERE timestamp >= :ts AND (timestamp > :ts OR id > :id) ORDER BY timestamp, id LIMIT :limit"
+    ).columns(timestamp=DateTime)
+    batch_size = 2000
+    rows = conn.execute(first, {"limit": batch_size}).all()
+    while rows:
+        fingerprints, seen = [], {}
+        for row in rows:
+            fingerprint = _device_fingerprint(_json_object(row.security_data))
+            if fingerprint is None:
+                continue
+            fingerprints.append({"id": row.id, "fingerprint": fingerprint})
+            identity = _identity_key(_json_object(row.personal_info).get("email"))
+            if identity is None:
+                continue
+            entry = seen.get((fingerprint, identity))
+            if entry is None:
+                seen[(fingerprint, identity)] = {
+                    "fingerprint": fingerprint, "identity": identity, "first_seen_at": row.timestamp,
+                    "last_seen_at": row.timestamp, "verification_count": 1,
+                }
+            else:
+                entry["last_seen_at"] = row.timestamp
+                entry["verification_count"] += 1
+        if fingerprints:
+            conn.execute(set_fingerprint, fingerprints)
+        if seen:
+            conn.execute(upsert, list(seen.values()))
+        last = rows[-1]
+        rows = conn.execute(following, {"ts": last.timestamp, "id": last.id, "limit": batch_size}).all()
+
+
+@migration(16, "device fingerprint index", transactional=False)
+def _device_fingerprint_index(conn: Connection) -> None:
+    create_index(conn, "ix_verifications_device_fingerprint_timestamp", "verifications",
+                 ["device_fingerprint", "timestamp"])
+
+
+@migration(17, "upload ownership")
+def _upload_ownership(conn: Connection) -> None:
+    add_column(conn, "uploads", "uploaded_by", "VARCHAR")
+    add_column(conn, "uploads", "organization_id", "VARCHAR REFERENCES organizations(id)")
+    # Earlier uploads take their verification's organization; the rest are
+    # left to platform users.
+    conn.execute(text(
+        "UPDATE uploads SET organization_id = "
+        "(SELECT v.organization_id FROM verifications v WHERE v.id = uploads.verification_id) "
+        "WHERE verification_id IS NOT NULL"
+    ))
+
+
+@migration(18, "partitioned table foreign keys")
+def _partitioned_foreign_keys(conn: Connection) -> None:
+    # ``migrate.py partition`` used to rebuild these tables without their
+    # foreign keys; put back the ones migration 12 created.
+    for table in ("verifications", "verification_tokens"):
+        if not is_partitioned(conn, table):
+            continue
+        constraint = f"{table}_organization_id_fkey"
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_constraint WHERE conname = :name AND contype = 'f'"), {"name": constraint}
+        ).first()
+        if exists is None:
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+                "FOREIGN KEY (organization_id) REFERENCES organizations(id)"
+            )
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def current_version(engine: Engine) -> int:
+    """Return the applied schema version, or 0 for an unversioned database."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+    except Exception:
+        return 0
+
+
+def applied_migrations(engine: Engine) -> List[Dict]:
+    with engine.connect() as conn:
+        _version_metadata.create_all(bind=conn, checkfirst=True)
+        conn.commit()
+        rows = conn.execute(schema_version_table.select().order_by(schema_version_table.c.version)).all()
+    return [{"version": r.version, "name": r.name, "applied_at": r.applied_at.isoformat()} for r in rows]
+
+
+def _record(conn: Connection, item: Migration) -> None:
+    conn.execute(
+        schema_version_table.insert().values(version=item.version, name=item.name, applied_at=datetime.utcnow())
+    )
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to ``target`` (default: latest)."""
+    applied: List[int] = []
+    with engine.connect() as lock_conn:
+        use_lock = engine.dialect.name == "postgresql"
+        if use_lock:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+            lock_conn.commit()
+        try:
+            with engine.begin() as conn:
+                _version_metadata.create_all(bind=conn, checkfirst=True)
+            start = current_version(engine)
+            for item in MIGRATIONS:
+                if item.version <= start or (target is not None and item.version > target):
+                    continue
+                logger.info("[MIGRATE] Applying %s: %s", item.version, item.name)
+                if item.transactional:
+                    with engine.begin() as conn:
+                        item.upgrade(conn)
+                        _record(conn, item)
+                else:
+                    with engine.connect() as raw_conn:
+                        conn = raw_conn.execution_options(isolation_level="AUTOCOMMIT")
+                        item.upgrade(conn)
+                        _record(conn, item)
+                applied.append(item.version)
+        finally:
+            if use_lock:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _ADVISORY_LOCK_ID})
+                lock_conn.commit()
+    return applied
+
+
+def ensure_schema(engine: Engine, auto_migrate: bool) -> int:
+    """Startup check: one query against ``schema_version``, no reflection."""
+    version = current_version(engine)
+    if version >= latest_version():
+        return version
+    if not auto_migrate:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {latest_version()}. "
+            "Run `python migrate.py upgrade` before starting the app."
+        )
+    upgrade(engine)
+    return latest_version()
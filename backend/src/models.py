@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .database import Base
@@ -10,6 +10,16 @@ def _uuid() -> str:
     return str(uuid.uuid4())
 
 
+class Organization(Base):
+    """A customer; users, tokens, verifications and API keys belong to one (see tenancy.py)."""
+
+    __tablename__ = "organizations"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=_uuid)
+    name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -18,6 +28,9 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(String, nullable=False)
     role: Mapped[str] = mapped_column(String, default="admin")  # admin | user
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # NULL: not in an organization; it sees every organization only if is_platform.
+    organization_id: Mapped[str | None] = mapped_column(String, ForeignKey("organizations.id"), nullable=True)
+    is_platform: Mapped[bool] = mapped_column(Boolean, default=False)
 
 
 class VerificationToken(Base):
@@ -29,24 +42,29 @@ class VerificationToken(Base):
     full_name: Mapped[str] = mapped_column(String, nullable=False)
     organization_name: Mapped[str] = mapped_column(String, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
     used: Mapped[bool] = mapped_column(Boolean, default=False)
     used_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
-    status: Mapped[str] = mapped_column(String, default="active")  # active | completed | declined | revoked
-    api_key_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    status: Mapped[str] = mapped_column(String, default="active", index=True)  # active | completed | declined | revoked
+    api_key_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    organization_id: Mapped[str | None] = mapped_column(String, ForeignKey("organizations.id"), nullable=True)
 
 
 class Verification(Base):
     __tablename__ = "verifications"
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=_uuid)
-    token_id: Mapped[str | None] = mapped_column(String, nullable=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    token_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     personal_info: Mapped[str] = mapped_column(Text, nullable=False)  # JSON string
     location_data: Mapped[str] = mapped_column(Text, nullable=True)  # JSON string
     security_data: Mapped[str] = mapped_column(Text, nullable=True)  # JSON string
     verification_results: Mapped[str] = mapped_column(Text, nullable=False)  # JSON string
     consent_provided: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Copies of the token's organization and verification_results["status"], for indexed filters and counts.
+    organization_id: Mapped[str | None] = mapped_column(String, ForeignKey("organizations.id"), nullable=True)
+    status: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    device_fingerprint: Mapped[str | None] = mapped_column(String(64), nullable=True)  # see devices.py
 
 
 class ApiKey(Base):
@@ -65,6 +83,7 @@ class ApiKey(Base):
     permissions: Mapped[str] = mapped_column(Text, nullable=True)  # JSON string list
     rate_limit: Mapped[int] = mapped_column(Integer, default=1000)
     environment: Mapped[str] = mapped_column(String, default="production")
+    organization_id: Mapped[str | None] = mapped_column(String, ForeignKey("organizations.id"), nullable=True)
 
 
 class Upload(Base):
@@ -75,6 +94,176 @@ class Upload(Base):
     original_filename: Mapped[str] = mapped_column(String, nullable=False)
     filepath: Mapped[str] = mapped_column(String, nullable=False)
     file_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)  # -> upload_blobs
     document_type: Mapped[str] = mapped_column(String, default="unknown")
     verification_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    uploaded_by: Mapped[str | None] = mapped_column(String, nullable=True)  # user id
+    organization_id: Mapped[str | None] = mapped_column(String, ForeignKey("organizations.id"), nullable=True)
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Filled in by the document pipeline after the upload commits.
+    processing_status: Mapped[str | None] = mapped_column(String(16), default="pending", index=True)  # pending | processing | done | failed
+    processing_updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    processing_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    page_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    document_metadata: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON object
+    preview_path: Mapped[str | None] = mapped_column(String, nullable=True)
+
+
+class UploadBlob(Base):
+    """File content stored once under its SHA-256, shared by every Upload with that hash."""
+
+    __tablename__ = "upload_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Set when ref_count drops to 0; the blob is collected once this is old enough.
+    unreferenced_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # sha256 of route, caller and key
+    request_hash: Mapped[str] = mapped_column(String, nullable=False)
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)  # NULL while in progress
+    response_body: Mapped[str | None] = mapped_column(Text, nullable=True)
+    content_type: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+class OutboxEvent(Base):
+    """Domain event written in the same transaction as the change it describes."""
+
+    __tablename__ = "outbox_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    event_type: Mapped[str] = mapped_column(String, nullable=False)
+    api_key_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    organization_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # JSON body sent to webhooks
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    dispatched_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # fanned out to deliveries
+
+
+class WebhookEndpoint(Base):
+    __tablename__ = "webhook_endpoints"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=_uuid)
+    url: Mapped[str] = mapped_column(String, nullable=False)
+    secret: Mapped[str] = mapped_column(String, nullable=False)
+    event_types: Mapped[str] = mapped_column(Text, nullable=False, default="[\"*\"]")  # JSON list
+    api_key_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)  # NULL: every event it may see
+    # NULL: a platform user's endpoint, sent every organization's events.
+    organization_id: Mapped[str | None] = mapped_column(String, ForeignKey("organizations.id"), nullable=True)
+    max_concurrency: Mapped[int] = mapped_column(Integer, nullable=False, default=4)
+    active: Mapped[bool] = mapped_column(Boolean, default=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class WebhookDelivery(Base):
+    __tablename__ = "webhook_deliveries"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=_uuid)
+    event_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    endpoint_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")  # pending | sending | delivered | dead
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # When a pending delivery is due, or when a claimed (sending) one is considered abandoned.
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    delivered_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class Change(Base):
+    """Change-feed entry; ``seq`` follows commit order (see changes.py)."""
+
+    __tablename__ = "changes"
+
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    change_type: Mapped[str] = mapped_column(String, nullable=False)  # event type, e.g. token.completed
+    entity_type: Mapped[str] = mapped_column(String(32), nullable=False)
+    entity_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    api_key_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    organization_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    data: Mapped[str] = mapped_column(Text, nullable=False)  # JSON, as in the event payload
+    occurred_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class ArchiveSegment(Base):
+    """A compressed NDJSON file of archived verifications (see archive.py)."""
+
+    __tablename__ = "archive_segments"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    path: Mapped[str] = mapped_column(String, nullable=False)  # relative to ARCHIVE_DIR
+    codec: Mapped[str] = mapped_column(String(8), nullable=False)
+    record_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    min_timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    max_timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedVerification(Base):
+    """Where an archived verification lives: its segment and block."""
+
+    __tablename__ = "archived_verifications"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    token_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    segment_id: Mapped[str] = mapped_column(String, nullable=False)
+    block: Mapped[int] = mapped_column(Integer, nullable=False)
+    organization_id: Mapped[str | None] = mapped_column(String, nullable=True)
+
+
+class SearchDocument(Base):
+    """Searchable fields of one token or verification (see search.py)."""
+
+    __tablename__ = "search_documents"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    entity_type: Mapped[str] = mapped_column(String(16), nullable=False)  # token | verification
+    entity_id: Mapped[str] = mapped_column(String, nullable=False)
+    full_name: Mapped[str | None] = mapped_column(String, nullable=True)
+    email: Mapped[str | None] = mapped_column(String, nullable=True)
+    address: Mapped[str | None] = mapped_column(String, nullable=True)
+    document: Mapped[str] = mapped_column(Text, nullable=False)  # normalized words of the fields above
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    organization_id: Mapped[str | None] = mapped_column(String, nullable=True)
+
+
+class SearchTerm(Base):
+    """Inverted index entry: a word or word prefix occurring in a document."""
+
+    __tablename__ = "search_terms"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    term: Mapped[str] = mapped_column(String, primary_key=True)
+    document_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    weight: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class DeviceIdentity(Base):
+    """A person (hashed email) verified from a device, and when (see devices.py)."""
+
+    __tablename__ = "device_identities"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    fingerprint: Mapped[str] = mapped_column(String(64), primary_key=True)
+    identity: Mapped[str] = mapped_column(String(64), primary_key=True)
+    first_seen_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    verification_count: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
@@ -0,0 +1,246 @@
+"""Optional monthly range partitioning of verifications and tokens (Postgres).
+
+``python migrate.py partition`` converts ``verifications`` (on
+``timestamp``) and ``verification_tokens`` (on ``created_at``) into
+partitioned tables with one partition per month, named
+``<table>_pYYYY_MM``. Nothing else changes for the application: queries
+that bound the partition key (the listings' ``from``/``to``, the archive
+job) only touch the months they need, and lookups by id probe each
+partition's primary key index.
+
+``ensure_partitions`` creates the current month and PARTITION_MONTHS_AHEAD
+more; it runs on every ``migrate.py upgrade`` and from ``maintenance.py
+maintain-partitions``, which also drops months older than
+PARTITION_RETENTION_MONTHS. Rows outside every month (dated further ahead,
+or when maintenance has not run) land in the ``<table>_default`` partition
+instead of failing, and move to their month's partition once it is created.
+"""
+
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+# Table -> partition key.
+PARTITION_KEYS: Dict[str, str] = {
+    "verifications": "timestamp",
+    "verification_tokens": "created_at",
+}
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :t"),
+        {"t": table},
+    ).first() is not None
+
+
+def partitions_of(conn: Connection, table: str) -> List[Tuple[str, datetime]]:
+    """(name, month) of each monthly partition, oldest first (not the default partition)."""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :t"
+        ),
+        {"t": table},
+    ).scalars()
+    partitions = []
+    for name in rows:
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def _create_partition(conn: Connection, table: str, month: datetime, parent: Optional[str] = None) -> str:
+    name = partition_name(table, month)
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent or table} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    )
+    return name
+
+
+def _create_default_partition(conn: Connection, table: str, parent: Optional[str] = None) -> str:
+    name = default_partition_name(table)
+    conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent or table} DEFAULT")
+    return name
+
+
+def has_default_partition(conn: Connection, table: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM pg_class WHERE relname = :name AND relispartition"),
+        {"name": default_partition_name(table)},
+    ).first() is not None
+
+
+def _create_partition_from_default(conn: Connection, table: str, month: datetime) -> str:
+    """Create ``month``'s partition, moving its rows out of the default partition.
+
+    Postgres refuses a new partition while the default one holds rows in its
+    range, so the default is detached while they are moved.
+    """
+    key = PARTITION_KEYS[table]
+    default = default_partition_name(table)
+    in_month = f"{key} >= '{month:%Y-%m-%d}' AND {key} < '{add_months(month, 1):%Y-%m-%d}'"
+    if conn.exec_driver_sql(f"SELECT 1 FROM {default} WHERE {in_month} LIMIT 1").first() is None:
+        return _create_partition(conn, table, month)
+    conn.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {default}")
+    name = _create_partition(conn, table, month)
+    moved = conn.exec_driver_sql(f"INSERT INTO {name} SELECT * FROM {default} WHERE {in_month}").rowcount
+    conn.exec_driver_sql(f"DELETE FROM {default} WHERE {in_month}")
+    conn.exec_driver_sql(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+    logger.info("[PARTITION] Moved %d rows from %s to %s", moved, default, name)
+    return name
+
+
+def ensure_partitions(conn: Connection, months_ahead: int) -> List[str]:
+    """Create missing partitions from the current month to ``months_ahead`` later, and the default one."""
+    current = month_start(datetime.utcnow())
+    created = []
+    for table in PARTITION_KEYS:
+        if not is_partitioned(conn, table):
+            continue
+        if not has_default_partition(conn, table):
+            created.append(_create_default_partition(conn, table))
+        existing = {month for _, month in partitions_of(conn, table)}
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                created.append(_create_partition_from_default(conn, table, month))
+    for name in created:
+        logger.info("[PARTITION] Created %s", name)
+    return created
+
+
+def expired_partitions(conn: Connection, table: str, retention_months: int) -> List[Tuple[str, datetime]]:
+    """Partitions of ``table`` wholly older than ``retention_months`` before the current month."""
+    cutoff = add_months(month_start(datetime.utcnow()), -retention_months)
+    return [(name, month) for name, month in partitions_of(conn, table) if add_months(month, 1) <= cutoff]
+
+
+def drop_partition(conn: Connection, table: str, name: str) -> None:
+    # Dropping a month is instant and leaves nothing to vacuum, unlike DELETE.
+    conn.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    conn.exec_driver_sql(f"DROP TABLE {name}")
+    logger.info("[PARTITION] Dropped %s", name)
+
+
+def convert_table(conn: Connection, table: str, months_ahead: int) -> int:
+    """Rebuild ``table`` as a monthly partitioned table; returns rows copied.
+
+    Runs in the caller's transaction and holds an exclusive lock on the
+    table throughout, so run it in a maintenance window on large tables.
+    The primary key becomes (id, key) because Postgres requires partition
+    keys in unique constraints; rows with no key get the current time.
+    Indexes and foreign keys are re-created on the partitioned table; a
+    table that other tables' foreign keys reference cannot be converted,
+    since they could no longer reference ``id`` alone.
+    """
+    key = PARTITION_KEYS[table]
+    staging = f"{table}_partitioned"
+    conn.exec_driver_sql(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+    referencing = conn.execute(
+        text("SELECT conrelid::regclass::text || '.' || conname FROM pg_constraint "
+             "WHERE confrelid = CAST(:t AS regclass) AND contype = 'f'"),
+        {"t": table},
+    ).scalars().all()
+    if referencing:
+        raise RuntimeError(f"Cannot partition {table}: referenced by foreign keys {', '.join(referencing)}")
+    indexes = conn.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :t AND indexname <> :pk"),
+        {"t": table, "pk": f"{table}_pkey"},
+    ).all()
+    foreign_keys = conn.execute(
+        text("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+             "WHERE conrelid = CAST(:t AS regclass) AND contype = 'f'"),
+        {"t": table},
+    ).all()
+    conn.exec_driver_sql(f"UPDATE {table} SET {key} = now() AT TIME ZONE 'utc' WHERE {key} IS NULL")
+    first = conn.exec_driver_sql(f"SELECT MIN({key}) FROM {table}").scalar()
+
+    conn.exec_driver_sql(
+        f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE ({key})"
+    )
+    conn.exec_driver_sql(f"ALTER TABLE {staging} ALTER COLUMN {key} SET NOT NULL")
+    conn.exec_driver_sql(f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_pkey PRIMARY KEY (id, {key})")
+    current = month_start(datetime.utcnow())
+    month = month_start(first) if first else current
+    while month <= add_months(current, months_ahead):
+        _create_partition(conn, table, month, parent=staging)
+        month = add_months(month, 1)
+    _create_default_partition(conn, table, parent=staging)
+
+    copied = conn.exec_driver_sql(f"INSERT INTO {staging} SELECT * FROM {table}").rowcount
+    conn.exec_driver_sql(f"DROP TABLE {table}")
+    conn.exec_driver_sql(f"ALTER TABLE {staging} RENAME TO {table}")
+    conn.exec_driver_sql(f"ALTER TABLE {table} RENAME CONSTRAINT {staging}_pkey TO {table}_pkey")
+    # Same names and definitions as before, now cascading to every partition.
+    for _, definition in indexes:
+        conn.exec_driver_sql(definition)
+    for name, definition in foreign_keys:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    logger.info("[PARTITION] Converted %s (%d rows, partitioned by %s)", table, copied, key)
+    return copied
+
+
+def partition_indexes(conn: Connection, index: str) -> List[str]:
+    """Names of the per-partition indexes attached to partitioned index ``index``."""
+    return list(conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :i"
+        ),
+        {"i": index},
+    ).scalars())
+
+
+def explain_pruning(conn: Connection) -> List[Dict]:
+    """How many partitions a one-month range query on each partitioned table reads."""
+    month = month_start(datetime.utcnow())
+    results = []
+    for table, key in PARTITION_KEYS.items():
+        if not is_partitioned(conn, table):
+            continue
+        rows = conn.exec_driver_sql(
+            f"EXPLAIN SELECT id FROM {table} WHERE {key} >= '{month:%Y-%m-%d}' "
+            f"AND {key} < '{add_months(month, 1):%Y-%m-%d}'"
+        ).all()
+        plan = "\n".join(r[0] for r in rows)
+        partitions = [name for name, _ in partitions_of(conn, table)]
+        if has_default_partition(conn, table):
+            partitions.append(default_partition_name(table))
+        results.append({
+            "table": table,
+            "partitions": len(partitions),
+            "scanned": sum(1 for name in partitions if re.search(rf"\b{name}\b", plan)),
+            "plan": plan,
+        })
+    return results
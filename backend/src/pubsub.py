@@ -0,0 +1,224 @@
+"""Publish/subscribe for live event streams.
+
+``publish`` is called by the service layer once a change has committed (see
+``events``). Subscribers are SSE connections on the ASGI app; each holds an
+asyncio queue that is fed from whichever thread published, so an idle stream
+costs nothing but its connection.
+
+With ``PUBSUB_BACKEND=local`` (the default) every process that has
+subscribers binds a Unix datagram socket in ``PUBSUB_SOCKET_DIR`` and every
+publish is also sent to the other sockets there, so events raised in one
+gunicorn/uvicorn worker, or in a script, reach streams held by any worker on
+the same machine. ``memory`` keeps events inside the publishing process.
+Delivery is best-effort either way: a stream that falls too far behind is
+closed and the client reconnects and refetches.
+"""
+
+import asyncio
+import atexit
+import fnmatch
+import logging
+import os
+import socket
+import tempfile
+import threading
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
+from .config import get_settings
+from .jsonlib import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+MAX_DATAGRAM = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Message:
+    event_id: str
+    event_type: str
+    payload: str  # the event JSON, sent to subscribers as-is
+    api_key_id: Optional[str] = None
+    organization_id: Optional[str] = None
+
+
+class Subscription:
+    """One stream's filter and queue; ``get`` returns None once it overflowed."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, api_key_id: Optional[str], organization_id: Optional[str],
+                 types: Optional[Iterable[str]], max_pending: int):
+        self.loop = loop
+        self.api_key_id = api_key_id
+        self.organization_id = organization_id
+        self.types = tuple(types) if types else None
+        self.max_pending = max_pending
+        self._queue: "asyncio.Queue[Optional[Message]]" = asyncio.Queue()
+        self._overflowed = False
+
+    def matches(self, message: Message) -> bool:
+        if self.api_key_id is not None and message.api_key_id != self.api_key_id:
+            return False
+        if self.organization_id is not None and message.organization_id != self.organization_id:
+            return False
+        return self.types is None or any(fnmatch.fnmatchcase(message.event_type, t) for t in self.types)
+
+    def _offer(self, message: Message) -> None:
+        # Runs on the subscriber's loop.
+        if self._overflowed:
+            return
+        if self._queue.qsize() >= self.max_pending:
+            self._overflowed = True
+            self._queue.put_nowait(None)
+            return
+        self._queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        """Next message; raises asyncio.TimeoutError after ``timeout`` seconds."""
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class Broker:
+    def __init__(self, backend: str, socket_dir: str):
+        if backend == "local" and not hasattr(socket, "AF_UNIX"):
+            logger.warning("[PUBSUB] Unix sockets unavailable, events stay in-process")
+            backend = "memory"
+        self.backend = backend
+        self.socket_dir = socket_dir
+        self._subscriptions: set = set()
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._listener: Optional[socket.socket] = None
+        self._listen_path: Optional[str] = None
+        self._sender: Optional[socket.socket] = None
+
+    def _reset_after_fork(self) -> None:
+        # Sockets, threads and subscribers belong to the process that made them.
+        if self._pid == os.getpid():
+            return
+        self._subscriptions = set()
+        self._listener = self._listen_path = self._sender = None
+        self._pid = os.getpid()
+
+    def subscribe(self, api_key_id: Optional[str] = None, organization_id: Optional[str] = None,
+                  types: Optional[Iterable[str]] = None, max_pending: int = 100) -> Subscription:
+        """Register a subscription on the running event loop."""
+        subscription = Subscription(asyncio.get_running_loop(), api_key_id, organization_id, types, max_pending)
+        with self._lock:
+            self._reset_after_fork()
+            if self.backend == "local" and self._listener is None:
+                self._listen()
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, message: Message) -> None:
+        """Deliver to local subscribers and, with the local backend, to other processes."""
+        self._deliver(message)
+        if self.backend == "local":
+            self._broadcast(dumps(asdict(message)).encode())
+
+    def _deliver(self, message: Message) -> None:
+        with self._lock:
+            self._reset_after_fork()
+            subscriptions = [s for s in self._subscriptions if s.matches(message)]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, message)
+            except RuntimeError:
+                # Its loop has closed; the stream is gone.
+                self.unsubscribe(subscription)
+
+    def _listen(self) -> None:
+        os.makedirs(self.socket_dir, mode=0o700, exist_ok=True)
+        path = os.path.join(self.socket_dir, f"{os.getpid()}.sock")
+        if os.path.exists(path):
+            os.unlink(path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        listener.bind(path)
+        self._listener, self._listen_path = listener, path
+        atexit.register(_unlink_quietly, path)
+        threading.Thread(target=self._receive, args=(listener,), name="pubsub-receiver", daemon=True).start()
+        logger.info("[PUBSUB] Listening on %s", path)
+
+    def close(self) -> None:
+        """Stop listening for other processes' events and remove this process's socket."""
+        with self._lock:
+            listener, path = self._listener, self._listen_path
+            if listener is None or self._pid != os.getpid():
+                return
+            self._listener = self._listen_path = None
+        listener.close()
+        _unlink_quietly(path)
+
+    def _receive(self, listener: socket.socket) -> None:
+        while True:
+            try:
+                data = listener.recv(MAX_DATAGRAM)
+                self._deliver(Message(**loads(data)))
+            except OSError:
+                return
+            except Exception:
+                logger.exception("[PUBSUB] Dropped malformed message")
+
+    def _broadcast(self, data: bytes) -> None:
+        if len(data) > MAX_DATAGRAM:
+            logger.warning("[PUBSUB] Event of %d bytes too large to forward to other workers", len(data))
+            return
+        try:
+            entries = list(os.scandir(self.socket_dir))
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._reset_after_fork()
+            if self._sender is None:
+                self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sender.setblocking(False)
+            sender, own_path = self._sender, self._listen_path
+        for entry in entries:
+            if not entry.name.endswith(".sock") or entry.path == own_path:
+                continue
+            try:
+                sender.sendto(data, entry.path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a process that has exited.
+                _unlink_quietly(entry.path)
+            except BlockingIOError:
+                logger.warning("[PUBSUB] %s is not keeping up, event dropped", entry.name)
+            except OSError as e:
+                logger.warning("[PUBSUB] Could not forward event to %s: %s", entry.name, e)
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+_broker: Optional[Broker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> Broker:
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            settings = get_settings()
+            socket_dir = settings.pubsub_socket_dir or os.path.join(tempfile.gettempdir(), "verifai-pubsub")
+            _broker = Broker(settings.pubsub_backend, socket_dir)
+        return _broker
+
+
+def shutdown() -> None:
+    if _broker is not None:
+        _broker.close()
+
+
+def publish(message: Message) -> None:
+    try:
+        get_broker().publish(message)
+    except Exception:
+        logger.exception("[PUBSUB] Publish failed")
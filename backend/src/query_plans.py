@@ -0,0 +1,161 @@
+"""Index usage check for the queries the services issue.
+
+Each key query is the statement a service function actually runs, built by
+the same helper it uses (``verifications_query``, ``stats_queries``,
+``tokens_query`` ...) with representative arguments. ``explain_key_queries``
+executes each one prefixed with EXPLAIN, exactly as SQLAlchemy compiles and
+binds it for the connected database, and reports whether the plan reads
+through one of the expected indexes without a full scan of any table.
+``python migrate.py check`` exits non-zero when one does not.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from .changes import changes_query
+from .devices import identity_count_query
+from .partitioning import partition_indexes
+from .search import search_query
+from .services_tokens import tokens_query
+from .services_verifications import (
+    device_verifications_query,
+    stats_queries,
+    verifications_for_tokens_query,
+    verifications_query,
+)
+
+_ORG = "org_x"
+_FINGERPRINT = "0" * 64
+
+
+def _since() -> datetime:
+    return datetime.utcnow() - timedelta(days=30)
+
+
+@dataclass(frozen=True)
+class KeyQuery:
+    description: str
+    statement: Callable[[Connection], Any]
+    # Any one of these may serve it; SQLite calls every primary key "PRIMARY KEY".
+    indexes: Tuple[str, ...]
+
+
+KEY_QUERIES = [
+    KeyQuery(
+        "verifications by token (list_verifications_for_tokens)",
+        lambda conn: verifications_for_tokens_query(["a", "b"]),
+        ("ix_verifications_token_id",),
+    ),
+    KeyQuery(
+        "recent verifications (verification_stats)",
+        lambda conn: stats_queries(_since())["recent"],
+        ("ix_verifications_timestamp",),
+    ),
+    KeyQuery(
+        "pending tokens (verification_stats)",
+        lambda conn: stats_queries()["pending"],
+        ("ix_verification_tokens_status",),
+    ),
+    KeyQuery(
+        "organization's verifications (list_verifications)",
+        lambda conn: verifications_query(_since(), None, _ORG),
+        ("ix_verifications_org_timestamp", "ix_verifications_org_status"),
+    ),
+    KeyQuery(
+        "organization's verifications by status (verification_stats)",
+        lambda conn: stats_queries(None, None, _ORG)["counts"],
+        ("ix_verifications_org_status", "ix_verifications_org_timestamp"),
+    ),
+    KeyQuery(
+        "organization's recent verifications (verification_stats)",
+        lambda conn: stats_queries(_since(), None, _ORG)["recent"],
+        ("ix_verifications_org_timestamp", "ix_verifications_org_status"),
+    ),
+    KeyQuery(
+        "organization's pending tokens (verification_stats)",
+        lambda conn: stats_queries(None, None, _ORG)["pending"],
+        ("ix_verification_tokens_org_status", "ix_verification_tokens_org_created_at"),
+    ),
+    KeyQuery(
+        "organization's tokens (list_tokens)",
+        lambda conn: tokens_query(_since(), None, _ORG),
+        ("ix_verification_tokens_org_created_at", "ix_verification_tokens_org_status"),
+    ),
+    KeyQuery(
+        "change feed by api key (list_changes)",
+        lambda conn: changes_query(0, 101, "key_x"),
+        ("ix_changes_api_key_id_seq",),
+    ),
+    KeyQuery(
+        "organization's change feed (list_changes)",
+        lambda conn: changes_query(0, 101, None, _ORG),
+        ("ix_changes_organization_id_seq",),
+    ),
+    KeyQuery(
+        "verifications from a device (list_device_verifications)",
+        lambda conn: device_verifications_query(_FINGERPRINT, _since()),
+        ("ix_verifications_device_fingerprint_timestamp",),
+    ),
+    KeyQuery(
+        "identities of a device (record_device)",
+        lambda conn: identity_count_query(_FINGERPRINT, _since()),
+        ("PRIMARY KEY", "device_identities_pkey"),
+    ),
+    KeyQuery(
+        "search (search)",
+        lambda conn: search_query(conn, "jane doe"),
+        ("PRIMARY KEY", "search_terms_pkey", "ix_search_documents_document_trgm"),
+    ),
+]
+
+
+def _explain(conn: Connection, statement) -> str:
+    """The plan for ``statement`` as the application would send it."""
+    is_postgres = conn.dialect.name == "postgresql"
+    prefix = "EXPLAIN" if is_postgres else "EXPLAIN QUERY PLAN"
+
+    def explain(conn, cursor, sql, parameters, context, executemany):
+        return f"{prefix} {sql}", parameters
+
+    event.listen(conn, "before_cursor_execute", explain, retval=True)
+    try:
+        rows = conn.execute(statement).all()
+    finally:
+        event.remove(conn, "before_cursor_execute", explain)
+    return "\n".join(str(r[0] if is_postgres else r[-1]) for r in rows)
+
+
+def _full_scans(plan: str, is_postgres: bool) -> List[str]:
+    if is_postgres:
+        return [line.strip() for line in plan.splitlines() if "Seq Scan" in line]
+    # "SCAN t USING INDEX i" walks an index; a bare "SCAN t" reads the whole table.
+    return [line for line in plan.splitlines() if line.startswith("SCAN ") and " USING " not in line]
+
+
+def explain_key_queries(engine: Engine) -> List[Dict]:
+    """Return the query plan for each key query and whether it uses its index."""
+    results = []
+    with engine.connect() as conn:
+        is_postgres = conn.dialect.name == "postgresql"
+        for key_query in KEY_QUERIES:
+            with conn.begin():
+                names = list(key_query.indexes)
+                if is_postgres:
+                    # Tiny tables would otherwise always be sequentially scanned;
+                    # we want to know whether the index is usable, not preferred.
+                    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+                    # On a partitioned table the plan names the partitions' indexes.
+                    for index_name in key_query.indexes:
+                        names.extend(partition_indexes(conn, index_name))
+                plan = _explain(conn, key_query.statement(conn))
+            results.append({
+                "query": key_query.description,
+                "index": " or ".join(key_query.indexes),
+                "uses_index": any(name in plan for name in names) and not _full_scans(plan, is_postgres),
+                "plan": plan,
+            })
+    return results
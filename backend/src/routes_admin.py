@@ -0,0 +1,57 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt, jwt_required
+
+from .config import get_settings
+from .errors import AppError
+from .services_organizations import create_organization, list_organizations
+from .slow_queries import clear_slow_queries, recent_slow_queries
+from .tenancy import require_platform_user
+
+bp_admin = Blueprint("admin", __name__, url_prefix="/api/admin")
+
+
+@bp_admin.before_request
+@jwt_required()
+def require_admin():
+    if request.method == "OPTIONS":
+        return None
+    if get_jwt().get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+    return None
+
+
+@bp_admin.get("/slow-queries")
+def slow_queries():
+    limit = min(request.args.get("limit", 50, type=int), 500)
+    settings = get_settings()
+    return jsonify({
+        "enabled": settings.slow_query_ms > 0,
+        "thresholdMs": settings.slow_query_ms,
+        "queries": recent_slow_queries(limit),
+    })
+
+
+@bp_admin.delete("/slow-queries")
+def reset_slow_queries():
+    clear_slow_queries()
+    return jsonify({"message": "Slow query log cleared", "status": "success"})
+
+
+@bp_admin.get("/organizations")
+def organizations():
+    try:
+        require_platform_user()
+        return jsonify({"organizations": list_organizations()})
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_admin.post("/organizations")
+def add_organization():
+    try:
+        require_platform_user()
+        data = request.get_json() or {}
+        org = create_organization(data.get("name"))
+        return jsonify({"message": "Organization created", "status": "success", "organization": org}), 201
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
@@ -1,16 +1,22 @@
+import logging
+
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
 
 from .errors import AppError
+from .http_cache import conditional_get
 from .services_api_keys import create_api_key, list_api_keys, update_api_key, deactivate_api_key
+from .tenancy import current_organization_id
 
+logger = logging.getLogger(__name__)
 bp_api_keys = Blueprint("api_keys", __name__, url_prefix="/api/api-keys")
 
 
 @bp_api_keys.get("")
 @jwt_required()
+@conditional_get("api_keys")
 def list_keys():
-    return jsonify({"apiKeys": list_api_keys()})
+    return jsonify({"apiKeys": list_api_keys(current_organization_id())})
 
 
 @bp_api_keys.post("")
@@ -18,20 +24,18 @@ def list_keys():
 def create_key():
     try:
         data = request.get_json() or {}
-        print(f"[API Keys] Creating API key with data: {data}")
-        result = create_api_key(data)
+        logger.info("[API_KEYS] Creating API key %r for %r", data.get("name"), data.get("company"))
+        result = create_api_key(data, current_organization_id())
         result["message"] = "API key created successfully"
         result["warning"] = "Save this key securely. You won't be able to see it again!"
         result["status"] = "success"
-        print(f"[API Keys] Successfully created key: {result.get('apiKeyData', {}).get('id')}")
+        logger.info("[API_KEYS] Created key %s", result["apiKeyData"]["id"])
         return jsonify(result), 201
     except AppError as exc:
-        print(f"[API Keys] AppError during creation: {exc.message}")
+        logger.warning("[API_KEYS] AppError during creation: %s", exc.message)
         return jsonify({"error": exc.message, "status": "error"}), exc.status_code
     except Exception as e:
-        print(f"[API Keys] Unexpected error during creation: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[API_KEYS] Unexpected error during creation: %s", e)
         return jsonify({"error": f"Failed to create API key: {str(e)}", "status": "error"}), 500
 
 
@@ -40,7 +44,7 @@ def create_key():
 def update_key(key_id):
     try:
         data = request.get_json() or {}
-        updated = update_api_key(key_id, data)
+        updated = update_api_key(key_id, data, current_organization_id())
         return jsonify({"message": "API key updated successfully", "status": "success", "apiKeyData": updated}), 200
     except AppError as exc:
         return jsonify({"error": exc.message, "status": "error"}), exc.status_code
@@ -50,7 +54,7 @@ def update_key(key_id):
 @jwt_required()
 def delete_key(key_id):
     try:
-        deactivate_api_key(key_id)
+        deactivate_api_key(key_id, current_organization_id())
         return jsonify({"message": "API key deleted successfully", "status": "success"}), 200
     except AppError as exc:
         return jsonify({"error": exc.message, "status": "error"}), exc.status_code
@@ -1,10 +1,10 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+from flask_jwt_extended import jwt_required, get_jwt_identity
 import logging
-import traceback
 
 from .errors import AppError
-from .services_auth import authenticate_user, create_user, get_user
+from .services_auth import authenticate_user, create_user, get_user, refresh_access_token
+from .tenancy import current_organization_id, require_platform_user
 
 logger = logging.getLogger(__name__)
 bp_auth = Blueprint("auth", __name__, url_prefix="/api/auth")
@@ -17,21 +17,21 @@ def signup():
         email = data.get("email")
         password = data.get("password")
         
-        logger.info(f"[SIGNUP] Signup request for email: {email}")
+        logger.info("[SIGNUP] Signup request for email: %s", email)
         
         if not email:
             logger.warning("[SIGNUP] Email missing in request")
             return jsonify({"error": "Email is required"}), 400
         
         if not password:
-            logger.warning(f"[SIGNUP] Password missing for email: {email}")
+            logger.warning("[SIGNUP] Password missing for email: %s", email)
             return jsonify({"error": "Password is required"}), 400
         
         result = create_user(email, password)
         
         # If user already existed, return 200 with tokens instead of 201
         if result.get("already_existed"):
-            logger.info(f"[SIGNUP] User existed, auto-signed in: {email}")
+            logger.info("[SIGNUP] User existed, auto-signed in: %s", email)
             return jsonify({
                 "message": "User already exists, signed in successfully",
                 "access_token": result["access_token"],
@@ -40,14 +40,13 @@ def signup():
             }), 200
         
         # New user created
-        logger.info(f"[SIGNUP] New user created: {email}")
+        logger.info("[SIGNUP] New user created: %s", email)
         return jsonify({"message": "User created", "role": result["role"]}), 201
     except AppError as exc:
-        logger.error(f"[SIGNUP] AppError: {exc.message}")
+        logger.error("[SIGNUP] AppError: %s", exc.message)
         return jsonify({"error": exc.message}), exc.status_code
     except Exception as e:
-        logger.error(f"[SIGNUP] Unexpected error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[SIGNUP] Unexpected error: %s", e)
         return jsonify({"error": f"Signup failed: {str(e)}"}), 500
 
 
@@ -58,33 +57,35 @@ def login():
         email = data.get("email")
         password = data.get("password")
         
-        logger.info(f"[LOGIN] Login attempt for email: {email}")
+        logger.info("[LOGIN] Login attempt for email: %s", email)
         
         if not email:
             logger.warning("[LOGIN] Email missing in request")
             return jsonify({"error": "Email is required"}), 400
         if not password:
-            logger.warning(f"[LOGIN] Password missing for email: {email}")
+            logger.warning("[LOGIN] Password missing for email: %s", email)
             return jsonify({"error": "Password is required"}), 400
             
         result = authenticate_user(email, password)
-        logger.info(f"[LOGIN] Login successful for: {email}")
+        logger.info("[LOGIN] Login successful for: %s", email)
         return jsonify(result), 200
     except AppError as exc:
-        logger.error(f"[LOGIN] AppError for {email}: {exc.message} (status: {exc.status_code})")
+        logger.error("[LOGIN] AppError for %s: %s (status: %s)", email, exc.message, exc.status_code)
         return jsonify({"error": exc.message}), exc.status_code
     except Exception as e:
-        logger.error(f"[LOGIN] Unexpected error for {email}: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[LOGIN] Unexpected error for %s: %s", email, e)
         return jsonify({"error": f"Login failed: {str(e)}"}), 500
 
 
 @bp_auth.post("/refresh")
 @jwt_required(refresh=True)
 def refresh():
-    identity = get_jwt_identity()
-    token = create_access_token(identity=identity)
-    return jsonify({"access_token": token})
+    try:
+        # Re-read the user so the new token carries their current role and organization.
+        token = refresh_access_token(get_jwt_identity())
+        return jsonify({"access_token": token})
+    except AppError as exc:
+        return jsonify({"error": exc.message}), exc.status_code
 
 
 @bp_auth.get("/me")
@@ -108,18 +109,19 @@ def list_users():
         claims = get_jwt()
         user_role = claims.get('role')
         
-        logger.info(f"[LIST_USERS] User role: {user_role}")
+        logger.info("[LIST_USERS] User role: %s", user_role)
         
         if user_role != 'admin':
-            logger.warning(f"[LIST_USERS] Non-admin user attempted to list users")
+            logger.warning("[LIST_USERS] Non-admin user attempted to list users")
             return jsonify({"error": "Admin access required"}), 403
         
-        users = list_all_users()
-        logger.info(f"[LIST_USERS] Returning {len(users)} users")
+        users = list_all_users(current_organization_id())
+        logger.info("[LIST_USERS] Returning %s users", len(users))
         return jsonify({"users": users}), 200
+    except AppError as exc:
+        return jsonify({"error": exc.message}), exc.status_code
     except Exception as e:
-        logger.error(f"[LIST_USERS] Error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[LIST_USERS] Error: %s", e)
         return jsonify({"error": f"Failed to list users: {str(e)}"}), 500
 
 
@@ -135,30 +137,36 @@ def create_user_admin():
         user_role = claims.get('role')
         
         if user_role != 'admin':
-            logger.warning(f"[CREATE_USER_ADMIN] Non-admin attempted to create user")
+            logger.warning("[CREATE_USER_ADMIN] Non-admin attempted to create user")
             return jsonify({"error": "Admin access required"}), 403
         
         data = request.get_json() or {}
         email = data.get("email")
         password = data.get("password")
         role = data.get("role", "user")
+        # Admins of an organization can only add users to it; only platform users add platform users.
+        organization_id = claims.get("org") or data.get("organizationId")
+        if not claims.get("org"):
+            require_platform_user()
+        platform = bool(data.get("platform"))
+        if platform and not claims.get("platform"):
+            return jsonify({"error": "Only platform users can create platform users"}), 403
         
-        logger.info(f"[CREATE_USER_ADMIN] Creating user: {email} with role: {role}")
+        logger.info("[CREATE_USER_ADMIN] Creating user: %s with role: %s", email, role)
         
         if not email:
             return jsonify({"error": "Email is required"}), 400
         if not password:
             return jsonify({"error": "Password is required"}), 400
         
-        result = create_user_by_admin(email, password, role)
-        logger.info(f"[CREATE_USER_ADMIN] User created: {email}")
+        result = create_user_by_admin(email, password, role, organization_id, platform)
+        logger.info("[CREATE_USER_ADMIN] User created: %s", email)
         return jsonify({"message": "User created successfully", "user": result}), 201
     except AppError as exc:
-        logger.error(f"[CREATE_USER_ADMIN] AppError: {exc.message}")
+        logger.error("[CREATE_USER_ADMIN] AppError: %s", exc.message)
         return jsonify({"error": exc.message}), exc.status_code
     except Exception as e:
-        logger.error(f"[CREATE_USER_ADMIN] Error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[CREATE_USER_ADMIN] Error: %s", e)
         return jsonify({"error": f"Failed to create user: {str(e)}"}), 500
 
 
@@ -175,21 +183,20 @@ def delete_user_admin(user_id):
         current_user_id = get_jwt_identity()
         
         if user_role != 'admin':
-            logger.warning(f"[DELETE_USER] Non-admin attempted to delete user")
+            logger.warning("[DELETE_USER] Non-admin attempted to delete user")
             return jsonify({"error": "Admin access required"}), 403
         
         if user_id == current_user_id:
-            logger.warning(f"[DELETE_USER] Admin attempted to delete themselves")
+            logger.warning("[DELETE_USER] Admin attempted to delete themselves")
             return jsonify({"error": "Cannot delete your own account"}), 400
         
-        logger.info(f"[DELETE_USER] Deleting user: {user_id}")
-        delete_user_by_admin(user_id)
-        logger.info(f"[DELETE_USER] User deleted: {user_id}")
+        logger.info("[DELETE_USER] Deleting user: %s", user_id)
+        delete_user_by_admin(user_id, current_organization_id())
+        logger.info("[DELETE_USER] User deleted: %s", user_id)
         return jsonify({"message": "User deleted successfully"}), 200
     except AppError as exc:
-        logger.error(f"[DELETE_USER] AppError: {exc.message}")
+        logger.error("[DELETE_USER] AppError: %s", exc.message)
         return jsonify({"error": exc.message}), exc.status_code
     except Exception as e:
-        logger.error(f"[DELETE_USER] Error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[DELETE_USER] Error: %s", e)
         return jsonify({"error": f"Failed to delete user: {str(e)}"}), 500
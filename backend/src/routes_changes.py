@@ -0,0 +1,30 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import verify_jwt_in_request
+
+from .changes import list_changes
+from .errors import AppError, ValidationError
+from .services_api_keys import authenticate_api_key
+from .tenancy import current_organization_id
+
+bp_changes = Blueprint("changes", __name__, url_prefix="/api/v1")
+
+MAX_PAGE = 1000
+
+
+@bp_changes.get("/changes")
+def changes_feed():
+    try:
+        api_key = request.headers.get("X-API-Key")
+        if api_key:
+            # Partners only ever see changes to their own key's tokens.
+            api_key_id, organization_id = authenticate_api_key(api_key), None
+        else:
+            verify_jwt_in_request()
+            api_key_id, organization_id = request.args.get("apiKeyId"), current_organization_id()
+        since = request.args.get("since", 0, type=int)
+        limit = request.args.get("limit", 100, type=int)
+        if since < 0 or limit < 1:
+            raise ValidationError("since must be >= 0 and limit >= 1")
+        return jsonify(list_changes(since, min(limit, MAX_PAGE), api_key_id, organization_id)), 200
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
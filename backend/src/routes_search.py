@@ -0,0 +1,28 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from .errors import AppError, ValidationError
+from .search import ENTITY_TYPES, search
+from .tenancy import current_organization_id
+
+bp_search = Blueprint("search", __name__, url_prefix="/api")
+
+MAX_PAGE = 100
+
+
+@bp_search.get("/search")
+@jwt_required()
+def search_records():
+    """Tokens and verifications matching ``q`` by name, email or address, best first."""
+    try:
+        entity_type = request.args.get("type")
+        if entity_type is not None and entity_type not in ENTITY_TYPES:
+            raise ValidationError(f"type must be one of: {', '.join(ENTITY_TYPES)}")
+        limit = request.args.get("limit", 20, type=int)
+        offset = request.args.get("offset", 0, type=int)
+        if offset < 0 or limit < 1:
+            raise ValidationError("offset must be >= 0 and limit >= 1")
+        page = search(request.args.get("q", ""), entity_type, min(limit, MAX_PAGE), offset, current_organization_id())
+        return jsonify(page), 200
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
@@ -0,0 +1,77 @@
+from urllib.parse import unquote
+
+from flask import Blueprint, jsonify, request, send_file
+from flask_jwt_extended import get_jwt_identity, jwt_required
+
+from .config import get_settings
+from .errors import AppError
+from .services_uploads import delete_upload, get_preview_path, get_upload, save_upload_stream
+from .tenancy import current_organization_id
+
+bp_uploads = Blueprint("uploads", __name__, url_prefix="/api")
+
+
+@bp_uploads.post("/uploads")
+@jwt_required()
+def upload_document():
+    """Store the raw request body as a document.
+
+    The file is sent as the body itself (not multipart), with its name in the
+    ``X-Filename`` header or ``?filename=``, so it can be streamed to disk
+    without being buffered or parsed first. Only the uploader's
+    organization can see or delete it afterwards.
+    """
+    try:
+        if request.mimetype.startswith("multipart/"):
+            return jsonify({
+                "error": "Send the file as the raw request body with an X-Filename header",
+                "status": "error",
+            }), 415
+
+        organization_id = current_organization_id()
+        settings = get_settings()
+        filename = unquote(request.headers.get("X-Filename", "")) or request.args.get("filename", "")
+        result = save_upload_stream(
+            request.stream,
+            filename,
+            settings.upload_folder,
+            settings.allowed_extensions,
+            settings.max_file_size_bytes,
+            content_length=request.content_length,
+            verification_id=request.args.get("verificationId"),
+            uploaded_by=get_jwt_identity(),
+            organization_id=organization_id,
+        )
+        return jsonify({**result, "status": "success"}), 201
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_uploads.get("/uploads/<upload_id>")
+@jwt_required()
+def upload_status(upload_id: str):
+    """Upload details, including the document pipeline's ``processing_status`` to poll."""
+    try:
+        return jsonify({**get_upload(upload_id, current_organization_id()), "status": "success"}), 200
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_uploads.get("/uploads/<upload_id>/preview")
+@jwt_required()
+def upload_preview(upload_id: str):
+    try:
+        path = get_preview_path(upload_id, current_organization_id())
+        return send_file(path, mimetype="image/jpeg", max_age=3600)
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_uploads.delete("/uploads/<upload_id>")
+@jwt_required()
+def remove_upload(upload_id: str):
+    try:
+        delete_upload(upload_id, current_organization_id())
+        return jsonify({"message": "Upload deleted", "status": "success"}), 200
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
@@ -1,16 +1,31 @@
 import secrets
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required
+from datetime import datetime
+from typing import Optional
 
-from .config import load_settings
-from .errors import AppError
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_jwt_extended import get_jwt_identity, jwt_required
+
+from .archive import archived_count, get_archived_verification, list_archived_verifications
+from .config import get_settings
+from .errors import AppError, ValidationError
+from .http_cache import conditional_get, etag_for
+from .idempotency import idempotent
 from .models import VerificationToken
-from .services_tokens import generate_token, validate_token, mark_token_status, list_tokens
-from .services_verifications import create_verification_from_payload, list_verifications, list_verifications_for_tokens
+from .services_tokens import generate_token, link_serializer, validate_token, mark_token_status, list_tokens
+from .services_verifications import (
+    create_verification_from_payload,
+    export_verifications_csv,
+    list_device_verifications,
+    list_verifications,
+    list_verifications_for_tokens,
+    verification_stats,
+)
+from .stats_cache import STATS_TABLES, cached_stats
+from .tenancy import current_organization_id
 from sqlalchemy import select
 from .database import session_scope
+from .devices import device_identity_count, shared_device, window_start
 
-settings = load_settings()
 serializer_salt = "verification-link"
 
 bp_verification = Blueprint("verification", __name__, url_prefix="/api")
@@ -31,8 +46,40 @@ def _token_payload_from_request(data: dict, token_id: str) -> dict:
     }
 
 
+def token_validated_body(verification_data: dict) -> dict:
+    return {
+        "message": "Token is valid",
+        "status": "success",
+        "verification_data": {
+            "fullName": verification_data['fullName'],
+            "email": verification_data['email'],
+            "address": verification_data['address'],
+            "city": verification_data['city'],
+            "state": verification_data['state'],
+            "zipCode": verification_data['zipCode'],
+            "organizationName": verification_data['organizationName'],
+            "expiresIn": verification_data.get('expiresIn', '24 hours')
+        }
+    }
+
+
+def declined_payload(verification_data: dict) -> dict:
+    return {
+        "fullName": verification_data['fullName'],
+        "email": verification_data['email'],
+        "address": verification_data['address'],
+        "city": verification_data['city'],
+        "state": verification_data['state'],
+        "zipCode": verification_data['zipCode'],
+        "organizationName": verification_data.get('organizationName', 'Organization'),
+        "location": {},
+        "consent": False,
+    }
+
+
 @bp_verification.post("/generate-verification-link")
 @jwt_required()
+@idempotent("generate-verification-link", principal=get_jwt_identity)
 def generate_link():
     try:
         data = request.get_json() or {}
@@ -43,12 +90,9 @@ def generate_link():
 
         token_id = secrets.token_urlsafe(32)
         payload = _token_payload_from_request(data, token_id)
-        from itsdangerous import URLSafeTimedSerializer
+        token_info = generate_token(link_serializer(), payload, organization_id=current_organization_id())
 
-        serializer = URLSafeTimedSerializer(settings.secret_key)
-        token_info = generate_token(serializer, payload)
-
-        verification_url = f"{settings.frontend_url}/verify?token={token_info['token']}"
+        verification_url = f"{get_settings().frontend_url}/verify?token={token_info['token']}"
 
         return jsonify({
             "message": "Verification link generated successfully",
@@ -69,24 +113,8 @@ def validate_link_token():
     try:
         data = request.get_json() or {}
         token = data.get("token")
-        from itsdangerous import URLSafeTimedSerializer
-
-        serializer = URLSafeTimedSerializer(settings.secret_key)
-        verification_data = validate_token(serializer, token)
-        return jsonify({
-            "message": "Token is valid",
-            "status": "success",
-            "verification_data": {
-                "fullName": verification_data['fullName'],
-                "email": verification_data['email'],
-                "address": verification_data['address'],
-                "city": verification_data['city'],
-                "state": verification_data['state'],
-                "zipCode": verification_data['zipCode'],
-                "organizationName": verification_data['organizationName'],
-                "expiresIn": verification_data.get('expiresIn', '24 hours')
-            }
-        }), 200
+        verification_data = validate_token(link_serializer(), token, announce=True)
+        return jsonify(token_validated_body(verification_data)), 200
     except AppError as exc:
         return jsonify({"error": exc.message, "status": "error"}), exc.status_code
 
@@ -96,31 +124,17 @@ def decline_verification():
     try:
         data = request.get_json() or {}
         token = data.get("token")
-        from itsdangerous import URLSafeTimedSerializer
-
-        serializer = URLSafeTimedSerializer(settings.secret_key)
-        verification_data = validate_token(serializer, token)
+        verification_data = validate_token(link_serializer(), token)
         token_id = verification_data["tokenId"]
         mark_token_status(token_id, status="declined", used=True)
-
-        payload = {
-            "fullName": verification_data['fullName'],
-            "email": verification_data['email'],
-            "address": verification_data['address'],
-            "city": verification_data['city'],
-            "state": verification_data['state'],
-            "zipCode": verification_data['zipCode'],
-            "organizationName": verification_data.get('organizationName', 'Organization'),
-            "location": {},
-            "consent": False,
-        }
-        create_verification_from_payload(payload, token_id, request.remote_addr)
+        create_verification_from_payload(declined_payload(verification_data), token_id, request.remote_addr)
         return jsonify({"message": "Verification decline recorded", "status": "success"}), 200
     except AppError as exc:
         return jsonify({"error": exc.message, "status": "error"}), exc.status_code
 
 
 @bp_verification.post("/submit-verification")
+@idempotent("submit-verification")
 def submit_verification():
     try:
         data = request.get_json() or {}
@@ -129,10 +143,7 @@ def submit_verification():
         verification_payload = data
 
         if token:
-            from itsdangerous import URLSafeTimedSerializer
-
-            serializer = URLSafeTimedSerializer(settings.secret_key)
-            verification_data = validate_token(serializer, token)
+            verification_data = validate_token(link_serializer(), token)
             token_id = verification_data["tokenId"]
             mark_token_status(token_id, status="completed", used=True)
             verification_payload = {**verification_payload, **verification_data}
@@ -145,43 +156,118 @@ def submit_verification():
 
 @bp_verification.get("/verification-tokens")
 @jwt_required()
+@conditional_get("verification_tokens")
 def tokens_admin():
-    tokens = list_tokens()
-    return jsonify({"tokens": tokens, "total_count": len(tokens)})
+    """Tokens, optionally only those created in [from, to)."""
+    try:
+        tokens = list_tokens(_date_arg("from", None), _date_arg("to", None), current_organization_id())
+        return jsonify({"tokens": tokens, "total_count": len(tokens)})
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
 
 
 @bp_verification.get("/verifications")
 @jwt_required()
+@conditional_get("verifications")
 def verifications_admin():
-    verifications = list_verifications()
-    return jsonify({"verifications": verifications, "total_count": len(verifications)})
+    """Verifications, optionally only those in [from, to)."""
+    try:
+        verifications = list_verifications(_date_arg("from", None), _date_arg("to", None), current_organization_id())
+        return jsonify({"verifications": verifications, "total_count": len(verifications)})
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
 
 
-@bp_verification.get("/dashboard-stats")
+@bp_verification.get("/verifications/export")
 @jwt_required()
-def dashboard_stats():
-    """Get statistics for dashboard overview"""
+def export_verifications():
+    """Verifications in [from, to) as a CSV download, streamed in batches."""
+    try:
+        rows = export_verifications_csv(_date_arg("from", None), _date_arg("to", None), current_organization_id())
+        filename = f"verifications-{datetime.utcnow():%Y%m%d-%H%M%S}.csv"
+        return Response(stream_with_context(rows), mimetype="text/csv",
+                        headers={"Content-Disposition": f"attachment; filename={filename}"})
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+def _date_arg(name: str, default: Optional[datetime]) -> Optional[datetime]:
+    value = request.args.get(name)
+    if not value:
+        return default
     try:
-        verifications = list_verifications()
-        tokens = list_tokens()
-        
-        total_verifications = len(verifications)
-        successful = len([v for v in verifications if v.get('verificationStatus') == 'verified'])
-        failed = len([v for v in verifications if v.get('verificationStatus') == 'failed'])
-        pending = len([t for t in tokens if t.get('status') == 'pending'])
-        
-        # Get recent verifications (last 5)
-        recent = sorted(verifications, key=lambda x: x.get('createdAt', ''), reverse=True)[:5]
-        
+        return datetime.fromisoformat(value)
+    except ValueError as e:
+        raise ValidationError(f"{name} must be an ISO date or datetime") from e
+
+
+@bp_verification.get("/verifications/archive")
+@jwt_required()
+def archived_verifications_admin():
+    """Archived verifications in [from, to), oldest first."""
+    try:
+        start = _date_arg("from", datetime.min)
+        end = _date_arg("to", datetime.utcnow())
+        limit = min(request.args.get("limit", 100, type=int), 1000)
+        verifications = list_archived_verifications(start, end, limit, current_organization_id())
+        return jsonify({"verifications": verifications, "count": len(verifications)})
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_verification.get("/verifications/archive/<verification_id>")
+@jwt_required()
+def archived_verification(verification_id):
+    try:
+        return jsonify({"verification": get_archived_verification(verification_id, current_organization_id())})
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_verification.get("/devices/<fingerprint>")
+@jwt_required()
+def device_verifications(fingerprint):
+    """How many identities a device has verified in the last ``days``, and the caller's verifications from it."""
+    try:
+        days = request.args.get("days", get_settings().device_window_days, type=int)
+        if days <= 0:
+            raise ValidationError("days must be positive")
+        since = window_start(days=days)
+        # Counted across organizations: the same device behind many identities is the signal.
+        identities = device_identity_count(fingerprint, since)
+        verifications = list_device_verifications(fingerprint, since, current_organization_id())
         return jsonify({
-            "stats": {
-                "total": total_verifications,
-                "successful": successful,
-                "failed": failed,
-                "pending": pending
-            },
-            "recent": recent
+            "fingerprint": fingerprint,
+            "days": days,
+            "identities": identities,
+            "requiresReview": shared_device(identities),
+            "verifications": verifications,
         })
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_verification.get("/dashboard-stats")
+@jwt_required()
+@conditional_get(*STATS_TABLES)
+def dashboard_stats():
+    """Get statistics for dashboard overview, optionally for [from, to) only"""
+    try:
+        organization_id = current_organization_id()
+        since, until = _date_arg("from", None), _date_arg("to", None)
+
+        def compute():
+            stats = verification_stats(since, until, organization_id)
+            recent = stats.pop("recent")
+            return {"stats": {**stats, "archived": archived_count(organization_id)}, "recent": recent}
+
+        # Shared by every user polling this scope; see stats_cache.py.
+        body, versions = cached_stats(organization_id, since, until, compute)
+        response = jsonify(body)
+        response.set_etag(etag_for(STATS_TABLES, versions), weak=True)
+        return response
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -194,7 +280,7 @@ def revoke_token():
         token_id = data.get("tokenId")
         if not token_id:
             return jsonify({"error": "Invalid token ID", "status": "error"}), 400
-        mark_token_status(token_id, status="revoked", used=False)
+        mark_token_status(token_id, status="revoked", used=False, organization_id=current_organization_id())
         return jsonify({"message": "Token revoked successfully", "status": "success"}), 200
     except AppError as exc:
         return jsonify({"error": exc.message, "status": "error"}), exc.status_code
@@ -0,0 +1,70 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt, jwt_required
+
+from .errors import AppError
+from .tenancy import current_organization_id
+from .webhooks import create_endpoint, deactivate_endpoint, list_deliveries, list_endpoints, retry_delivery
+
+bp_webhooks = Blueprint("webhooks", __name__, url_prefix="/api/webhooks")
+
+
+@bp_webhooks.before_request
+@jwt_required()
+def require_admin():
+    if request.method == "OPTIONS":
+        return None
+    if get_jwt().get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+    return None
+
+
+@bp_webhooks.get("")
+@jwt_required()
+def list_webhook_endpoints():
+    return jsonify({"endpoints": list_endpoints(current_organization_id())})
+
+
+@bp_webhooks.post("")
+@jwt_required()
+def create_webhook_endpoint():
+    try:
+        endpoint = create_endpoint(request.get_json() or {}, current_organization_id())
+        return jsonify({
+            "endpoint": endpoint,
+            "message": "Webhook endpoint created",
+            "warning": "Save the signing secret securely. You won't be able to see it again!",
+            "status": "success",
+        }), 201
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_webhooks.delete("/<endpoint_id>")
+@jwt_required()
+def delete_webhook_endpoint(endpoint_id):
+    try:
+        deactivate_endpoint(endpoint_id, current_organization_id())
+        return jsonify({"message": "Webhook endpoint deleted", "status": "success"}), 200
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_webhooks.get("/<endpoint_id>/deliveries")
+@jwt_required()
+def webhook_deliveries(endpoint_id):
+    try:
+        limit = min(request.args.get("limit", 100, type=int), 500)
+        deliveries = list_deliveries(endpoint_id, request.args.get("status"), limit, current_organization_id())
+        return jsonify({"deliveries": deliveries})
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
+
+
+@bp_webhooks.post("/deliveries/<delivery_id>/retry")
+@jwt_required()
+def retry_webhook_delivery(delivery_id):
+    try:
+        retry_delivery(delivery_id, current_organization_id())
+        return jsonify({"message": "Delivery queued for retry", "status": "success"}), 200
+    except AppError as exc:
+        return jsonify({"error": exc.message, "status": "error"}), exc.status_code
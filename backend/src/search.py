@@ -0,0 +1,271 @@
+"""Search over tokens and verifications by name, email and address.
+
+Every token and verification has a ``search_documents`` row holding its
+searchable fields and ``document``, their normalized words (lower-cased,
+accents stripped). It is written in the same flush as the record itself, so
+a committed record is always searchable.
+
+On Postgres ``document`` has a pg_trgm GIN index: a query matches the
+documents that contain each of its words anywhere, ranked by
+``word_similarity``. Elsewhere (SQLite, or Postgres without the pg_trgm
+extension installed) ``search_terms`` is an inverted
+index from every prefix of every word (MIN_TERM to MAX_TERM characters) to
+the documents containing it, so each query word is a single primary key
+range scan, a document matches when it has all of them, and its rank is the
+sum of their weights: name and email count more than address, whole words
+more than prefixes.
+
+Archiving a verification keeps its document, so it can still be found (and
+fetched from ``/api/verifications/archive/<id>``).
+"""
+
+import logging
+import re
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import aliased
+
+from .database import VersionedSession, session_scope
+from .errors import ValidationError
+from .jsonlib import loads_or_none
+from .models import SearchDocument, SearchTerm, Verification, VerificationToken
+
+logger = logging.getLogger(__name__)
+
+MIN_TERM = 2
+MAX_TERM = 32
+ENTITY_TYPES = ("token", "verification")
+
+# Field -> weight of a prefix match; a whole-word match adds one.
+_FIELD_WEIGHTS = {"full_name": 3, "email": 3, "address": 1}
+_WORD = re.compile(r"[^\W_]+")
+
+TRIGRAM_INDEX = "ix_search_documents_document_trgm"
+_trigram_databases: Dict[str, bool] = {}
+
+
+def uses_trigrams(conn: Connection) -> bool:
+    """Whether this database is searched with pg_trgm rather than ``search_terms``."""
+    if conn.dialect.name != "postgresql":
+        return False
+    key = conn.engine.url.render_as_string()
+    if key not in _trigram_databases:
+        _trigram_databases[key] = conn.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {"name": TRIGRAM_INDEX}
+        ).first() is not None
+    return _trigram_databases[key]
+
+
+def ensure_trigram_index(conn: Connection) -> bool:
+    """Create the pg_trgm index on Postgres if the extension is available."""
+    if conn.dialect.name != "postgresql":
+        return False
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DBAPIError:
+        logger.warning("[SEARCH] pg_trgm is not available, search uses the inverted index")
+        return False
+    conn.exec_driver_sql(
+        f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON search_documents USING gin (document gin_trgm_ops)"
+    )
+    _trigram_databases.clear()
+    return True
+
+
+def _words(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return _WORD.findall("".join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+def _document(entity_type: str, entity_id: str, organization_id: Optional[str], created_at: datetime,
+              full_name: Optional[str], email: Optional[str], address: Optional[str]) -> Dict:
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "organization_id": organization_id,
+        "full_name": full_name,
+        "email": email,
+        "address": address,
+        "document": " ".join(_words(" ".join(filter(None, (full_name, email, address))))),
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+def _token_document(row) -> Dict:
+    return _document("token", row.id, row.organization_id, row.created_at, row.full_name, row.email, None)
+
+
+def _verification_document(row) -> Dict:
+    info = loads_or_none(row.personal_info) or {}
+    return _document("verification", row.id, row.organization_id, row.timestamp, info.get("full_name"),
+                     info.get("email"), info.get("address"))
+
+
+def _terms(document: Dict) -> Dict[str, int]:
+    terms: Dict[str, int] = {}
+    for field, weight in _FIELD_WEIGHTS.items():
+        for word in _words(document[field]):
+            word = word[:MAX_TERM]
+            for end in range(MIN_TERM, len(word) + 1):
+                prefix = word[:end]
+                terms[prefix] = max(terms.get(prefix, 0), weight + (end == len(word)))
+    return terms
+
+
+def _write_documents(db, conn: Connection, documents: List[Dict]) -> None:
+    """Insert ``documents`` and, without pg_trgm, their terms (``db`` is a Session or ``conn``)."""
+    rows = db.execute(
+        insert(SearchDocument).returning(SearchDocument.id, SearchDocument.entity_type, SearchDocument.entity_id),
+        documents,
+    ).all()
+    if uses_trigrams(conn):
+        return
+    ids = {(entity_type, entity_id): doc_id for doc_id, entity_type, entity_id in rows}
+    terms = [
+        {"term": term, "document_id": ids[(d["entity_type"], d["entity_id"])], "weight": weight}
+        for d in documents
+        for term, weight in _terms(d).items()
+    ]
+    if terms:
+        db.execute(insert(SearchTerm), terms)
+
+
+def _forget(db, where) -> None:
+    doc_ids = select(SearchDocument.id).where(where)
+    db.execute(delete(SearchTerm).where(SearchTerm.document_id.in_(doc_ids)))
+    db.execute(delete(SearchDocument).where(where))
+
+
+@event.listens_for(VersionedSession, "after_flush")
+def _index_flushed_records(session, flush_context):
+    # Searchable fields never change after insert, so only new and deleted records matter.
+    documents = []
+    for obj in session.new:
+        if isinstance(obj, VerificationToken):
+            documents.append(_token_document(obj))
+        elif isinstance(obj, Verification):
+            documents.append(_verification_document(obj))
+    for obj in session.deleted:
+        if isinstance(obj, (VerificationToken, Verification)):
+            entity_type = "token" if isinstance(obj, VerificationToken) else "verification"
+            _forget(session, (SearchDocument.entity_type == entity_type) & (SearchDocument.entity_id == obj.id))
+    if documents:
+        _write_documents(session, session.connection(), documents)
+
+
+def forget_tokens_before(conn: Connection, cutoff: datetime) -> None:
+    """Drop the documents of tokens created before ``cutoff`` (their partitions are being dropped)."""
+    _forget(conn, (SearchDocument.entity_type == "token") & (SearchDocument.created_at < cutoff))
+
+
+def _batches(conn: Connection, model, batch_size: int) -> Iterable[list]:
+    last = None
+    while True:
+        stmt = select(model.__table__).order_by(model.id).limit(batch_size)
+        if last is not None:
+            stmt = stmt.where(model.id > last)
+        rows = conn.execute(stmt).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1].id
+
+
+def reindex(conn: Connection, batch_size: int = 2000) -> int:
+    """Rebuild the documents of all tokens and hot verifications; returns documents written.
+
+    Records written while this runs may conflict with it, so run it when writes are quiet.
+    """
+    # Archived verifications are gone from the hot table, so their documents are left as they are.
+    _forget(conn, (SearchDocument.entity_type == "token") | (
+        (SearchDocument.entity_type == "verification") & SearchDocument.entity_id.in_(select(Verification.id))
+    ))
+    written = 0
+    for model, to_document in ((VerificationToken, _token_document), (Verification, _verification_document)):
+        for rows in _batches(conn, model, batch_size):
+            _write_documents(conn, conn, [to_document(r) for r in rows])
+            written += len(rows)
+    return written
+
+
+def _query_words(query: str) -> List[str]:
+    words = list(dict.fromkeys(w[:MAX_TERM] for w in _words(query) if len(w) >= MIN_TERM))
+    if not words:
+        raise ValidationError(f"q must contain a word of at least {MIN_TERM} characters")
+    return words
+
+
+def _term_query(words: List[str], entity_type: Optional[str], organization_id: Optional[str]):
+    # Drive from the longest (usually rarest) word and probe the others by primary key,
+    # so the cost follows that word's matches rather than the sum over all words.
+    words = sorted(words, key=len, reverse=True)
+    terms = [aliased(SearchTerm) for _ in words]
+    first = terms[0]
+    score = sum((t.weight for t in terms[1:]), first.weight)
+    stmt = select(first.document_id, score.label("score")).where(first.term == words[0])
+    for term, word in zip(terms[1:], words[1:]):
+        stmt = stmt.join(term, (term.term == word) & (term.document_id == first.document_id))
+    if entity_type is not None or organization_id is not None:
+        stmt = stmt.join(SearchDocument, SearchDocument.id == first.document_id)
+    if entity_type is not None:
+        stmt = stmt.where(SearchDocument.entity_type == entity_type)
+    if organization_id is not None:
+        stmt = stmt.where(SearchDocument.organization_id == organization_id)
+    return stmt.order_by(score.desc(), first.document_id.desc())
+
+
+def _trigram_query(words: List[str], entity_type: Optional[str], organization_id: Optional[str]):
+    # Words are letters and digits only, so they carry no LIKE wildcards.
+    score = func.word_similarity(" ".join(words), SearchDocument.document)
+    stmt = select(SearchDocument.id, score.label("score")).where(
+        *(SearchDocument.document.like(f"%{w}%") for w in words)
+    )
+    if entity_type is not None:
+        stmt = stmt.where(SearchDocument.entity_type == entity_type)
+    if organization_id is not None:
+        stmt = stmt.where(SearchDocument.organization_id == organization_id)
+    return stmt.order_by(score.desc(), SearchDocument.id.desc())
+
+
+def search_query(conn: Connection, query: str, entity_type: Optional[str] = None,
+                 organization_id: Optional[str] = None):
+    """(document id, score) for each match of ``query``, best first, by whichever index the database has."""
+    query_for = _trigram_query if uses_trigrams(conn) else _term_query
+    return query_for(_query_words(query), entity_type, organization_id)
+
+
+def _result(document: SearchDocument, score) -> Dict:
+    return {
+        "type": document.entity_type,
+        "id": document.entity_id,
+        "fullName": document.full_name,
+        "email": document.email,
+        "address": document.address,
+        "createdAt": document.created_at.isoformat(),
+        "score": round(float(score), 3),
+    }
+
+
+def search(query: str, entity_type: Optional[str] = None, limit: int = 20, offset: int = 0,
+           organization_id: Optional[str] = None) -> Dict:
+    """Ranked matches for ``query`` (in one organization, if given); pass ``nextOffset`` back as ``offset``."""
+    with session_scope(readonly=True) as db:
+        stmt = search_query(db.connection(), query, entity_type, organization_id)
+        rows = db.execute(stmt.limit(limit + 1).offset(offset)).all()
+        page = rows[:limit]
+        documents = db.scalars(select(SearchDocument).where(SearchDocument.id.in_([doc_id for doc_id, _ in page])))
+        by_id = {d.id: d for d in documents}
+        results = [_result(by_id[doc_id], score) for doc_id, score in page]
+    return {
+        "results": results,
+        "nextOffset": offset + len(results),
+        "hasMore": len(rows) > limit,
+    }
@@ -1,13 +1,17 @@
-import json
+import logging
 import secrets
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from sqlalchemy import select
 
 from .database import session_scope
-from .errors import ValidationError, NotFoundError
+from .errors import ValidationError, NotFoundError, UnauthorizedError
+from .jsonlib import dumps, loads
 from .models import ApiKey
+from .services_organizations import organization_id_for
+
+logger = logging.getLogger(__name__)
 
 
 def generate_api_key() -> str:
@@ -21,7 +25,8 @@ def hash_api_key(api_key: str) -> str:
     return hashlib.sha256(api_key.encode()).hexdigest()
 
 
-def create_api_key(payload: Dict) -> Dict:
+def create_api_key(payload: Dict, organization_id: Optional[str] = None) -> Dict:
+    """Issue a key; without ``organization_id`` it belongs to the organization named by ``company``."""
     for field in ["name", "company"]:
         if field not in payload:
             raise ValidationError(f"Missing required field: {field}")
@@ -45,16 +50,17 @@ def create_api_key(payload: Dict) -> Dict:
             created_at=datetime.utcnow(),
             expires_at=expires_at,
             usage_count=0,
-            permissions=json.dumps(payload.get("permissions", ["verification:create", "verification:read"])),
+            permissions=dumps(payload.get("permissions", ["verification:create", "verification:read"])),
             rate_limit=payload.get("rateLimit", 1000),
             environment=payload.get("environment", "production"),
         )
 
         with session_scope() as db:
+            record.organization_id = organization_id or organization_id_for(db, payload["company"])
             db.add(record)
             db.flush()  # Force write to get any database errors
             
-        print(f"[API Keys Service] Created API key: {api_key_id}")
+        logger.info("[API_KEYS] Stored API key %s", api_key_id)
 
         return {
             "apiKey": api_key,
@@ -62,51 +68,68 @@ def create_api_key(payload: Dict) -> Dict:
                 "id": api_key_id,
                 "name": payload["name"],
                 "company": payload["company"],
+                "organizationId": record.organization_id,
                 "keyPrefix": key_prefix,
                 "createdAt": record.created_at.isoformat(),
                 "expiresAt": expires_at.isoformat() if expires_at else None,
-                "permissions": json.loads(record.permissions),
+                "permissions": loads(record.permissions),
             },
         }
     except Exception as e:
-        print(f"[API Keys Service] Error creating API key: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[API_KEYS] Error creating API key: %s", e)
         raise ValidationError(f"Failed to create API key: {str(e)}")
 
 
-def list_api_keys() -> List[Dict]:
-    with session_scope() as db:
-        keys = db.scalars(select(ApiKey)).all()
+def authenticate_api_key(api_key: str) -> str:
+    """Return the id of the active, unexpired key ``api_key``; UnauthorizedError otherwise."""
+    with session_scope(readonly=True) as db:
+        record = db.scalars(select(ApiKey).where(ApiKey.key_hash == hash_api_key(api_key or ""))).first()
+        if not record or not record.active or (record.expires_at and record.expires_at < datetime.utcnow()):
+            raise UnauthorizedError("Invalid API key")
+        return record.id
+
+
+def list_api_keys(organization_id: Optional[str] = None) -> List[Dict]:
+    stmt = select(ApiKey)
+    if organization_id is not None:
+        stmt = stmt.where(ApiKey.organization_id == organization_id)
+    with session_scope(readonly=True) as db:
+        keys = db.scalars(stmt).all()
         return [
             {
                 "id": k.id,
                 "name": k.name,
                 "company": k.company,
+                "organizationId": k.organization_id,
                 "keyPrefix": k.key_prefix,
                 "active": k.active,
                 "createdAt": k.created_at.isoformat() if k.created_at else None,
                 "expiresAt": k.expires_at.isoformat() if k.expires_at else None,
                 "lastUsedAt": k.last_used_at.isoformat() if k.last_used_at else None,
                 "usageCount": k.usage_count,
-                "permissions": json.loads(k.permissions or "[]"),
+                "permissions": loads(k.permissions or "[]"),
             }
             for k in keys
         ]
 
 
-def update_api_key(key_id: str, payload: Dict) -> Dict:
+def _get_key(db, key_id: str, organization_id: Optional[str]) -> ApiKey:
+    record = db.get(ApiKey, key_id)
+    if not record or (organization_id is not None and record.organization_id != organization_id):
+        raise NotFoundError("API key not found")
+    return record
+
+
+def update_api_key(key_id: str, payload: Dict, organization_id: Optional[str] = None) -> Dict:
     with session_scope() as db:
-        record = db.get(ApiKey, key_id)
-        if not record:
-            raise NotFoundError("API key not found")
+        record = _get_key(db, key_id, organization_id)
 
         if "active" in payload:
             record.active = payload["active"]
         if "name" in payload:
             record.name = payload["name"]
         if "permissions" in payload:
-            record.permissions = json.dumps(payload["permissions"])
+            record.permissions = dumps(payload["permissions"])
         if "rateLimit" in payload:
             record.rate_limit = payload["rateLimit"]
 
@@ -119,11 +142,9 @@ def update_api_key(key_id: str, payload: Dict) -> Dict:
         }
 
 
-def deactivate_api_key(key_id: str) -> None:
+def deactivate_api_key(key_id: str, organization_id: Optional[str] = None) -> None:
     with session_scope() as db:
-        record = db.get(ApiKey, key_id)
-        if not record:
-            raise NotFoundError("API key not found")
+        record = _get_key(db, key_id, organization_id)
         record.active = False
         record.expires_at = record.expires_at or datetime.utcnow()
         db.add(record)
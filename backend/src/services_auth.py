@@ -1,7 +1,6 @@
 from datetime import datetime
 from typing import Optional
 import logging
-import traceback
 
 from flask_jwt_extended import create_access_token, create_refresh_token
 from werkzeug.security import check_password_hash, generate_password_hash
@@ -9,33 +8,37 @@ from sqlalchemy import select
 
 from .database import session_scope
 from .errors import ValidationError, UnauthorizedError
-from .models import User
+from .models import Organization, User
 
 logger = logging.getLogger(__name__)
 
 
+def _claims(user: User) -> dict:
+    # "org" scopes every request to the user's organization; "platform" lets one without see all (see tenancy.py).
+    return {"role": user.role, "email": user.email, "org": user.organization_id, "platform": bool(user.is_platform)}
+
+
 def create_user(email: str, password: str) -> dict:
     try:
-        logger.info(f"[CREATE_USER] Starting user creation for: {email}")
+        logger.info("[CREATE_USER] Starting user creation for: %s", email)
         email_normalized = email.strip().lower()
         
         if not email_normalized or not password:
-            logger.warning(f"[CREATE_USER] Missing email or password")
+            logger.warning("[CREATE_USER] Missing email or password")
             raise ValidationError("Email and password are required")
 
         with session_scope() as db:
             existing = db.scalar(select(User).where(User.email == email_normalized))
             if existing:
                 # User already exists - authenticate them instead
-                logger.info(f"[CREATE_USER] User already exists, attempting auto sign-in: {email_normalized}")
+                logger.info("[CREATE_USER] User already exists, attempting auto sign-in: %s", email_normalized)
                 # Verify password and return authentication tokens
                 if not check_password_hash(existing.password_hash, password):
-                    logger.warning(f"[CREATE_USER] Password mismatch for existing user: {email_normalized}")
+                    logger.warning("[CREATE_USER] Password mismatch for existing user: %s", email_normalized)
                     raise UnauthorizedError("Invalid credentials")
                 
-                logger.info(f"[CREATE_USER] Auto sign-in successful for: {email_normalized}")
-                claims = {"role": existing.role, "email": existing.email}
-                access = create_access_token(identity=existing.id, additional_claims=claims)
+                logger.info("[CREATE_USER] Auto sign-in successful for: %s", email_normalized)
+                access = create_access_token(identity=existing.id, additional_claims=_claims(existing))
                 refresh = create_refresh_token(identity=existing.id)
                 return {
                     "id": existing.id,
@@ -43,111 +46,128 @@ def create_user(email: str, password: str) -> dict:
                     "role": existing.role,
                     "access_token": access,
                     "refresh_token": refresh,
-                    "user": {"id": existing.id, "email": existing.email, "role": existing.role},
+                    "user": {"id": existing.id, "email": existing.email, "role": existing.role,
+                             "organizationId": existing.organization_id, "platform": bool(existing.is_platform)},
                     "already_existed": True
                 }
 
+            # The first user runs the platform; everyone after signs up outside any organization
+            # and sees nothing until an admin adds them to one.
             is_first_user = db.scalar(select(User.id)) is None
             role = "admin" if is_first_user else "user"
-            logger.info(f"[CREATE_USER] Creating new user: {email_normalized} with role: {role}")
-            user = User(email=email_normalized, password_hash=generate_password_hash(password), role=role)
+            logger.info("[CREATE_USER] Creating new user: %s with role: %s", email_normalized, role)
+            user = User(email=email_normalized, password_hash=generate_password_hash(password), role=role,
+                        is_platform=is_first_user)
             db.add(user)
             db.flush()
-            logger.info(f"[CREATE_USER] User created successfully: {email_normalized}")
+            logger.info("[CREATE_USER] User created successfully: %s", email_normalized)
             return {"id": user.id, "email": user.email, "role": user.role, "created_at": datetime.utcnow().isoformat()}
     except (ValidationError, UnauthorizedError):
         raise
     except Exception as e:
-        logger.error(f"[CREATE_USER] Unexpected error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[CREATE_USER] Unexpected error: %s", e)
         raise ValidationError(f"User creation failed: {str(e)}")
 
 
 def authenticate_user(email: str, password: str) -> dict:
     try:
-        logger.info(f"[AUTHENTICATE] Starting authentication for: {email}")
+        logger.info("[AUTHENTICATE] Starting authentication for: %s", email)
         email_normalized = (email or "").strip().lower()
         
         if not email_normalized:
-            logger.warning(f"[AUTHENTICATE] Email is empty or None")
+            logger.warning("[AUTHENTICATE] Email is empty or None")
             raise ValidationError("Email is required")
         
         if not password:
-            logger.warning(f"[AUTHENTICATE] Password is empty for email: {email_normalized}")
+            logger.warning("[AUTHENTICATE] Password is empty for email: %s", email_normalized)
             raise ValidationError("Password is required")
 
         with session_scope() as db:
-            logger.debug(f"[AUTHENTICATE] Querying database for user: {email_normalized}")
+            logger.debug("[AUTHENTICATE] Querying database for user: %s", email_normalized)
             user = db.scalar(select(User).where(User.email == email_normalized))
             
             if not user:
-                logger.warning(f"[AUTHENTICATE] User not found in database: {email_normalized}")
+                logger.warning("[AUTHENTICATE] User not found in database: %s", email_normalized)
                 # List all users for debugging (remove in production)
-                all_users = db.scalars(select(User.email)).all()
-                logger.debug(f"[AUTHENTICATE] Available users in DB: {all_users}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    all_users = db.scalars(select(User.email)).all()
+                    logger.debug("[AUTHENTICATE] Available users in DB: %s", all_users)
                 raise UnauthorizedError("Invalid credentials")
             
-            logger.info(f"[AUTHENTICATE] User found: {email_normalized}, verifying password")
+            logger.info("[AUTHENTICATE] User found: %s, verifying password", email_normalized)
             if not check_password_hash(user.password_hash, password):
-                logger.warning(f"[AUTHENTICATE] Password verification failed for: {email_normalized}")
+                logger.warning("[AUTHENTICATE] Password verification failed for: %s", email_normalized)
                 raise UnauthorizedError("Invalid credentials")
 
-            logger.info(f"[AUTHENTICATE] Authentication successful for: {email_normalized}")
-            claims = {"role": user.role, "email": user.email}
-            
-            logger.debug(f"[AUTHENTICATE] Creating JWT tokens for user ID: {user.id}")
-            access = create_access_token(identity=user.id, additional_claims=claims)
+            logger.info("[AUTHENTICATE] Authentication successful for: %s", email_normalized)
+            logger.debug("[AUTHENTICATE] Creating JWT tokens for user ID: %s", user.id)
+            access = create_access_token(identity=user.id, additional_claims=_claims(user))
             refresh = create_refresh_token(identity=user.id)
             
-            logger.info(f"[AUTHENTICATE] Tokens generated successfully for: {email_normalized}")
+            logger.info("[AUTHENTICATE] Tokens generated successfully for: %s", email_normalized)
             return {
                 "access_token": access,
                 "refresh_token": refresh,
-                "user": {"id": user.id, "email": user.email, "role": user.role},
+                "user": {"id": user.id, "email": user.email, "role": user.role, "organizationId": user.organization_id,
+                         "platform": bool(user.is_platform)},
             }
     except (ValidationError, UnauthorizedError):
         raise
     except Exception as e:
-        logger.error(f"[AUTHENTICATE] Unexpected error during authentication: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[AUTHENTICATE] Unexpected error during authentication: %s", e)
         raise UnauthorizedError(f"Authentication failed: {str(e)}")
 
 
+def refresh_access_token(user_id: str) -> str:
+    """A new access token with the user's current role and organization."""
+    with session_scope(readonly=True) as db:
+        user = db.get(User, user_id)
+        if not user:
+            raise UnauthorizedError("User not found")
+        return create_access_token(identity=user.id, additional_claims=_claims(user))
+
+
 def get_user(user_id: str) -> Optional[dict]:
     with session_scope() as db:
         user = db.get(User, user_id)
         if not user:
             return None
-        return {"id": user.id, "email": user.email, "role": user.role}
+        return {"id": user.id, "email": user.email, "role": user.role, "organizationId": user.organization_id,
+                "platform": bool(user.is_platform)}
 
 
-def list_all_users() -> list[dict]:
-    """List all users in the system"""
+def list_all_users(organization_id: Optional[str] = None) -> list[dict]:
+    """List all users in the system, or in one organization"""
     try:
         logger.info("[LIST_ALL_USERS] Fetching all users")
-        with session_scope() as db:
-            users = db.scalars(select(User)).all()
+        stmt = select(User)
+        if organization_id is not None:
+            stmt = stmt.where(User.organization_id == organization_id)
+        with session_scope(readonly=True) as db:
+            users = db.scalars(stmt).all()
             result = [
                 {
                     "id": user.id,
                     "email": user.email,
                     "role": user.role,
+                    "organizationId": user.organization_id,
+                    "platform": bool(user.is_platform),
                     "created_at": user.created_at.isoformat() if user.created_at else None
                 }
                 for user in users
             ]
-            logger.info(f"[LIST_ALL_USERS] Found {len(result)} users")
+            logger.info("[LIST_ALL_USERS] Found %s users", len(result))
             return result
     except Exception as e:
-        logger.error(f"[LIST_ALL_USERS] Error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[LIST_ALL_USERS] Error: %s", e)
         raise
 
 
-def create_user_by_admin(email: str, password: str, role: str = "user") -> dict:
-    """Create a new user by admin"""
+def create_user_by_admin(email: str, password: str, role: str = "user",
+                         organization_id: Optional[str] = None, platform: bool = False) -> dict:
+    """Create a new user by admin, in an organization or (``platform``) across all of them"""
     try:
-        logger.info(f"[CREATE_USER_BY_ADMIN] Creating user: {email} with role: {role}")
+        logger.info("[CREATE_USER_BY_ADMIN] Creating user: %s with role: %s", email, role)
         email_normalized = email.strip().lower()
         
         if not email_normalized or not password:
@@ -160,49 +180,56 @@ def create_user_by_admin(email: str, password: str, role: str = "user") -> dict:
             # Check if user exists
             existing = db.scalar(select(User).where(User.email == email_normalized))
             if existing:
-                logger.warning(f"[CREATE_USER_BY_ADMIN] User already exists: {email_normalized}")
+                logger.warning("[CREATE_USER_BY_ADMIN] User already exists: %s", email_normalized)
                 raise ValidationError("User with this email already exists")
             
+            if organization_id is not None and not db.get(Organization, organization_id):
+                raise ValidationError("Organization not found")
+            if platform and organization_id is not None:
+                raise ValidationError("A platform user cannot belong to an organization")
+
             # Create new user
             user = User(
                 email=email_normalized,
                 password_hash=generate_password_hash(password),
-                role=role
+                role=role,
+                organization_id=organization_id,
+                is_platform=platform,
             )
             db.add(user)
             db.flush()
             
-            logger.info(f"[CREATE_USER_BY_ADMIN] User created successfully: {email_normalized}")
+            logger.info("[CREATE_USER_BY_ADMIN] User created successfully: %s", email_normalized)
             return {
                 "id": user.id,
                 "email": user.email,
                 "role": user.role,
+                "organizationId": user.organization_id,
+                "platform": user.is_platform,
                 "created_at": user.created_at.isoformat() if user.created_at else None
             }
     except (ValidationError, UnauthorizedError):
         raise
     except Exception as e:
-        logger.error(f"[CREATE_USER_BY_ADMIN] Error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[CREATE_USER_BY_ADMIN] Error: %s", e)
         raise ValidationError(f"User creation failed: {str(e)}")
 
 
-def delete_user_by_admin(user_id: str) -> None:
-    """Delete a user by admin"""
+def delete_user_by_admin(user_id: str, organization_id: Optional[str] = None) -> None:
+    """Delete a user by admin; with ``organization_id``, only a user of that organization"""
     try:
-        logger.info(f"[DELETE_USER_BY_ADMIN] Deleting user: {user_id}")
+        logger.info("[DELETE_USER_BY_ADMIN] Deleting user: %s", user_id)
         with session_scope() as db:
             user = db.get(User, user_id)
-            if not user:
-                logger.warning(f"[DELETE_USER_BY_ADMIN] User not found: {user_id}")
+            if not user or (organization_id is not None and user.organization_id != organization_id):
+                logger.warning("[DELETE_USER_BY_ADMIN] User not found: %s", user_id)
                 raise ValidationError("User not found")
             
             db.delete(user)
             db.flush()
-            logger.info(f"[DELETE_USER_BY_ADMIN] User deleted successfully: {user_id}")
+            logger.info("[DELETE_USER_BY_ADMIN] User deleted successfully: %s", user_id)
     except ValidationError:
         raise
     except Exception as e:
-        logger.error(f"[DELETE_USER_BY_ADMIN] Error: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("[DELETE_USER_BY_ADMIN] Error: %s", e)
         raise ValidationError(f"User deletion failed: {str(e)}")
@@ -0,0 +1,57 @@
+"""Organizations: the customers that users, tokens, verifications and API keys belong to."""
+
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from .database import session_scope
+from .errors import ConflictError, ValidationError
+from .models import Organization
+
+logger = logging.getLogger(__name__)
+
+
+def _organization_to_dict(org: Organization) -> Dict:
+    return {
+        "id": org.id,
+        "name": org.name,
+        "createdAt": org.created_at.isoformat() if org.created_at else None,
+    }
+
+
+def organization_id_for(db, name: str) -> str:
+    """Id of the organization called ``name``, created if new (``db`` is a sync Session)."""
+    org_id = db.scalar(select(Organization.id).where(Organization.name == name))
+    if org_id:
+        return org_id
+    org = Organization(name=name, created_at=datetime.utcnow())
+    try:
+        # A concurrent request may create the same name first; then use theirs.
+        with db.begin_nested():
+            db.add(org)
+    except IntegrityError:
+        return db.scalar(select(Organization.id).where(Organization.name == name))
+    logger.info("[ORGANIZATIONS] Created organization %r (%s)", name, org.id)
+    return org.id
+
+
+def create_organization(name: str) -> Dict:
+    name = (name or "").strip()
+    if not name:
+        raise ValidationError("Organization name is required")
+    with session_scope() as db:
+        if db.scalar(select(Organization.id).where(Organization.name == name)):
+            raise ConflictError("An organization with this name already exists")
+        org = Organization(name=name, created_at=datetime.utcnow())
+        db.add(org)
+        db.flush()
+        logger.info("[ORGANIZATIONS] Created organization %r (%s)", name, org.id)
+        return _organization_to_dict(org)
+
+
+def list_organizations() -> List[Dict]:
+    with session_scope(readonly=True) as db:
+        return [_organization_to_dict(o) for o in db.scalars(select(Organization).order_by(Organization.name))]
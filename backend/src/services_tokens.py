@@ -1,32 +1,52 @@
 from datetime import datetime, timedelta
-from typing import Dict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Optional
 
-from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from sqlalchemy import select
 
+from .config import get_settings
 from .database import session_scope
 from .errors import ValidationError, NotFoundError
+from .events import TOKEN_CREATED, TOKEN_VALIDATED, emit, notify, token_status_event
 from .models import VerificationToken
+from .services_organizations import organization_id_for
+from . import search  # noqa: F401  (indexes new records as they are flushed)
 
+if TYPE_CHECKING:
+    from itsdangerous import URLSafeTimedSerializer
+    from sqlalchemy.ext.asyncio import AsyncSession
 
-def generate_token(serializer: URLSafeTimedSerializer, payload: Dict, expires_hours: int = 24) -> Dict:
+
+@lru_cache(maxsize=1)
+def link_serializer() -> "URLSafeTimedSerializer":
+    # itsdangerous is only needed once a link is signed or checked.
+    from itsdangerous import URLSafeTimedSerializer
+
+    return URLSafeTimedSerializer(get_settings().secret_key)
+
+
+def generate_token(serializer: "URLSafeTimedSerializer", payload: Dict, expires_hours: int = 24,
+                   organization_id: Optional[str] = None) -> Dict:
+    """Sign and store a link; without ``organization_id`` it belongs to the organization named in ``payload``."""
     token_id = payload["tokenId"]
     token = serializer.dumps(payload, salt="verification-link")
     expires_at = datetime.utcnow() + timedelta(hours=expires_hours)
 
     with session_scope() as db:
-        db.add(
-            VerificationToken(
-                id=token_id,
-                token=token,
-                email=payload["email"],
-                full_name=payload["fullName"],
-                organization_name=payload["organizationName"],
-                expires_at=expires_at,
-                status="active",
-                api_key_id=payload.get("apiKeyId"),
-            )
+        record = VerificationToken(
+            id=token_id,
+            token=token,
+            email=payload["email"],
+            full_name=payload["fullName"],
+            organization_name=payload["organizationName"],
+            expires_at=expires_at,
+            status="active",
+            api_key_id=payload.get("apiKeyId"),
+            organization_id=organization_id or organization_id_for(db, payload["organizationName"]),
         )
+        db.add(record)
+        emit(db, TOKEN_CREATED, _token_event_data(record), api_key_id=record.api_key_id,
+             organization_id=record.organization_id)
     return {
         "token": token,
         "expires_at": expires_at,
@@ -34,56 +54,125 @@ def generate_token(serializer: URLSafeTimedSerializer, payload: Dict, expires_ho
     }
 
 
-def validate_token(serializer: URLSafeTimedSerializer, token: str) -> Dict:
+def _decode_token(serializer: "URLSafeTimedSerializer", token: str) -> Dict:
+    from itsdangerous import BadSignature, SignatureExpired
+
     if not token:
         raise ValidationError("No token provided")
 
     try:
-        data = serializer.loads(token, salt="verification-link", max_age=86400)
+        return serializer.loads(token, salt="verification-link", max_age=86400)
     except SignatureExpired as e:
         raise ValidationError("This verification link has expired") from e
     except BadSignature as e:
         raise ValidationError("Invalid or corrupted verification link") from e
 
-    token_id = data.get("tokenId")
+
+def _check_token_record(record: Optional[VerificationToken]) -> None:
+    if not record:
+        raise ValidationError("Invalid verification token")
+    if record.used:
+        raise ValidationError("This verification link has already been used")
+    if record.status != "active":
+        raise ValidationError("This verification link is no longer active")
+    if record.expires_at and record.expires_at < datetime.utcnow():
+        raise ValidationError("This verification link has expired")
+
+
+def _token_event_data(record: VerificationToken) -> Dict:
+    return {
+        "tokenId": record.id,
+        "status": record.status,
+        "organizationName": record.organization_name,
+        "expiresAt": record.expires_at.isoformat(),
+        "usedAt": record.used_at.isoformat() if record.used_at else None,
+    }
+
+
+def _apply_token_status(db, record: VerificationToken, status: str, used: bool) -> None:
+    record.status = status
+    if used:
+        record.used = True
+        record.used_at = datetime.utcnow()
+    emit(db, token_status_event(status), _token_event_data(record), api_key_id=record.api_key_id,
+         organization_id=record.organization_id)
+
+
+def _announce_validated(db, record: VerificationToken) -> None:
+    notify(db, TOKEN_VALIDATED, _token_event_data(record), api_key_id=record.api_key_id,
+           organization_id=record.organization_id)
+
+
+def validate_token(serializer: "URLSafeTimedSerializer", token: str, announce: bool = False) -> Dict:
+    """Decode and check a link token; ``announce`` publishes token.validated (the customer opened it)."""
+    data = _decode_token(serializer, token)
     with session_scope() as db:
-        record = db.get(VerificationToken, token_id)
-        if not record:
-            raise ValidationError("Invalid verification token")
-        if record.used:
-            raise ValidationError("This verification link has already been used")
-        if record.status != "active":
-            raise ValidationError("This verification link is no longer active")
-        if record.expires_at and record.expires_at < datetime.utcnow():
-            raise ValidationError("This verification link has expired")
+        record = db.get(VerificationToken, data.get("tokenId"))
+        _check_token_record(record)
+        if announce:
+            _announce_validated(db, record)
+    return data
+
+
+async def validate_token_async(db: "AsyncSession", serializer: "URLSafeTimedSerializer", token: str,
+                               announce: bool = False) -> Dict:
+    data = _decode_token(serializer, token)
+    record = await db.get(VerificationToken, data.get("tokenId"))
+    _check_token_record(record)
+    if announce:
+        _announce_validated(db, record)
     return data
 
 
-def mark_token_status(token_id: str, status: str, used: bool = False) -> None:
+def mark_token_status(token_id: str, status: str, used: bool = False, organization_id: Optional[str] = None) -> None:
+    """Set a token's status; with ``organization_id``, only a token of that organization."""
     with session_scope() as db:
         record = db.get(VerificationToken, token_id)
-        if not record:
+        if not record or (organization_id is not None and record.organization_id != organization_id):
             raise NotFoundError("Token not found")
-        record.status = status
-        if used:
-            record.used = True
-            record.used_at = datetime.utcnow()
+        _apply_token_status(db, record, status, used)
         db.add(record)
 
 
-def list_tokens() -> list:
-    with session_scope() as db:
+async def mark_token_status_async(db: "AsyncSession", token_id: str, status: str, used: bool = False) -> None:
+    record = await db.get(VerificationToken, token_id)
+    if not record:
+        raise NotFoundError("Token not found")
+    _apply_token_status(db, record, status, used)
+
+
+def tokens_query(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 organization_id: Optional[str] = None):
+    stmt = select(VerificationToken)
+    if organization_id is not None:
+        stmt = stmt.where(VerificationToken.organization_id == organization_id)
+    if since is not None:
+        stmt = stmt.where(VerificationToken.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(VerificationToken.created_at < until)
+    return stmt
+
+
+def list_tokens(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                organization_id: Optional[str] = None) -> list:
+    """Tokens with ``since <= created_at < until``; a partitioned table reads only those months.
+
+    With ``organization_id`` only that organization's, read through its
+    ``(organization_id, created_at)`` index.
+    """
+    with session_scope(readonly=True) as db:
         return [
             {
                 "id": t.id,
                 "email": t.email,
                 "fullName": t.full_name,
                 "organizationName": t.organization_name,
+                "organizationId": t.organization_id,
                 "createdAt": t.created_at.isoformat(),
                 "expiresAt": t.expires_at.isoformat(),
                 "used": t.used,
                 "usedAt": t.used_at.isoformat() if t.used_at else None,
                 "status": t.status,
             }
-            for t in db.scalars(select(VerificationToken)).all()
+            for t in db.scalars(tokens_query(since, until, organization_id)).all()
         ]
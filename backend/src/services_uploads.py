@@ -1,54 +1,288 @@
+"""Document uploads, stored content-addressed.
+
+File content lives once under ``<upload_folder>/blobs/ab/cd/<sha256>``, with
+an ``upload_blobs`` row counting the ``uploads`` that point at it. Uploading
+bytes that are already stored costs one hash and a metadata insert. Blobs
+whose count has dropped to zero are removed by ``collect_garbage`` (run via
+``python maintenance.py gc-blobs``) once they have been unreferenced for
+the grace period.
+"""
+
+import contextlib
+import hashlib
+import logging
 import os
+import tempfile
+import time
 import uuid
-from datetime import datetime
-from typing import Tuple
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from werkzeug.utils import secure_filename
+
+from .errors import NotFoundError, PayloadTooLargeError, ValidationError
+from .database import on_commit, session_scope
+from .document_pipeline import preview_path, submit as submit_for_processing
+from .jsonlib import loads_or_none
+from .models import Upload, UploadBlob
 
-from .errors import ValidationError
-from .database import session_scope
-from .models import Upload
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request per iteration; memory per upload stays at one chunk.
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 
 def allowed_file(filename: str, allowed_extensions: list) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in allowed_extensions
 
 
-def save_upload(file_storage, upload_dir: str, allowed_extensions: list, max_file_size: int) -> dict:
-    if not file_storage or file_storage.filename == "":
-        raise ValidationError("No file selected")
+def blob_path(upload_dir: str, sha256: str) -> str:
+    # Two levels of 256 directories keep each directory small enough for fast lookups.
+    return os.path.join(upload_dir, "blobs", sha256[:2], sha256[2:4], sha256)
 
-    if not allowed_file(file_storage.filename, allowed_extensions):
-        raise ValidationError("File type not allowed")
 
-    file_storage.seek(0, os.SEEK_END)
-    size = file_storage.tell()
-    file_storage.seek(0)
-    if size > max_file_size:
-        raise ValidationError("File too large")
+def _staging_dir(upload_dir: str) -> str:
+    # Same filesystem as the blobs, so moving a finished upload into place is atomic.
+    return os.path.join(upload_dir, "tmp")
+
+
+def _stream_to_file(stream: BinaryIO, staging_dir: str, max_file_size: int):
+    """Copy ``stream`` into a temp file in ``staging_dir``, hashing as it goes.
+
+    Stops and removes the partial file as soon as more than ``max_file_size``
+    bytes have been read. Returns (temp path, size, sha256 hex digest).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=staging_dir, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_file_size:
+                    raise PayloadTooLargeError("File too large")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, size, digest.hexdigest()
+
+
+def _reference_blob(db, sha256: str, size: int) -> None:
+    """Insert the blob row or add a reference to it, in one atomic statement."""
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(UploadBlob).values(
+        sha256=sha256, size=size, ref_count=1, created_at=datetime.utcnow(), unreferenced_at=None,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[UploadBlob.sha256],
+        set_={"ref_count": UploadBlob.ref_count + 1, "unreferenced_at": None},
+    ))
+
+
+def _release_blob(db, sha256: str) -> None:
+    db.execute(update(UploadBlob).where(UploadBlob.sha256 == sha256)
+               .values(ref_count=UploadBlob.ref_count - 1))
+    db.execute(update(UploadBlob).where(UploadBlob.sha256 == sha256, UploadBlob.ref_count <= 0)
+               .values(unreferenced_at=datetime.utcnow()))
 
-    os.makedirs(upload_dir, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    original_filename = file_storage.filename
-    stored_name = f"{timestamp}_{original_filename}"
-    filepath = os.path.join(upload_dir, stored_name)
-    file_storage.save(filepath)
+def save_upload_stream(stream: BinaryIO, filename: str, upload_dir: str, allowed_extensions: list,
+                       max_file_size: int, content_length: Optional[int] = None,
+                       verification_id: Optional[str] = None, uploaded_by: Optional[str] = None,
+                       organization_id: Optional[str] = None) -> dict:
+    """Store an upload read from ``stream`` in fixed-size chunks.
+
+    A declared ``content_length`` over the limit is rejected before anything
+    is read; otherwise the limit is enforced while reading. The upload
+    belongs to ``organization_id`` (to platform users only without one).
+    """
+    original_filename = secure_filename(filename or "")
+    if not original_filename:
+        raise ValidationError("No file selected")
+    if not allowed_file(original_filename, allowed_extensions):
+        raise ValidationError("File type not allowed")
+    if content_length is not None and content_length > max_file_size:
+        raise PayloadTooLargeError("File too large")
+
+    staging_dir = _staging_dir(upload_dir)
+    os.makedirs(staging_dir, exist_ok=True)
+    tmp_path, size, sha256 = _stream_to_file(stream, staging_dir, max_file_size)
+    if size == 0:
+        os.unlink(tmp_path)
+        raise ValidationError("Uploaded file is empty")
 
     record = Upload(
         id=str(uuid.uuid4()),
-        filename=stored_name,
+        filename=original_filename,
         original_filename=original_filename,
-        filepath=filepath,
+        filepath=blob_path(upload_dir, sha256),
         file_size=size,
+        sha256=sha256,
         document_type="unknown",
-        verification_id=None,
+        verification_id=verification_id,
+        uploaded_by=uploaded_by,
+        organization_id=organization_id,
+        processing_status="pending",
     )
 
-    with session_scope() as db:
-        db.add(record)
+    try:
+        with session_scope() as db:
+            # Reference the blob before touching its file: the garbage collector
+            # only deletes a file while holding the row with ref_count 0, so once
+            # this statement has run the file cannot disappear underneath us.
+            _reference_blob(db, sha256, size)
+            deduplicated = os.path.exists(record.filepath)
+            if deduplicated:
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(record.filepath), exist_ok=True)
+                os.replace(tmp_path, record.filepath)
+            db.add(record)
+            on_commit(db, lambda: submit_for_processing(record.id))
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
 
     return {
         "upload_id": record.id,
-        "filename": stored_name,
+        "filename": original_filename,
         "file_size": size,
+        "sha256": sha256,
+        "deduplicated": deduplicated,
+        "processing_status": record.processing_status,
         "uploaded_at": datetime.now().isoformat(),
     }
+
+
+def save_upload(file_storage, upload_dir: str, allowed_extensions: list, max_file_size: int) -> dict:
+    if not file_storage or file_storage.filename == "":
+        raise ValidationError("No file selected")
+    return save_upload_stream(file_storage.stream, file_storage.filename, upload_dir, allowed_extensions,
+                              max_file_size)
+
+
+def _upload_to_dict(record: Upload) -> dict:
+    return {
+        "upload_id": record.id,
+        "filename": record.original_filename,
+        "file_size": record.file_size,
+        "sha256": record.sha256,
+        "verification_id": record.verification_id,
+        "uploaded_at": record.uploaded_at.isoformat() if record.uploaded_at else None,
+        "processing_status": record.processing_status,
+        "processing_error": record.processing_error,
+        "document_type": record.document_type,
+        "page_count": record.page_count,
+        "metadata": loads_or_none(record.document_metadata) or {},
+        "preview_available": record.preview_path is not None,
+    }
+
+
+def _get_upload(db, upload_id: str, organization_id: Optional[str]) -> Optional[Upload]:
+    """The upload, unless it belongs to another organization than ``organization_id``."""
+    record = db.get(Upload, upload_id)
+    if record is None or (organization_id is not None and record.organization_id != organization_id):
+        return None
+    return record
+
+
+def get_upload(upload_id: str, organization_id: Optional[str] = None) -> dict:
+    with session_scope() as db:
+        record = _get_upload(db, upload_id, organization_id)
+        if record is None:
+            raise NotFoundError("Upload not found")
+        return _upload_to_dict(record)
+
+
+def get_preview_path(upload_id: str, organization_id: Optional[str] = None) -> str:
+    with session_scope() as db:
+        record = _get_upload(db, upload_id, organization_id)
+        if record is None or record.preview_path is None or not os.path.exists(record.preview_path):
+            raise NotFoundError("Preview not available")
+        return record.preview_path
+
+
+def delete_upload(upload_id: str, organization_id: Optional[str] = None) -> None:
+    with session_scope() as db:
+        record = _get_upload(db, upload_id, organization_id)
+        if record is None:
+            raise NotFoundError("Upload not found")
+        db.delete(record)
+        if record.sha256 and db.get(UploadBlob, record.sha256) is not None:
+            _release_blob(db, record.sha256)
+        else:
+            # Stored before content addressing: the file belongs to this row alone.
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(record.filepath)
+
+
+def collect_garbage(upload_dir: str, grace: timedelta, dry_run: bool = False) -> dict:
+    """Delete blobs unreferenced for longer than ``grace``, and stray files.
+
+    Stray files are blob files without a row and abandoned staging files,
+    left behind when a request failed after writing its file; they are only
+    removed once older than ``grace`` so in-flight uploads are never touched.
+    """
+    cutoff = datetime.utcnow() - grace
+    stats = {"blobs_deleted": 0, "bytes_freed": 0, "stray_files_deleted": 0}
+
+    with session_scope(own_transaction=True) as db:
+        candidates = db.execute(
+            select(UploadBlob.sha256, UploadBlob.size)
+            .where(UploadBlob.ref_count <= 0, UploadBlob.unreferenced_at < cutoff)
+        ).all()
+    for sha256, size in candidates:
+        if dry_run:
+            stats["blobs_deleted"] += 1
+            stats["bytes_freed"] += size
+            continue
+        # One short transaction per blob. The DELETE re-checks the count, so a
+        # blob re-referenced since the SELECT is kept; the file is removed
+        # before COMMIT, while the row lock still holds off new references.
+        with session_scope(own_transaction=True) as db:
+            deleted = db.execute(
+                delete(UploadBlob)
+                .where(UploadBlob.sha256 == sha256, UploadBlob.ref_count <= 0, UploadBlob.unreferenced_at < cutoff)
+            ).rowcount
+            if deleted:
+                for path in (blob_path(upload_dir, sha256), preview_path(upload_dir, sha256)):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(path)
+                stats["blobs_deleted"] += 1
+                stats["bytes_freed"] += size
+
+    mtime_cutoff = time.time() - grace.total_seconds()
+    stale = lambda path: os.path.getmtime(path) < mtime_cutoff
+
+    blobs_root = os.path.join(upload_dir, "blobs")
+    for dirpath, _, names in os.walk(blobs_root):
+        if not names:
+            continue
+        with session_scope(own_transaction=True) as db:
+            known = set(db.scalars(select(UploadBlob.sha256).where(UploadBlob.sha256.in_(names))))
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if name not in known and stale(path):
+                if not dry_run:
+                    os.unlink(path)
+                stats["stray_files_deleted"] += 1
+
+    staging_dir = _staging_dir(upload_dir)
+    if os.path.isdir(staging_dir):
+        for name in os.listdir(staging_dir):
+            path = os.path.join(staging_dir, name)
+            if stale(path):
+                if not dry_run:
+                    os.unlink(path)
+                stats["stray_files_deleted"] += 1
+
+    logger.info("[UPLOADS] Garbage collection%s: %s", " (dry run)" if dry_run else "", stats)
+    return stats
@@ -1,14 +1,22 @@
-import json
+import csv
+import io
 import math
 import uuid
 from datetime import datetime
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import func, or_, select
 
 from .database import session_scope
+from .devices import device_fingerprint, record_device, record_device_async, shared_device
 from .errors import ValidationError
-from .models import Verification
+from .events import VERIFICATION_CREATED, emit
+from .jsonlib import dumps, loads, loads_or_none
+from .models import Verification, VerificationToken
+from . import search  # noqa: F401  (indexes new records as they are flushed)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 
 def _haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -50,7 +58,8 @@ def _risk_score(distance_meters: Optional[float]) -> float:
     return 0.9
 
 
-def create_verification_from_payload(payload: Dict, token_id: Optional[str], request_ip: str) -> Dict:
+def _build_verification(payload: Dict, token_id: Optional[str], request_ip: str) -> Tuple[Verification, Dict]:
+    """Validate and score a submission; shared by the sync and async paths."""
     required_fields = ['fullName', 'email', 'address', 'city', 'state', 'zipCode']
     for field in required_fields:
         if field not in payload:
@@ -76,18 +85,26 @@ def create_verification_from_payload(payload: Dict, token_id: Optional[str], req
             status = "requires_review"
 
     risk = _risk_score(distance_meters)
+    security = {
+        "user_agent": payload.get('userAgent', ''),
+        "screen_resolution": payload.get('screenResolution', ''),
+        "timezone": payload.get('timezone', ''),
+        "ip_address": request_ip,
+    }
 
     record = Verification(
         id=str(uuid.uuid4()),
         token_id=token_id,
-        personal_info=json.dumps({
+        # Set here rather than at flush, as the device is recorded as seen at this time.
+        timestamp=datetime.utcnow(),
+        personal_info=dumps({
             "full_name": payload['fullName'],
             "email": payload['email'],
             "phone": payload.get('phone', ''),
             "address": full_address,
             "organization": payload.get('organizationName', 'Organization'),
         }),
-        location_data=json.dumps({
+        location_data=dumps({
             "user_coordinates": {
                 "latitude": user_lat,
                 "longitude": user_lon,
@@ -100,38 +117,104 @@ def create_verification_from_payload(payload: Dict, token_id: Optional[str], req
             "distance_meters": distance_meters,
             "location_verified": location_verified,
         }),
-        security_data=json.dumps({
-            "user_agent": payload.get('userAgent', ''),
-            "screen_resolution": payload.get('screenResolution', ''),
-            "timezone": payload.get('timezone', ''),
-            "ip_address": request_ip,
-        }),
-        verification_results=json.dumps({
+        security_data=dumps(security),
+        verification_results=dumps({
             "status": status,
             "risk_score": risk,
             "location_match": location_verified,
             "requires_manual_review": risk > 0.6,
         }),
         consent_provided=payload.get('consent', True),
+        status=status,
+        device_fingerprint=device_fingerprint(security),
     )
-
-    with session_scope() as db:
-        db.add(record)
-        db.flush()
-        created = record
-
-    return {
-        "verification_id": created.id,
+    outcome = {
         "status": status,
         "risk_score": risk,
         "location_verified": location_verified,
         "distance_from_address": distance_meters,
-        "message": verification_message(status, distance_meters),
-        "timestamp": created.timestamp.isoformat(),
+        "requires_manual_review": risk > 0.6,
+        "shared_device": False,
+    }
+    return record, outcome
+
+
+def _flag_shared_device(record: Verification, outcome: Dict, identities: Optional[int]) -> None:
+    """Note how many identities the submitting device has verified; past the limit, hold it for review.
+
+    A location match from a shared device is downgraded to ``requires_review``
+    in the record, the response and the event alike.
+    """
+    if identities is None:
+        return
+    results = loads(record.verification_results)
+    results["device_identities"] = identities
+    if shared_device(identities):
+        results["requires_manual_review"] = outcome["requires_manual_review"] = outcome["shared_device"] = True
+        if outcome["status"] == "verified":
+            results["status"] = outcome["status"] = record.status = "requires_review"
+    record.verification_results = dumps(results)
+
+
+def _verification_response(record: Verification, outcome: Dict) -> Dict:
+    return {
+        "verification_id": record.id,
+        **outcome,
+        "message": verification_message(outcome["status"], outcome["distance_from_address"],
+                                        outcome["shared_device"]),
+        "timestamp": record.timestamp.isoformat(),
     }
 
 
-def verification_message(status: str, distance_meters: Optional[float]) -> str:
+def _verification_event_data(record: Verification, outcome: Dict) -> Dict:
+    return {
+        "verificationId": record.id,
+        "tokenId": record.token_id,
+        "status": outcome["status"],
+        "riskScore": outcome["risk_score"],
+        "locationVerified": outcome["location_verified"],
+        "distanceFromAddress": outcome["distance_from_address"],
+        "requiresManualReview": outcome["requires_manual_review"],
+        "timestamp": record.timestamp.isoformat(),
+    }
+
+
+def create_verification_from_payload(payload: Dict, token_id: Optional[str], request_ip: str) -> Dict:
+    record, outcome = _build_verification(payload, token_id, request_ip)
+    with session_scope() as db:
+        # The token was just marked in this same unit of work, so this is an identity-map hit.
+        token = db.get(VerificationToken, token_id) if token_id else None
+        # Before the flush, so the search document is written with the organization too.
+        record.organization_id = token.organization_id if token else None
+        _flag_shared_device(
+            record, outcome, record_device(db, record.device_fingerprint, payload["email"], record.timestamp)
+        )
+        db.add(record)
+        db.flush()
+        emit(db, VERIFICATION_CREATED, _verification_event_data(record, outcome),
+             api_key_id=token.api_key_id if token else None, organization_id=record.organization_id)
+    return _verification_response(record, outcome)
+
+
+async def create_verification_from_payload_async(
+    db: "AsyncSession", payload: Dict, token_id: Optional[str], request_ip: str
+) -> Dict:
+    record, outcome = _build_verification(payload, token_id, request_ip)
+    token = await db.get(VerificationToken, token_id) if token_id else None
+    record.organization_id = token.organization_id if token else None
+    _flag_shared_device(
+        record, outcome, await record_device_async(db, record.device_fingerprint, payload["email"], record.timestamp)
+    )
+    db.add(record)
+    await db.flush()
+    emit(db, VERIFICATION_CREATED, _verification_event_data(record, outcome),
+         api_key_id=token.api_key_id if token else None, organization_id=record.organization_id)
+    return _verification_response(record, outcome)
+
+
+def verification_message(status: str, distance_meters: Optional[float], shared_device: bool = False) -> str:
+    if shared_device:
+        return "Manual review required. This device was recently used to verify other identities."
     if status == "verified" and distance_meters is not None:
         return f"Address verification successful. User is within {distance_meters:.0f}m of claimed address."
     if status == "requires_review" and distance_meters is not None:
@@ -139,36 +222,165 @@ def verification_message(status: str, distance_meters: Optional[float]) -> str:
     return "Manual verification required due to insufficient location data."
 
 
-def list_verifications() -> list:
-    with session_scope() as db:
-        return [
-            {
-                "id": r.id,
-                "tokenId": r.token_id,
-                "timestamp": r.timestamp.isoformat(),
-                "personal_info": json.loads(r.personal_info),
-                "location_data": json.loads(r.location_data) if r.location_data else None,
-                "security_data": json.loads(r.security_data) if r.security_data else None,
-                "verification_results": json.loads(r.verification_results),
-                "consent_provided": r.consent_provided,
-            }
-            for r in db.scalars(select(Verification)).all()
-        ]
+def verification_to_dict(r: Verification) -> Dict:
+    return {
+        "id": r.id,
+        "tokenId": r.token_id,
+        "organizationId": r.organization_id,
+        "deviceFingerprint": r.device_fingerprint,
+        "timestamp": r.timestamp.isoformat(),
+        "personal_info": loads(r.personal_info),
+        "location_data": loads_or_none(r.location_data),
+        "security_data": loads_or_none(r.security_data),
+        "verification_results": loads(r.verification_results),
+        "consent_provided": r.consent_provided,
+    }
+
+
+def _window(stmt, column, org_column, since: Optional[datetime], until: Optional[datetime],
+            organization_id: Optional[str]):
+    if organization_id is not None:
+        stmt = stmt.where(org_column == organization_id)
+    if since is not None:
+        stmt = stmt.where(column >= since)
+    if until is not None:
+        stmt = stmt.where(column < until)
+    return stmt
+
+
+def verifications_query(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                        organization_id: Optional[str] = None):
+    return _window(select(Verification), Verification.timestamp, Verification.organization_id,
+                   since, until, organization_id)
+
+
+def device_verifications_query(fingerprint: str, since: Optional[datetime] = None,
+                               organization_id: Optional[str] = None, limit: int = 100):
+    return verifications_query(since, None, organization_id).where(
+        Verification.device_fingerprint == fingerprint
+    ).order_by(Verification.timestamp.desc()).limit(limit)
+
+
+def stats_queries(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  organization_id: Optional[str] = None) -> Dict:
+    """The statements verification_stats runs, by name."""
+    return {
+        "counts": _window(
+            select(Verification.status, func.count()), Verification.timestamp, Verification.organization_id,
+            since, until, organization_id,
+        ).group_by(Verification.status),
+        "pending": _window(
+            select(func.count()).select_from(VerificationToken).where(VerificationToken.status == "active"),
+            VerificationToken.created_at, VerificationToken.organization_id, since, until, organization_id,
+        ),
+        "recent": verifications_query(since, until, organization_id).order_by(Verification.timestamp.desc()).limit(5),
+    }
+
+
+def verifications_for_tokens_query(token_ids: list):
+    return select(Verification).where(Verification.token_id.in_(token_ids))
+
+
+def list_verifications(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       organization_id: Optional[str] = None) -> list:
+    """Verifications with ``since <= timestamp < until``; a partitioned table reads only those months.
+
+    With ``organization_id`` only that organization's, read through its
+    ``(organization_id, timestamp)`` index.
+    """
+    with session_scope(readonly=True) as db:
+        return [verification_to_dict(r) for r in db.scalars(verifications_query(since, until, organization_id)).all()]
+
+
+def list_device_verifications(fingerprint: str, since: Optional[datetime] = None,
+                              organization_id: Optional[str] = None, limit: int = 100) -> list:
+    """The latest verifications submitted from a device, read through its ``(device_fingerprint, timestamp)`` index."""
+    with session_scope(readonly=True) as db:
+        records = db.scalars(device_verifications_query(fingerprint, since, organization_id, limit)).all()
+        return [verification_to_dict(r) for r in records]
+
+
+def verification_stats(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       organization_id: Optional[str] = None) -> Dict:
+    """Dashboard counts and the five latest verifications, counted by the database."""
+    queries = stats_queries(since, until, organization_id)
+    with session_scope(readonly=True) as db:
+        counts = db.execute(queries["counts"]).all()
+        pending = db.scalar(queries["pending"])
+        recent = db.scalars(queries["recent"]).all()
+        by_status = {status or "unknown": count for status, count in counts}
+        return {
+            "total": sum(by_status.values()),
+            "successful": by_status.get("verified", 0),
+            "failed": by_status.get("requires_review", 0),
+            "pending": pending,
+            "byStatus": by_status,
+            "recent": [verification_to_dict(r) for r in recent],
+        }
+
+
+EXPORT_COLUMNS = [
+    "id", "token_id", "timestamp", "status", "full_name", "email", "phone", "address", "organization",
+    "risk_score", "location_match", "distance_meters", "consent_provided",
+]
+
+
+def _export_row(r: Verification) -> list:
+    info = loads(r.personal_info)
+    results = loads(r.verification_results)
+    location = loads_or_none(r.location_data) or {}
+    return [
+        r.id, r.token_id, r.timestamp.isoformat(), r.status or results.get("status"),
+        info.get("full_name"), info.get("email"), info.get("phone"), info.get("address"), info.get("organization"),
+        results.get("risk_score"), results.get("location_match"), location.get("distance_meters"),
+        r.consent_provided,
+    ]
+
+
+def export_verifications_csv(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                             organization_id: Optional[str] = None, batch_size: int = 1000) -> Iterator[str]:
+    """CSV of the selected verifications, oldest first, produced ``batch_size`` rows at a time.
+
+    Each batch is a short keyset query on (timestamp, id), so an export of
+    any size never holds a transaction open or the whole result in memory.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    after = None
+    while True:
+        stmt = verifications_query(since, until, organization_id)
+        if after is not None:
+            stmt = stmt.where(Verification.timestamp >= after[0]).where(
+                or_(Verification.timestamp > after[0], Verification.id > after[1])
+            )
+        with session_scope(readonly=True) as db:
+            records = db.scalars(stmt.order_by(Verification.timestamp, Verification.id).limit(batch_size)).all()
+            if not records:
+                return
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(_export_row(r) for r in records)
+            after = (records[-1].timestamp, records[-1].id)
+        yield buffer.getvalue()
+        if len(records) < batch_size:
+            return
 
 
 def list_verifications_for_tokens(token_ids: list) -> list:
     if not token_ids:
         return []
     with session_scope() as db:
-        records = db.scalars(select(Verification).where(Verification.token_id.in_(token_ids))).all()
+        records = db.scalars(verifications_for_tokens_query(token_ids)).all()
         return [
             {
                 "id": r.id,
                 "tokenId": r.token_id,
                 "timestamp": r.timestamp.isoformat(),
-                "verification_results": json.loads(r.verification_results),
-                "location_data": json.loads(r.location_data) if r.location_data else None,
-                "personal_info": json.loads(r.personal_info),
+                "verification_results": loads(r.verification_results),
+                "location_data": loads_or_none(r.location_data),
+                "personal_info": loads(r.personal_info),
             }
             for r in records
         ]
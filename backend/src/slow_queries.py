@@ -0,0 +1,150 @@
+"""Opt-in recorder for statements slower than ``SLOW_QUERY_MS``.
+
+Each slow statement is logged with the shape of its parameters (types and
+sizes, never values), the service function that issued it and the current
+route. Its plan is captured afterwards on a background thread and attached
+to the entry. The most recent entries are kept in memory for
+``GET /api/admin/slow-queries``.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = {os.path.join(_SRC_DIR, name) for name in ("database.py", "slow_queries.py", "metrics.py")}
+_EXPLAINABLE = ("select", "with")
+
+_entries: Deque[Dict[str, Any]] = deque(maxlen=200)
+_entries_lock = threading.Lock()
+_explain_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _param_shape(parameters: Any, executemany: bool) -> Any:
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "each": _param_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_shape(value) for value in parameters]
+    return None
+
+
+def _value_shape(value: Any) -> str:
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def _calling_function() -> Optional[str]:
+    # First frame in our own package outside the database plumbing, i.e. the
+    # service (or route) that ran the statement. Statements issued by the
+    # plumbing itself (e.g. the commit-time table_versions bump) fall back to
+    # the innermost database.py function.
+    fallback = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_SRC_DIR):
+            location = f"{os.path.splitext(os.path.basename(filename))[0]}.{frame.f_code.co_name}:{frame.f_lineno}"
+            if filename not in _SKIP_FILES:
+                return location
+            if fallback is None and filename.endswith("database.py"):
+                fallback = location
+        frame = frame.f_back
+    return fallback
+
+
+def _explain(engine: Engine, entry: Dict[str, Any], statement: str, parameters: Any) -> None:
+    try:
+        with engine.connect() as conn:
+            conn = conn.execution_options(slow_query_log=False)
+            if conn.dialect.name == "postgresql":
+                rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).all()
+                plan = "\n".join(r[0] for r in rows)
+            else:
+                rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                plan = "\n".join(str(r[-1]) for r in rows)
+            conn.rollback()
+        entry["plan"] = plan
+    except Exception as e:
+        entry["plan_error"] = str(e)
+
+
+def _record(engine: Engine, statement: str, parameters: Any, executemany: bool, elapsed: float,
+            explain: bool) -> None:
+    entry = {
+        "recorded_at": datetime.utcnow().isoformat(),
+        "duration_ms": round(elapsed * 1000, 2),
+        "statement": statement,
+        "params": _param_shape(parameters, executemany),
+        "caller": _calling_function(),
+        "route": request.url_rule.rule if has_request_context() and request.url_rule is not None else None,
+        "plan": None,
+    }
+    logger.warning(
+        "[SLOW_QUERY] %.1f ms in %s (route %s): %s",
+        entry["duration_ms"], entry["caller"], entry["route"], " ".join(statement.split())[:500],
+    )
+    with _entries_lock:
+        _entries.append(entry)
+    if explain and not executemany and statement.lstrip().lower().startswith(_EXPLAINABLE):
+        _explain_pool.submit(_explain, engine, entry, statement, parameters)
+
+
+def install_slow_query_log(engine: Engine, threshold_ms: float, explain: bool = True,
+                           explain_engine: Optional[Engine] = None, buffer_size: int = 200) -> None:
+    """Record statements on ``engine`` slower than ``threshold_ms``.
+
+    Plans are captured through ``explain_engine`` (default ``engine``). The
+    async engine passes the sync primary because its own connections need an
+    event loop.
+    """
+    global _entries, _explain_pool
+    threshold = threshold_ms / 1000
+    explain_target = explain_engine or engine
+    with _entries_lock:
+        if _explain_pool is None:
+            _explain_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        if _entries.maxlen != buffer_size:
+            _entries = deque(_entries, maxlen=buffer_size)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed >= threshold and context.execution_options.get("slow_query_log", True):
+            _record(explain_target, statement, parameters, executemany, elapsed, explain)
+
+
+def recent_slow_queries(limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest first."""
+    with _entries_lock:
+        return [dict(entry) for entry in reversed(_entries)][:limit]
+
+
+def clear_slow_queries() -> None:
+    with _entries_lock:
+        _entries.clear()
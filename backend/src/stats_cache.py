@@ -0,0 +1,104 @@
+"""Per-process cache of the dashboard stats, shared by everyone polling them.
+
+Entries are keyed by scope (organization and ``[from, to)`` window) and
+remember the ``table_versions`` of verifications and tokens they were
+computed at. Every write to those tables bumps its version in the same
+transaction, so a poll costs one primary-key read to decide:
+
+* versions unchanged: the entry is current and served, however old;
+* changed, but the entry is less than STATS_CACHE_SECONDS old: still served,
+  so a busy write path recomputes a scope at most once per interval;
+* otherwise one request recomputes it (single flight) while the others serve
+  the previous entry, or wait for the new one when there is none yet.
+
+Each worker process keeps its own entries; the versions they are checked
+against are shared through the database.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from .config import get_settings
+from .http_cache import table_versions
+from .metrics import record_cache
+
+STATS_TABLES = ("verifications", "verification_tokens")
+_MAX_ENTRIES = 256
+
+
+@dataclass(frozen=True)
+class CachedValue:
+    versions: Dict[str, int]
+    computed_at: float  # time.monotonic()
+    value: Dict
+
+
+class SingleFlightCache:
+    def __init__(self, size: int):
+        self.size = size
+        self._items: "OrderedDict[Hashable, CachedValue]" = OrderedDict()
+        self._flights: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: Hashable) -> Optional[CachedValue]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def _put(self, key: Hashable, item: CachedValue) -> None:
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                evicted, _ = self._items.popitem(last=False)
+                self._flights.pop(evicted, None)
+
+    def _flight(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._flights.setdefault(key, threading.Lock())
+
+    def get(self, key: Hashable, versions: Dict[str, int], min_age: float,
+            compute: Callable[[], Dict]) -> CachedValue:
+        """The entry for ``key``, recomputed if ``versions`` moved on and it is ``min_age`` seconds old."""
+        cached = self._get(key)
+        if cached is not None and (cached.versions == versions or time.monotonic() - cached.computed_at < min_age):
+            record_cache("stats", True)
+            return cached
+        flight = self._flight(key)
+        # With something to serve meanwhile, do not queue behind a recompute in progress.
+        if not flight.acquire(blocking=cached is None):
+            record_cache("stats", True)
+            return cached
+        try:
+            latest = self._get(key)
+            if latest is not None and latest is not cached:
+                # Recomputed by the request we waited for.
+                record_cache("stats", True)
+                return latest
+            record_cache("stats", False)
+            # Versions read before computing: a write racing with it leaves the entry stale, never wrong.
+            item = CachedValue(versions, time.monotonic(), compute())
+            self._put(key, item)
+            return item
+        finally:
+            flight.release()
+
+
+_cache = SingleFlightCache(_MAX_ENTRIES)
+
+
+def cached_stats(organization_id: Optional[str], since: Optional[datetime], until: Optional[datetime],
+                 compute: Callable[[], Dict]) -> Tuple[Dict, Dict[str, int]]:
+    """``compute()``'s result for this scope, and the table versions it reflects."""
+    versions = table_versions(STATS_TABLES)
+    seconds = get_settings().stats_cache_seconds
+    if seconds <= 0:
+        return compute(), versions
+    item = _cache.get((organization_id, since, until), versions, seconds, compute)
+    return item.value, item.versions
@@ -0,0 +1,35 @@
+"""Which organization a request may see.
+
+Access tokens carry the user's organization as the ``org`` claim. A user
+with one only ever sees that organization: listings, stats, exports, search
+and API keys all filter on ``organization_id``, which leads the indexes
+those queries use, so a tenant's requests cost what its own history costs.
+Platform users (``platform`` claim, from ``users.is_platform``) see every
+organization, or just one with ``?organizationId=``. A user with neither,
+such as anyone who signed themselves up, sees nothing until an admin puts
+them in an organization.
+"""
+
+from typing import Optional
+
+from flask import request
+from flask_jwt_extended import get_jwt
+
+from .errors import AppError
+
+
+def current_organization_id() -> Optional[str]:
+    """The organization this request is limited to, or None for all of them."""
+    claims = get_jwt()
+    org_id = claims.get("org")
+    if org_id:
+        return org_id
+    if not claims.get("platform"):
+        raise AppError("Your account does not belong to an organization yet", status_code=403)
+    return request.args.get("organizationId") or None
+
+
+def require_platform_user() -> None:
+    claims = get_jwt()
+    if claims.get("org") or not claims.get("platform"):
+        raise AppError("Only platform users can manage organizations", status_code=403)
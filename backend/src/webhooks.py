@@ -0,0 +1,452 @@
+"""Webhook endpoints and the dispatcher that delivers outbox events to them.
+
+The dispatcher runs outside the web app (``python webhook_worker.py``) and
+repeats two steps:
+
+1. Fan-out: undispatched ``outbox_events`` become one ``webhook_deliveries``
+   row per subscribed endpoint, in a single transaction per batch.
+2. Delivery: due deliveries are claimed in a batch, POSTed over a shared
+   pool of keep-alive connections with at most ``max_concurrency`` requests
+   in flight per endpoint, and each endpoint lane's results written back as
+   soon as that lane finishes. An endpoint gets no more deliveries per batch
+   than its lanes can send within the claim lease, even if every request
+   times out, so a claim never expires while it is still being sent.
+   Failures are retried with exponential backoff and jitter;
+   after ``WEBHOOK_MAX_ATTEMPTS`` the delivery is dead-lettered (status
+   ``dead``) until retried through the API.
+
+Each request is signed: ``X-VerifAi-Signature: t=<unix time>,v1=<hex>``
+where ``v1`` is HMAC-SHA256 of ``"<t>.<body>"`` with the endpoint secret.
+
+An endpoint belongs to the organization of whoever created it (or of its
+API key) and is only sent that organization's events; platform users'
+endpoints without one are sent every organization's. Endpoints must be
+https URLs whose host resolves only to public addresses, checked when the
+endpoint is created and again before each batch is sent to it;
+``WEBHOOK_ALLOW_PRIVATE_URLS`` lifts that for local testing.
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import logging
+import random
+import secrets
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from sqlalchemy import delete, func, or_, select, update
+
+from .config import get_settings
+from .database import session_scope
+from .errors import NotFoundError, ValidationError
+from .jsonlib import dumps, loads
+from .models import ApiKey, OutboxEvent, WebhookDelivery, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-VerifAi-Signature"
+MAX_BACKOFF = timedelta(hours=6)
+# A claimed delivery not finished within this long is picked up again.
+_CLAIM_LEASE = timedelta(minutes=5)
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    mac = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={mac}"
+
+
+def verify_signature(secret: str, header: str, body: bytes, tolerance_seconds: int = 300) -> bool:
+    """Check a signature header as a receiver would; rejects stale timestamps."""
+    try:
+        parts = dict(item.split("=", 1) for item in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance_seconds:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), header)
+
+
+def backoff(attempts: int, base_seconds: float) -> timedelta:
+    """Delay before retry number ``attempts`` (1-based): base * 2^(n-1), capped, +-20% jitter."""
+    delay = min(base_seconds * 2 ** (attempts - 1), MAX_BACKOFF.total_seconds())
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+# ---------------------------------------------------------------------------
+# Endpoint management
+# ---------------------------------------------------------------------------
+
+def url_problem(url: str) -> Optional[str]:
+    """Why the dispatcher must not POST to ``url``, or None if it may.
+
+    Keeps webhooks from reaching the loopback, private, link-local (cloud
+    metadata) or otherwise non-public addresses the worker can see.
+    """
+    parts = urlsplit(url)
+    if get_settings().webhook_allow_private_urls:
+        return None if parts.scheme in ("https", "http") and parts.hostname else "url must be an http(s) URL"
+    if parts.scheme != "https" or not parts.hostname:
+        return "url must be an https URL"
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or 443,
+                                                               proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        return "url host does not resolve"
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global:
+            return "url host must be a public address"
+    return None
+
+
+def _endpoint_to_dict(e: WebhookEndpoint) -> Dict:
+    return {
+        "id": e.id,
+        "url": e.url,
+        "eventTypes": loads(e.event_types),
+        "apiKeyId": e.api_key_id,
+        "organizationId": e.organization_id,
+        "maxConcurrency": e.max_concurrency,
+        "active": e.active,
+        "createdAt": e.created_at.isoformat() if e.created_at else None,
+    }
+
+
+def create_endpoint(payload: Dict, organization_id: Optional[str] = None) -> Dict:
+    """An endpoint for ``organization_id``'s events (every organization's without one)."""
+    url = payload.get("url")
+    url = url.strip() if isinstance(url, str) else ""
+    problem = url_problem(url)
+    if problem:
+        raise ValidationError(problem)
+    event_types = payload.get("eventTypes") or ["*"]
+    if not isinstance(event_types, list) or not all(isinstance(t, str) for t in event_types):
+        raise ValidationError("eventTypes must be a list of event type names")
+    max_concurrency = payload.get("maxConcurrency", 4)
+    if isinstance(max_concurrency, bool) or not isinstance(max_concurrency, int) \
+            or not 1 <= max_concurrency <= 32:
+        raise ValidationError("maxConcurrency must be an integer between 1 and 32")
+
+    secret = f"whsec_{secrets.token_urlsafe(32)}"
+    api_key_id = payload.get("apiKeyId")
+    with session_scope() as db:
+        if api_key_id is not None:
+            key = db.get(ApiKey, api_key_id)
+            if not key or (organization_id is not None and key.organization_id != organization_id):
+                raise ValidationError("API key not found")
+            organization_id = key.organization_id
+        endpoint = WebhookEndpoint(
+            url=url,
+            secret=secret,
+            event_types=dumps(event_types),
+            api_key_id=api_key_id,
+            organization_id=organization_id,
+            max_concurrency=max_concurrency,
+            active=True,
+            created_at=datetime.utcnow(),
+        )
+        db.add(endpoint)
+        db.flush()
+        return {**_endpoint_to_dict(endpoint), "secret": secret}
+
+
+def list_endpoints(organization_id: Optional[str] = None) -> List[Dict]:
+    stmt = select(WebhookEndpoint)
+    if organization_id is not None:
+        stmt = stmt.where(WebhookEndpoint.organization_id == organization_id)
+    with session_scope(readonly=True) as db:
+        return [_endpoint_to_dict(e) for e in db.scalars(stmt.order_by(WebhookEndpoint.created_at))]
+
+
+def _get_endpoint(db, endpoint_id: str, organization_id: Optional[str]) -> WebhookEndpoint:
+    endpoint = db.get(WebhookEndpoint, endpoint_id)
+    if endpoint is None or (organization_id is not None and endpoint.organization_id != organization_id):
+        raise NotFoundError("Webhook endpoint not found")
+    return endpoint
+
+
+def deactivate_endpoint(endpoint_id: str, organization_id: Optional[str] = None) -> None:
+    with session_scope() as db:
+        _get_endpoint(db, endpoint_id, organization_id).active = False
+
+
+def list_deliveries(endpoint_id: str, status: Optional[str] = None, limit: int = 100,
+                    organization_id: Optional[str] = None) -> List[Dict]:
+    with session_scope(readonly=True) as db:
+        _get_endpoint(db, endpoint_id, organization_id)
+        query = select(WebhookDelivery, OutboxEvent.event_type).join(
+            OutboxEvent, OutboxEvent.id == WebhookDelivery.event_id
+        ).where(WebhookDelivery.endpoint_id == endpoint_id)
+        if status:
+            query = query.where(WebhookDelivery.status == status)
+        rows = db.execute(query.order_by(WebhookDelivery.created_at.desc()).limit(limit)).all()
+        return [
+            {
+                "id": d.id,
+                "eventId": d.event_id,
+                "eventType": event_type,
+                "status": d.status,
+                "attempts": d.attempts,
+                "nextAttemptAt": d.next_attempt_at.isoformat() if d.status == "pending" else None,
+                "lastStatusCode": d.last_status_code,
+                "lastError": d.last_error,
+                "deliveredAt": d.delivered_at.isoformat() if d.delivered_at else None,
+            }
+            for d, event_type in rows
+        ]
+
+
+def retry_delivery(delivery_id: str, organization_id: Optional[str] = None) -> None:
+    """Put a dead-lettered delivery back in the queue with a fresh set of attempts."""
+    with session_scope() as db:
+        delivery = db.get(WebhookDelivery, delivery_id)
+        endpoint = db.get(WebhookEndpoint, delivery.endpoint_id) if delivery else None
+        if endpoint is None or (organization_id is not None and endpoint.organization_id != organization_id):
+            raise NotFoundError("Webhook delivery not found")
+        if delivery.status != "dead":
+            raise ValidationError("Only dead-lettered deliveries can be retried")
+        delivery.status, delivery.attempts, delivery.next_attempt_at = "pending", 0, datetime.utcnow()
+
+
+def purge_history(older_than: timedelta) -> int:
+    """Delete delivered deliveries and fully dispatched events older than ``older_than``."""
+    cutoff = datetime.utcnow() - older_than
+    with session_scope(own_transaction=True) as db:
+        deleted = db.execute(delete(WebhookDelivery).where(
+            WebhookDelivery.status == "delivered", WebhookDelivery.delivered_at < cutoff,
+        )).rowcount or 0
+        undelivered = select(WebhookDelivery.event_id).where(WebhookDelivery.status != "delivered")
+        deleted += db.execute(delete(OutboxEvent).where(
+            OutboxEvent.dispatched_at < cutoff, OutboxEvent.id.not_in(undelivered),
+        )).rowcount or 0
+        return deleted
+
+
+# ---------------------------------------------------------------------------
+# Dispatcher
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class _Attempt:
+    delivery_id: str
+    endpoint_id: str
+    url: str
+    secret: str
+    event_type: str
+    body: bytes
+    attempts: int
+    max_concurrency: int
+
+
+@dataclass(frozen=True)
+class _Result:
+    delivery_id: str
+    attempts: int
+    status_code: Optional[int]
+    error: Optional[str]
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+
+def _subscribed(endpoint: WebhookEndpoint, types: List[str], event: OutboxEvent) -> bool:
+    if endpoint.organization_id is not None and endpoint.organization_id != event.organization_id:
+        return False
+    if endpoint.api_key_id is not None and endpoint.api_key_id != event.api_key_id:
+        return False
+    return "*" in types or event.event_type in types
+
+
+class WebhookDispatcher:
+    def __init__(self, http_session=None, concurrency: Optional[int] = None, batch_size: Optional[int] = None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        settings = get_settings()
+        self.concurrency = concurrency or settings.webhook_concurrency
+        self.batch_size = batch_size or settings.webhook_batch_size
+        self.timeout = settings.webhook_timeout_seconds
+        # Deliveries one lane may take per batch: a request can take up to the
+        # timeout to connect and again to respond, and the lane must finish
+        # them all, with one to spare, before the claim lease runs out.
+        self.lane_length = max(1, int(_CLAIM_LEASE.total_seconds() // (2 * self.timeout)) - 1)
+        self.max_attempts = settings.webhook_max_attempts
+        self.backoff_seconds = settings.webhook_backoff_seconds
+        if http_session is None:
+            # One keep-alive pool per endpoint host, sized so every worker
+            # thread can hold a connection instead of reconnecting per request.
+            http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=64, pool_maxsize=self.concurrency, max_retries=0)
+            http_session.mount("http://", adapter)
+            http_session.mount("https://", adapter)
+        self.http = http_session
+        self.pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix="webhook")
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+        self.http.close()
+
+    def fan_out(self) -> int:
+        """Turn up to one batch of undispatched events into deliveries; returns events handled."""
+        with session_scope(own_transaction=True) as db:
+            query = select(OutboxEvent).where(OutboxEvent.dispatched_at.is_(None)).order_by(OutboxEvent.id)
+            if db.get_bind().dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+            events = db.scalars(query.limit(self.batch_size)).all()
+            if not events:
+                return 0
+            endpoints = [(e, loads(e.event_types)) for e in db.scalars(
+                select(WebhookEndpoint).where(WebhookEndpoint.active.is_(True))
+            )]
+            now = datetime.utcnow()
+            for event in events:
+                for endpoint, types in endpoints:
+                    if _subscribed(endpoint, types, event):
+                        db.add(WebhookDelivery(
+                            event_id=event.id, endpoint_id=endpoint.id, status="pending",
+                            attempts=0, next_attempt_at=now, created_at=now,
+                        ))
+                event.dispatched_at = now
+            return len(events)
+
+    def _claim(self) -> List[_Attempt]:
+        now = datetime.utcnow()
+        due = (
+            or_(WebhookDelivery.status == "pending", WebhookDelivery.status == "sending"),
+            WebhookDelivery.next_attempt_at <= now,
+            WebhookEndpoint.active.is_(True),
+        )
+        # Each endpoint's oldest due deliveries, up to what its lanes can send
+        # within the lease. Locking cannot be combined with a window function,
+        # so the outer query locks the rows and checks again that they are due.
+        ranked = (
+            select(
+                WebhookDelivery.id,
+                func.row_number().over(
+                    partition_by=WebhookDelivery.endpoint_id, order_by=WebhookDelivery.next_attempt_at,
+                ).label("position"),
+            )
+            .join(WebhookEndpoint, WebhookEndpoint.id == WebhookDelivery.endpoint_id)
+            .where(*due)
+            .subquery()
+        )
+        with session_scope(own_transaction=True) as db:
+            query = (
+                select(WebhookDelivery, WebhookEndpoint, OutboxEvent)
+                .join(WebhookEndpoint, WebhookEndpoint.id == WebhookDelivery.endpoint_id)
+                .join(OutboxEvent, OutboxEvent.id == WebhookDelivery.event_id)
+                .join(ranked, ranked.c.id == WebhookDelivery.id)
+                .where(*due, ranked.c.position <= WebhookEndpoint.max_concurrency * self.lane_length)
+                .order_by(WebhookDelivery.next_attempt_at)
+                .limit(self.batch_size)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                query = query.with_for_update(of=WebhookDelivery, skip_locked=True)
+            rows = db.execute(query).all()
+            attempts = []
+            for delivery, endpoint, event in rows:
+                # Claimed until the lease runs out; a crashed worker's claims expire.
+                delivery.status, delivery.next_attempt_at = "sending", now + _CLAIM_LEASE
+                attempts.append(_Attempt(
+                    delivery.id, endpoint.id, endpoint.url, endpoint.secret, event.event_type,
+                    event.payload.encode(), delivery.attempts + 1, endpoint.max_concurrency,
+                ))
+        return attempts
+
+    def _send(self, attempt: _Attempt) -> _Result:
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "VerifAi-Webhooks/1.0",
+            "X-VerifAi-Event": attempt.event_type,
+            "X-VerifAi-Delivery": attempt.delivery_id,
+            SIGNATURE_HEADER: sign(attempt.secret, int(time.time()), attempt.body),
+        }
+        try:
+            resp = self.http.post(attempt.url, data=attempt.body, headers=headers, timeout=self.timeout,
+                                  allow_redirects=False)
+            # Read the body so the connection goes back to the pool.
+            resp.content
+            error = None if 200 <= resp.status_code < 300 else f"HTTP {resp.status_code}"
+            return _Result(attempt.delivery_id, attempt.attempts, resp.status_code, error)
+        except Exception as e:
+            return _Result(attempt.delivery_id, attempt.attempts, None, f"{type(e).__name__}: {e}"[:500])
+
+    def _send_lane(self, lane: List[_Attempt]) -> List[_Result]:
+        return [self._send(attempt) for attempt in lane]
+
+    def _record(self, results: List[_Result]) -> Dict[str, int]:
+        now = datetime.utcnow()
+        stats = {"delivered": 0, "retrying": 0, "dead": 0}
+        with session_scope(own_transaction=True) as db:
+            for r in results:
+                values = {"attempts": r.attempts, "last_status_code": r.status_code, "last_error": r.error}
+                if r.ok:
+                    values.update(status="delivered", delivered_at=now)
+                    stats["delivered"] += 1
+                elif r.attempts >= self.max_attempts:
+                    values.update(status="dead")
+                    stats["dead"] += 1
+                    logger.warning("[WEBHOOKS] Delivery %s dead-lettered after %s attempts: %s",
+                                   r.delivery_id, r.attempts, r.error)
+                else:
+                    values.update(status="pending", next_attempt_at=now + backoff(r.attempts, self.backoff_seconds))
+                    stats["retrying"] += 1
+                db.execute(update(WebhookDelivery).where(WebhookDelivery.id == r.delivery_id).values(**values))
+        return stats
+
+    def deliver_due(self) -> Dict[str, int]:
+        """Send one batch of due deliveries; returns counts by outcome."""
+        attempts = self._claim()
+        if not attempts:
+            return {"delivered": 0, "retrying": 0, "dead": 0}
+        # Split each endpoint's deliveries into at most max_concurrency lanes
+        # that run sequentially, so one slow endpoint cannot take every thread.
+        by_endpoint: Dict[str, List[_Attempt]] = defaultdict(list)
+        for attempt in attempts:
+            by_endpoint[attempt.endpoint_id].append(attempt)
+        lanes = []
+        refused: List[_Result] = []
+        for items in by_endpoint.values():
+            # The host may resolve elsewhere now than when the endpoint was made.
+            problem = url_problem(items[0].url)
+            if problem:
+                refused.extend(_Result(a.delivery_id, a.attempts, None, f"Not sent: {problem}") for a in items)
+                continue
+            width = min(items[0].max_concurrency, len(items))
+            lanes.extend(items[i::width] for i in range(width))
+        # Each lane's results are written as soon as it finishes, so a slow
+        # endpoint does not hold back recording everyone else's.
+        stats = Counter({"delivered": 0, "retrying": 0, "dead": 0})
+        if refused:
+            stats.update(self._record(refused))
+        for lane in as_completed([self.pool.submit(self._send_lane, lane) for lane in lanes]):
+            stats.update(self._record(lane.result()))
+        return dict(stats)
+
+    def run_once(self) -> Dict[str, int]:
+        fanned_out = self.fan_out()
+        return {"events": fanned_out, **self.deliver_due()}
+
+    def run_forever(self, stop: threading.Event, idle_sleep: float = 1.0) -> None:
+        while not stop.is_set():
+            try:
+                stats = self.run_once()
+            except Exception:
+                logger.exception("[WEBHOOKS] Dispatch round failed")
+                stats = {}
+            if stats.get("events") or any(stats.get(k) for k in ("delivered", "retrying", "dead")):
+                logger.info("[WEBHOOKS] %s", stats)
+                continue
+            stop.wait(idle_sleep)
@@ -0,0 +1,63 @@
+"""Fixtures shared by the backend tests.
+
+The tests never touch the database in DATABASE_URL. They run on a SQLite
+file in a temporary directory, or on TEST_DATABASE_URL (an empty database,
+e.g. Postgres) when it is set, migrated once for the whole session.
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Before anything imports src: settings are read from the environment once.
+_TMP_DIR = tempfile.mkdtemp(prefix="verifai-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{_TMP_DIR}/test.db"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_TMP_DIR, "uploads")
+os.environ["ARCHIVE_DIR"] = os.path.join(_TMP_DIR, "archive")
+os.environ["PUBSUB_BACKEND"] = "memory"
+os.environ["DOCUMENT_WORKERS"] = "0"
+os.environ["JWT_SECRET"] = "test-jwt-secret-" + "x" * 32
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from src.database import get_engine
+    from src.migrations import upgrade
+
+    engine = get_engine()
+    upgrade(engine)
+    return engine
+
+
+@pytest.fixture(scope="session")
+def client(engine):
+    from src.app_factory import create_app
+
+    return create_app().test_client()
+
+
+@pytest.fixture(scope="session")
+def sign_in(client):
+    """Create a user and return the auth headers of a fresh login as them.
+
+    ``organization`` names an organization to create and put them in; without
+    one the user is a platform user (across every organization).
+    """
+    from src.services_auth import create_user_by_admin
+    from src.services_organizations import create_organization
+
+    def sign_in(role: str = "admin", organization: str = None) -> dict:
+        email = f"user-{uuid.uuid4().hex}@example.com"
+        organization_id = create_organization(organization)["id"] if organization else None
+        create_user_by_admin(email, "password", role, organization_id, platform=organization is None)
+        token = client.post("/api/auth/login", json={"email": email, "password": "password"}).get_json()
+        return {"Authorization": f"Bearer {token['access_token']}"}
+
+    return sign_in
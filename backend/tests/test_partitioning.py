@@ -0,0 +1,74 @@
+"""Converting tables to monthly partitions (Postgres only).
+
+Postgres DDL is transactional, so each test converts the tables inside a
+transaction and rolls it back.
+"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from src.partitioning import (
+    PARTITION_KEYS,
+    add_months,
+    convert_table,
+    default_partition_name,
+    ensure_partitions,
+    month_start,
+    partition_name,
+    partitions_of,
+)
+
+
+@pytest.fixture
+def conn(engine):
+    if engine.dialect.name != "postgresql":
+        pytest.skip("partitioning requires PostgreSQL")
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            for table in PARTITION_KEYS:
+                convert_table(conn, table, months_ahead=1)
+            yield conn
+            transaction.rollback()
+
+
+def _foreign_keys(conn, table: str) -> set:
+    return set(conn.execute(
+        text("SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = CAST(:t AS regclass) "
+             "AND contype = 'f'"),
+        {"t": table},
+    ).scalars())
+
+
+def _insert_token(conn, created_at: datetime) -> str:
+    token_id = str(uuid.uuid4())
+    conn.execute(text(
+        "INSERT INTO verification_tokens (id, token, email, full_name, organization_name, expires_at, created_at) "
+        "VALUES (:id, 'x', 'a@example.com', 'A', 'Org', :created_at, :created_at)"
+    ), {"id": token_id, "created_at": created_at})
+    return token_id
+
+
+def _partition_holding(conn, token_id: str) -> str:
+    return conn.execute(
+        text("SELECT tableoid::regclass::text FROM verification_tokens WHERE id = :id"), {"id": token_id}
+    ).scalar()
+
+
+def test_foreign_keys_are_kept(conn):
+    for table in PARTITION_KEYS:
+        assert "FOREIGN KEY (organization_id) REFERENCES organizations(id)" in _foreign_keys(conn, table)
+
+
+def test_rows_beyond_the_partitions_go_to_the_default_partition(conn):
+    later = add_months(month_start(datetime.utcnow()), 6)
+    token_id = _insert_token(conn, later)
+    assert _partition_holding(conn, token_id) == default_partition_name("verification_tokens")
+
+    created = ensure_partitions(conn, months_ahead=6)
+    assert partition_name("verification_tokens", later) in created
+    assert _partition_holding(conn, token_id) == partition_name("verification_tokens", later)
+    assert later in {month for _, month in partitions_of(conn, "verification_tokens")}
+    assert conn.execute(text(f"SELECT COUNT(*) FROM {default_partition_name('verification_tokens')}")).scalar() == 0
@@ -0,0 +1,16 @@
+"""Every key query reads through one of its indexes on a freshly migrated database."""
+
+import pytest
+
+from src.query_plans import KEY_QUERIES, explain_key_queries
+
+
+@pytest.fixture(scope="module")
+def plans(engine):
+    return {result["query"]: result for result in explain_key_queries(engine)}
+
+
+@pytest.mark.parametrize("description", [q.description for q in KEY_QUERIES])
+def test_key_query_uses_its_index(plans, description):
+    result = plans[description]
+    assert result["uses_index"], f"expected {result['index']}, got:\n{result['plan']}"
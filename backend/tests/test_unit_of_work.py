@@ -0,0 +1,157 @@
+"""The request unit of work: one commit per successful request, nothing kept from failed ones."""
+
+import time
+import uuid
+
+import pytest
+from flask import Blueprint, jsonify, request
+from sqlalchemy import event, select
+
+from src.database import VersionedSession, session_scope
+from src.idempotency import IDEMPOTENCY_HEADER, idempotent
+from src.models import IdempotencyKey, Organization
+
+bp_test = Blueprint("unit_of_work_test", __name__, url_prefix="/test")
+
+
+def _add_organization(name: str, own_transaction: bool = False) -> None:
+    with session_scope(own_transaction=own_transaction) as db:
+        db.add(Organization(name=name))
+
+
+@bp_test.post("/write")
+def write():
+    """Writes through two service calls, then answers with the requested status."""
+    names = request.get_json()["names"]
+    for name in names:
+        _add_organization(name)
+    return jsonify({"names": names}), request.args.get("status", 200, type=int)
+
+
+@bp_test.post("/fail")
+def fail():
+    _add_organization(request.get_json()["names"][0])
+    raise RuntimeError("boom")
+
+
+@bp_test.post("/independent")
+def independent():
+    """A flushed request write, then a write in its own transaction."""
+    request_name, own_name = request.get_json()["names"]
+    _add_organization(request_name)
+    _add_organization(own_name, own_transaction=True)
+    return jsonify({}), request.args.get("status", 200, type=int)
+
+
+@bp_test.post("/idempotent")
+@idempotent("unit-of-work-test")
+def idempotent_write():
+    _add_organization(request.get_json()["names"][0])
+    return jsonify({}), request.args.get("status", 200, type=int)
+
+
+@pytest.fixture(scope="module")
+def client(engine):
+    from src.app_factory import create_app
+
+    app = create_app()
+    app.register_blueprint(bp_test)
+    return app.test_client()
+
+
+@pytest.fixture
+def commits():
+    counted = []
+
+    def count(session):
+        counted.append(session)
+
+    event.listen(VersionedSession, "after_commit", count)
+    yield counted
+    event.remove(VersionedSession, "after_commit", count)
+
+
+def _names(count: int = 2) -> list:
+    return [f"uow-{uuid.uuid4().hex}" for _ in range(count)]
+
+
+def _stored(names: list) -> set:
+    with session_scope(readonly=True) as db:
+        return set(db.scalars(select(Organization.name).where(Organization.name.in_(names))))
+
+
+def test_success_commits_every_write_once(client, commits):
+    names = _names()
+    response = client.post("/test/write", json={"names": names})
+    assert response.status_code == 200
+    assert _stored(names) == set(names)
+    assert len(commits) == 1
+
+
+@pytest.mark.parametrize("status", [400, 404, 422, 500])
+def test_error_status_rolls_back(client, commits, status):
+    names = _names()
+    response = client.post(f"/test/write?status={status}", json={"names": names})
+    assert response.status_code == status
+    assert _stored(names) == set()
+    assert commits == []
+
+
+def test_exception_rolls_back(client, commits):
+    names = _names(1)
+    assert client.post("/test/fail", json={"names": names}).status_code == 500
+    assert _stored(names) == set()
+    assert commits == []
+
+
+def test_own_transaction_commits_whatever_the_request_does(client, engine):
+    if engine.dialect.name == "sqlite":
+        pytest.skip("SQLite has one writer: the request's flushed write blocks any other connection")
+    names = _names()
+    assert client.post("/test/independent?status=400", json={"names": names}).status_code == 400
+    assert _stored(names) == {names[1]}
+    names = _names()
+    assert client.post("/test/independent", json={"names": names}).status_code == 200
+    assert _stored(names) == set(names)
+
+
+@pytest.mark.parametrize("status", [400, 422])
+def test_failed_idempotent_request_releases_its_key(client, status):
+    # The view's write is flushed in the request session when the key is
+    # released in its own transaction; on SQLite that must not wait for a lock.
+    key = uuid.uuid4().hex
+    names = _names(1)
+    started = time.monotonic()
+    response = client.post(f"/test/idempotent?status={status}", json={"names": names},
+                           headers={IDEMPOTENCY_HEADER: key})
+    assert response.status_code == status
+    assert time.monotonic() - started < 2
+    assert _stored(names) == set()
+    with session_scope(readonly=True) as db:
+        assert db.scalar(select(IdempotencyKey).where(IdempotencyKey.status_code.is_(None))) is None
+
+    # The same key can be retried, and now runs and stores its response.
+    response = client.post("/test/idempotent", json={"names": names}, headers={IDEMPOTENCY_HEADER: key})
+    assert response.status_code == 200
+    replay = client.post("/test/idempotent", json={"names": names}, headers={IDEMPOTENCY_HEADER: key})
+    assert replay.headers.get("Idempotent-Replayed") == "true"
+    assert _stored(names) == set(names)
+
+
+def test_idempotent_request_that_raises_releases_its_key(client):
+    key = uuid.uuid4().hex
+    names = _names(1)
+
+    @idempotent("unit-of-work-test-raise")
+    def view():
+        _add_organization(names[0])
+        raise RuntimeError("boom")
+
+    started = time.monotonic()
+    with client.application.test_request_context("/", method="POST", json={"names": names},
+                                                 headers={IDEMPOTENCY_HEADER: key}):
+        with pytest.raises(RuntimeError):
+            view()
+    assert time.monotonic() - started < 2
+    with session_scope(readonly=True) as db:
+        assert db.scalar(select(IdempotencyKey).where(IdempotencyKey.status_code.is_(None))) is None
@@ -0,0 +1,49 @@
+"""Uploads belong to the uploader's organization."""
+
+import uuid
+
+import pytest
+
+from src.database import session_scope
+from src.models import Upload
+
+
+@pytest.fixture
+def upload(client, sign_in):
+    """An upload by a user of a new organization: (their headers, upload id)."""
+    headers = sign_in("user", f"org-{uuid.uuid4().hex}")
+    response = client.post("/api/uploads", data=uuid.uuid4().bytes,
+                           headers={**headers, "X-Filename": "passport.pdf", "Content-Type": "application/pdf"})
+    assert response.status_code == 201
+    return headers, response.get_json()["upload_id"]
+
+
+def test_upload_records_uploader_and_organization(client, upload):
+    headers, upload_id = upload
+    user = client.get("/api/auth/me", headers=headers).get_json()
+    with session_scope(readonly=True) as db:
+        record = db.get(Upload, upload_id)
+        assert record.organization_id is not None
+        assert record.uploaded_by == user["id"]
+
+
+def test_owner_organization_can_read_and_delete(client, upload):
+    headers, upload_id = upload
+    assert client.get(f"/api/uploads/{upload_id}", headers=headers).status_code == 200
+    assert client.delete(f"/api/uploads/{upload_id}", headers=headers).status_code == 200
+    assert client.get(f"/api/uploads/{upload_id}", headers=headers).status_code == 404
+
+
+def test_other_organizations_get_404(client, sign_in, upload):
+    _, upload_id = upload
+    other = sign_in("admin", f"org-{uuid.uuid4().hex}")
+    assert client.get(f"/api/uploads/{upload_id}", headers=other).status_code == 404
+    assert client.get(f"/api/uploads/{upload_id}/preview", headers=other).status_code == 404
+    assert client.delete(f"/api/uploads/{upload_id}", headers=other).status_code == 404
+    with session_scope(readonly=True) as db:
+        assert db.get(Upload, upload_id) is not None
+
+
+def test_platform_users_see_every_organization(client, sign_in, upload):
+    _, upload_id = upload
+    assert client.get(f"/api/uploads/{upload_id}", headers=sign_in("admin")).status_code == 200
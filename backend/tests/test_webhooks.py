@@ -0,0 +1,144 @@
+"""Webhook endpoint management and the dispatcher's claims."""
+
+import uuid
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, update
+
+from src import webhooks
+from src.database import session_scope
+from src.models import OutboxEvent, WebhookDelivery, WebhookEndpoint
+from src.webhooks import WebhookDispatcher
+
+# An IP literal resolves without DNS.
+PUBLIC_URL = "https://93.184.216.34/hooks"
+
+
+class FakeHttp:
+    """Stands in for requests.Session: every POST succeeds."""
+
+    def __init__(self):
+        self.urls = []
+
+    def post(self, url, **kwargs):
+        self.urls.append(url)
+        return type("Response", (), {"status_code": 200, "content": b""})()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def allow_private_urls(monkeypatch):
+    settings = replace(webhooks.get_settings(), webhook_allow_private_urls=True)
+    monkeypatch.setattr(webhooks, "get_settings", lambda: settings)
+
+
+@pytest.fixture
+def admin(sign_in):
+    return sign_in("admin", f"org-{uuid.uuid4().hex}")
+
+
+@pytest.fixture(autouse=True)
+def deactivate_endpoints():
+    # Leave no due deliveries behind for the next test's dispatcher.
+    yield
+    with session_scope() as db:
+        db.execute(update(WebhookEndpoint).values(active=False))
+
+
+def _create(client, headers, **payload):
+    return client.post("/api/webhooks", json={"url": PUBLIC_URL, **payload}, headers=headers)
+
+
+def _due_deliveries(endpoint_id: str, count: int) -> None:
+    now = datetime.utcnow()
+    with session_scope() as db:
+        for _ in range(count):
+            event = OutboxEvent(event_type="token.created", payload="{}", created_at=now, dispatched_at=now)
+            db.add(event)
+            db.flush()
+            db.add(WebhookDelivery(event_id=event.id, endpoint_id=endpoint_id, status="pending",
+                                   attempts=0, next_attempt_at=now, created_at=now))
+
+
+def test_endpoints_need_an_admin(client, sign_in):
+    headers = sign_in("user", f"org-{uuid.uuid4().hex}")
+    assert client.get("/api/webhooks", headers=headers).status_code == 403
+    assert _create(client, headers).status_code == 403
+
+
+def test_create_endpoint(client, admin):
+    response = _create(client, admin, maxConcurrency=2)
+    assert response.status_code == 201
+    endpoint = response.get_json()["endpoint"]
+    assert endpoint["maxConcurrency"] == 2
+    assert endpoint["secret"].startswith("whsec_")
+
+
+@pytest.mark.parametrize("value", ["abc", None, [], True, 0, 33, 2.5])
+def test_invalid_max_concurrency_is_rejected(client, admin, value):
+    response = _create(client, admin, maxConcurrency=value)
+    assert response.status_code == 400
+    assert "maxConcurrency" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("url", [
+    "http://93.184.216.34/hooks",
+    "https://127.0.0.1/hooks",
+    "https://localhost/hooks",
+    "https://10.1.2.3/hooks",
+    "https://192.168.0.10:8443/hooks",
+    "https://169.254.169.254/latest/meta-data",
+    "https://[::1]/hooks",
+    "https://[::ffff:127.0.0.1]/hooks",
+    "ftp://93.184.216.34/hooks",
+    "not a url",
+    None,
+])
+def test_non_public_urls_are_rejected(client, admin, url):
+    response = client.post("/api/webhooks", json={"url": url}, headers=admin)
+    assert response.status_code == 400
+
+
+def test_private_urls_can_be_allowed_for_testing(client, admin, allow_private_urls):
+    assert _create(client, admin, url="http://127.0.0.1:8080/hooks").status_code == 201
+
+
+def test_endpoints_are_limited_to_their_organization(client, sign_in, admin):
+    endpoint = _create(client, admin).get_json()["endpoint"]
+    other = sign_in("admin", f"org-{uuid.uuid4().hex}")
+    assert endpoint["id"] not in [e["id"] for e in client.get("/api/webhooks", headers=other).get_json()["endpoints"]]
+    assert client.delete(f"/api/webhooks/{endpoint['id']}", headers=other).status_code == 404
+    assert client.delete(f"/api/webhooks/{endpoint['id']}", headers=admin).status_code == 200
+
+
+def test_claims_fit_within_the_lease(client, admin):
+    endpoint = _create(client, admin, maxConcurrency=2).get_json()["endpoint"]
+    dispatcher = WebhookDispatcher(http_session=FakeHttp(), batch_size=1000)
+    try:
+        _due_deliveries(endpoint["id"], 2 * dispatcher.lane_length + 5)
+        claimed = [a for a in dispatcher._claim() if a.endpoint_id == endpoint["id"]]
+        assert len(claimed) == 2 * dispatcher.lane_length
+    finally:
+        dispatcher.close()
+
+
+def test_deliveries_to_a_host_that_became_private_are_not_sent(client, admin, monkeypatch):
+    settings = replace(webhooks.get_settings(), webhook_allow_private_urls=True)
+    monkeypatch.setattr(webhooks, "get_settings", lambda: settings)
+    endpoint = _create(client, admin, url="https://127.0.0.1/hooks").get_json()["endpoint"]
+    monkeypatch.undo()
+    _due_deliveries(endpoint["id"], 3)
+    http = FakeHttp()
+    dispatcher = WebhookDispatcher(http_session=http)
+    try:
+        dispatcher.deliver_due()
+    finally:
+        dispatcher.close()
+    assert http.urls == []
+    with session_scope(readonly=True) as db:
+        errors = db.scalars(select(WebhookDelivery.last_error).where(WebhookDelivery.endpoint_id == endpoint["id"]))
+        assert set(errors) == {"Not sent: url host must be a public address"}
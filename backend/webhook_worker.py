@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Webhook delivery worker: drains the outbox and delivers events to endpoints.
+
+Usage:
+    python webhook_worker.py            Run until SIGTERM/SIGINT
+    python webhook_worker.py --once     Dispatch what is due now and exit
+
+Several workers can run side by side on Postgres (claims use SKIP LOCKED);
+on SQLite run one.
+"""
+
+import argparse
+import signal
+import sys
+import threading
+from pathlib import Path
+
+# Add src to path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from src.config import get_settings
+from src.database import get_engine
+from src.logging_setup import configure_logging
+from src.migrations import ensure_schema
+from src.webhooks import WebhookDispatcher
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="VerifAi webhook delivery worker")
+    parser.add_argument("--once", action="store_true", help="run until nothing is due, then exit")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    configure_logging(settings.log_level, settings.log_format, settings.log_info_sample_rate)
+    ensure_schema(get_engine(), auto_migrate=settings.auto_migrate)
+
+    dispatcher = WebhookDispatcher()
+    try:
+        if args.once:
+            totals = {"events": 0, "delivered": 0, "retrying": 0, "dead": 0}
+            while True:
+                stats = dispatcher.run_once()
+                for key, value in stats.items():
+                    totals[key] += value
+                if not any(stats.values()):
+                    break
+            print(f"✓ {totals['events']} event(s) fanned out, {totals['delivered']} delivered, "
+                  f"{totals['retrying']} to retry, {totals['dead']} dead-lettered")
+            return 0
+
+        stop = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: stop.set())
+        dispatcher.run_forever(stop)
+        return 0
+    finally:
+        dispatcher.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
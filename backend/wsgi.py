@@ -2,7 +2,9 @@
 WSGI entry point for production deployment
 """
 import os
-from src.app_factory import app
+from src.app_factory import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
@@ -37,7 +37,28 @@ function Overview() {
 
   const goToGenerate = () => navigate('/dashboard/generate-link')
   const goToVerifications = () => navigate('/dashboard/verifications')
-  const handleExport = () => alert('Export report will be available soon. In the meantime, view verifications to filter and copy data.')
+  const handleExport = async () => {
+    try {
+      const token = localStorage.getItem('accessToken')
+      const response = await fetch(`${API_BASE_URL}/api/verifications/export`, {
+        headers: {
+          'Authorization': `Bearer ${token}`
+        }
+      })
+      if (!response.ok) {
+        throw new Error(`Export failed (${response.status})`)
+      }
+      const url = URL.createObjectURL(await response.blob())
+      const link = document.createElement('a')
+      link.href = url
+      link.download = `verifications-${new Date().toISOString().slice(0, 10)}.csv`
+      link.click()
+      URL.revokeObjectURL(url)
+    } catch (err) {
+      console.error('Failed to export verifications:', err)
+      alert('Export failed. Please try again.')
+    }
+  }
 
   const statsConfig = [
     {